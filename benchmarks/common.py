@@ -0,0 +1,162 @@
+# Helpers shared by the benchmarks in this directory.
+#
+# The benchmarks load the modules from `library/` and `module_utils/` the
+# same way Ansible does, so ansible-core has to be installed to run them.
+
+import importlib.util
+import json
+import os
+import pathlib
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+import ansible.module_utils
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def import_module_utils(name):
+    """Import `module_utils/<name>.py` as `ansible.module_utils.<name>`."""
+    full_name = f"ansible.module_utils.{name}"
+    if full_name in sys.modules:
+        return sys.modules[full_name]
+
+    module = load(full_name, REPO / 'module_utils' / f"{name}.py")
+    setattr(ansible.module_utils, name, module)
+
+    return module
+
+
+def import_library(name, module_utils=()):
+    """
+    Import the module `library/<name>.py`, after the `module_utils` it
+    depends on.
+    """
+    for dependency in module_utils:
+        import_module_utils(dependency)
+
+    return load(name, REPO / 'library' / f"{name}.py")
+
+
+class BenchmarkFailure(Exception):
+    pass
+
+
+class ModuleExit(Exception):
+    """Raised by `BenchmarkModule.exit_json` with the result of the module."""
+
+    def __init__(self, result):
+        super().__init__('exit_json called')
+        self.result = result
+
+
+class BenchmarkModule:
+    """
+    Stands in for the AnsibleModule, so that the functions of a module can be
+    called with the given `params`.
+    """
+
+    check_mode = False
+
+    def __init__(self, **params):
+        self.params = params
+
+    def jsonify(self, data):
+        return json.dumps(data)
+
+    def warn(self, warning):
+        print(f"[WARNING]: {warning}", file=sys.stderr)
+
+    def fail_json(self, **kwargs):
+        raise BenchmarkFailure(kwargs.get('msg'))
+
+    def exit_json(self, **kwargs):
+        raise ModuleExit(kwargs)
+
+
+def run_module(module, **params):
+    """
+    Run a module from `library/` with the given `params`, options which are
+    not given get their default.
+
+    Returns the result passed to `exit_json`.
+    """
+    def create(argument_spec, **kwargs):
+        defaults = {name: spec.get('default') for name, spec in argument_spec.items()}
+        return BenchmarkModule(**{**defaults, **params})
+
+    module.AnsibleModule = create
+
+    try:
+        module.run_module()
+    except ModuleExit as exit:
+        return exit.result
+
+    raise BenchmarkFailure('the module did not call exit_json')
+
+
+def timed(function, *args, **kwargs):
+    """Call `function`, returns its result and how many seconds it took."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+
+    return result, time.perf_counter() - start
+
+
+def self_signed_certificate(directory):
+    """
+    Create a self-signed certificate for `localhost` with openssl.
+
+    Returns the paths of the certificate and of its key.
+    """
+    certificate = os.path.join(directory, 'localhost.pem')
+    key = os.path.join(directory, 'localhost.key')
+
+    subprocess.run(
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+            '-days', '1', '-subj', '/CN=localhost',
+            '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+            '-keyout', key, '-out', certificate,
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    return certificate, key
+
+
+def tls_contexts():
+    """
+    Returns a server and a client SSL context, the client trusts the
+    (self-signed) certificate of the server.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        certificate, key = self_signed_certificate(directory)
+
+        server = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server.load_cert_chain(certificate, key)
+        client = ssl.create_default_context(cafile=certificate)
+
+    return server, client
+
+
+def print_table(header, rows):
+    widths = [
+        max(len(str(row[column])) for row in [header, *rows])
+        for column in range(len(header))
+    ]
+    for row in [header, *rows]:
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
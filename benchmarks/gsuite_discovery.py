@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Time `build_service` of `module_utils/gsuite.py`, i.e. the work every
+Google Workspace module run does before its first request, with an empty
+discovery cache, a warm one and a static discovery document.
+
+For comparison it also times fetching the discovery document from the
+network (simulated with `--latency`), which is what google-api-python-client
+before 2.0 did on every run without a cache.
+
+    python benchmarks/gsuite_discovery.py --runs 20 --latency 0.3
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import import_module_utils, print_table
+
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient import discovery, discovery_cache
+from googleapiclient.http import HttpMock
+
+gsuite = import_module_utils('gsuite')
+
+SERVICES = [
+    ('admin', 'directory_v1'),
+    ('admin', 'datatransfer_v1'),
+    ('groupssettings', 'v1'),
+]
+
+
+class SlowHttpMock(HttpMock):
+    """Answers every request with the discovery document after `latency`."""
+
+    def __init__(self, content, latency):
+        super().__init__(headers={'status': '200'})
+        self.data = content
+        self.latency = latency
+
+    def request(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().request(*args, **kwargs)
+
+
+def fetched(api, version, cache_dir, latency):
+    content = discovery_cache.get_static_doc(api, version)
+    return discovery.build(
+        api, version, http=SlowHttpMock(content.encode('utf-8'), latency),
+        static_discovery=False, cache_discovery=False,
+    )
+
+
+def without_cache(api, version, cache_dir, latency):
+    return gsuite.build_service(api, version, AnonymousCredentials(), '')
+
+
+def empty_cache(api, version, cache_dir, latency):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return gsuite.build_service(api, version, AnonymousCredentials(), cache_dir)
+
+
+def warm_cache(api, version, cache_dir, latency):
+    return gsuite.build_service(api, version, AnonymousCredentials(), cache_dir)
+
+
+def static_document(api, version, cache_dir, latency):
+    return gsuite.build_service(api, version, AnonymousCredentials(), cache_dir)
+
+
+def prepare(variant, cache_dir):
+    """Put the files `variant` expects into `cache_dir`."""
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    if variant is warm_cache:
+        cache = gsuite.DiscoveryCache(cache_dir)
+        for api, version in SERVICES:
+            url = discovery.DISCOVERY_URI.format(api=api, apiVersion=version)
+            cache.set(url, discovery_cache.get_static_doc(api, version))
+    elif variant is static_document:
+        os.makedirs(cache_dir)
+        for api, version in SERVICES:
+            with open(os.path.join(cache_dir, f"{api}.{version}.json"), 'w', encoding='utf-8') as f:
+                f.write(discovery_cache.get_static_doc(api, version))
+
+
+def run(variant, cache_dir, runs, latency):
+    """Returns the median number of seconds per service and per module run."""
+    prepare(variant, cache_dir)
+
+    timings = {service: [] for service in SERVICES}
+    for _ in range(runs):
+        for api, version in SERVICES:
+            start = time.perf_counter()
+            variant(api, version, cache_dir, latency)
+            timings[(api, version)].append(time.perf_counter() - start)
+
+    return {service: statistics.median(values) for service, values in timings.items()}
+
+
+def import_time(runs):
+    """The median time a new process takes to import the Google libraries."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([
+            sys.executable, '-c',
+            'import googleapiclient.discovery, google.oauth2.service_account, google_auth_httplib2',
+        ], check=True)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.3,
+                        help='seconds it takes to fetch a discovery document')
+    args = parser.parse_args()
+
+    variants = [
+        ('fetched from the network', fetched),
+        ('build() without cache_dir', without_cache),
+        ('empty cache', empty_cache),
+        ('warm cache', warm_cache),
+        ('static document', static_document),
+    ]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'discovery')
+        for label, variant in variants:
+            medians = run(variant, cache_dir, args.runs, args.latency)
+            rows.append([
+                label,
+                *(f"{medians[service] * 1000:.1f}" for service in SERVICES),
+                f"{sum(medians.values()) * 1000:.1f}",
+            ])
+
+    print(f"median of {args.runs} runs in ms, {args.latency * 1000:.0f} ms to fetch a document")
+    print_table(
+        ['discovery', *(f"{api} {version}" for api, version in SERVICES), 'all'],
+        rows,
+    )
+    print(f"for comparison, starting python and importing the Google libraries: "
+          + f"{import_time(min(args.runs, 5)) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
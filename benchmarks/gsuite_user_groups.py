@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Count the HTTP requests `gsuite_user` needs to reconcile the groups of a
+user who is a member of many groups, before and after paging through all
+memberships and batching the role lookups.
+
+The Directory API is replaced by `HttpMockSequence`, which answers the
+requests in the order the flows send them.  The user is a member of
+`--groups` groups; the desired state drops 10 of them, adds 10 new ones and
+changes the role in 5.
+
+    python benchmarks/gsuite_user_groups.py --groups 500
+"""
+
+import argparse
+import json
+import time
+
+from common import BenchmarkModule, import_library, print_table
+
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.http import HttpMockSequence
+
+gsuite_user = import_library('gsuite_user', module_utils=['gsuite'])
+
+EMAIL = 'peter.quill@guardians.com'
+BOUNDARY = 'batch_benchmark'
+
+# the page size of groups().list if maxResults is not given
+DEFAULT_PAGE_SIZE = 200
+
+
+def group_email(index):
+    return f"group-{index:04d}@guardians.com"
+
+
+def scenario(count):
+    """Returns the current groups of the user and the desired `groups` dict."""
+    current = [group_email(index) for index in range(count)]
+
+    desired = {}
+    for index in range(count + 10):
+        if count - 10 <= index < count:
+            continue  # removed
+        role = 'MANAGER' if index < 5 else 'MEMBER'
+        desired[f"group{index}"] = {'groupKey': group_email(index), 'role': role}
+
+    return current, desired
+
+
+def ok(body=None):
+    return ({'status': '200'}, json.dumps(body or {}))
+
+
+def no_content():
+    return ({'status': '204'}, '')
+
+
+def batch(responses):
+    """A multipart batch response with a (status, body) per request id."""
+    parts = []
+    for request_id, (status, body) in responses.items():
+        content = '' if body is None else json.dumps(body)
+        reason = 'No Content' if status == 204 else 'OK'
+        parts.append(
+            f"--{BOUNDARY}\r\n"
+            + "Content-Type: application/http\r\n"
+            + "Content-Transfer-Encoding: binary\r\n"
+            + f"Content-ID: <response-benchmark + {request_id}>\r\n\r\n"
+            + f"HTTP/1.1 {status} {reason}\r\n"
+            + "Content-Type: application/json\r\n"
+            + f"Content-Length: {len(content)}\r\n\r\n"
+            + f"{content}\r\n"
+        )
+
+    return (
+        {'status': '200', 'content-type': f"multipart/mixed; boundary={BOUNDARY}"},
+        ''.join(parts) + f"--{BOUNDARY}--",
+    )
+
+
+def group_pages(current, page_size):
+    pages = []
+    for start in range(0, len(current), page_size):
+        page = {'groups': [{'email': email} for email in current[start:start + page_size]]}
+        if start + page_size < len(current):
+            page['nextPageToken'] = str(start + page_size)
+        pages.append(ok(page))
+
+    return pages
+
+
+def directory(responses):
+    document = discovery_cache.get_static_doc('admin', 'directory_v1')
+    http = HttpMockSequence(responses)
+
+    return build_from_document(document, http=http), http
+
+
+def before(current, desired):
+    """
+    The requests of manage_groups() before paging and batching: only the
+    first page of groups, a members().get per group, a hasMember per
+    desired group and an update or insert for every single one of them.
+
+    Returns the responses in the order the requests are sent, and a function
+    sending these requests.
+    """
+    first_page = current[:DEFAULT_PAGE_SIZE]
+    wanted = {group['groupKey'] for group in desired.values()}
+
+    responses = group_pages(current, DEFAULT_PAGE_SIZE)[:1]
+    responses += [ok({'email': EMAIL, 'role': 'MEMBER', 'type': 'USER', 'status': 'ACTIVE'})
+                  for _ in first_page]
+    responses += [no_content() for email in first_page if email not in wanted]
+    for group in desired.values():
+        is_member = group['groupKey'] in current
+        responses.append(ok({'isMember': is_member}))
+        responses.append(ok())
+
+    def flow(gDirectory):
+        groups = gDirectory.groups().list(userKey=EMAIL).execute()['groups']
+        current_groups = [
+            (group['email'], gDirectory.members().get(groupKey=group['email'], memberKey=EMAIL).execute()['role'])
+            for group in groups
+        ]
+        for group_key, _ in current_groups:
+            if group_key not in wanted:
+                gDirectory.members().delete(groupKey=group_key, memberKey=EMAIL).execute()
+        for group in desired.values():
+            if gDirectory.members().hasMember(groupKey=group['groupKey'], memberKey=EMAIL).execute()['isMember']:
+                gDirectory.members().update(groupKey=group['groupKey'], memberKey=EMAIL,
+                                            body={'role': group['role']}).execute()
+            else:
+                gDirectory.members().insert(groupKey=group['groupKey'],
+                                            body={'email': EMAIL, 'role': group['role']}).execute()
+
+    return responses, flow
+
+
+def after(current, desired):
+    """The requests of gsuite_user.manage_groups()."""
+    wanted = {group['groupKey']: group['role'] for group in desired.values()}
+    keep = [email for email in current if email in wanted]
+
+    responses = group_pages(current, 200)
+    responses.append(batch({email: (204, None) for email in current if email not in wanted}))
+    responses.append(batch({email: (200, {'role': 'MEMBER'}) for email in keep}))
+    responses.append(batch({
+        email: (200, {}) for email, role in wanted.items()
+        if email not in current or role != 'MEMBER'
+    }))
+
+    def flow(gDirectory):
+        module = BenchmarkModule()
+        gsuite_user.manage_groups(module, gDirectory, EMAIL, desired)
+
+    return responses, flow
+
+
+def run(label, plan, current, desired):
+    responses, flow = plan(current, desired)
+    gDirectory, http = directory(responses)
+
+    start = time.perf_counter()
+    flow(gDirectory)
+    seconds = time.perf_counter() - start
+
+    assert not http._iterable, f"{label}: {len(http._iterable)} responses left over"
+
+    # removals of groups beyond the first page are never noticed
+    removed = sum(
+        1 for _, method, _, _ in http.request_sequence if method == 'DELETE'
+    )
+    removed += sum(
+        body.count('DELETE ') for _, _, body, _ in http.request_sequence
+        if isinstance(body, str) and body.startswith('--')
+    )
+
+    return [label, len(http.request_sequence), removed, f"{seconds * 1000:.0f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--groups', type=int, default=500)
+    args = parser.parse_args()
+
+    current, desired = scenario(args.groups)
+    rows = [
+        run('before (first page, one request per call)', before, current, desired),
+        run('after (all pages, batched)', after, current, desired),
+    ]
+
+    print(f"user in {args.groups} groups, 10 to remove, 10 to add, 5 role changes")
+    print_table(['manage_groups', 'HTTP requests', 'groups removed', 'ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
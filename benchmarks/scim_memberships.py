@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Compare the request count and wall time of reconciling SCIM group
+memberships with `scim_group_membership` against the per-user flow of the
+former `roles/aws_user/tasks/manage_groups.yml`.
+
+The stand-in starts with every user in a few random groups.  The desired
+state drops one of them and adds everybody to "Engineering", i.e. a whole
+roster joining one group at once.
+
+    python benchmarks/scim_memberships.py --users 200 --groups 50 --latency 0.005
+"""
+
+import argparse
+import json
+import random
+import urllib.parse
+
+from common import import_library, import_module_utils, print_table, run_module, timed
+from scim_standin import ScimStandIn, group_resource, user_resource
+
+scim = import_module_utils('scim')
+scim_group_membership = import_library('scim_group_membership')
+
+HEADERS = {
+    'Authorization': 'Bearer benchmark',
+    'Content-Type': 'application/json',
+}
+
+
+def scenario(users, groups, seed=0):
+    """
+    Returns the group names, the user names, the current memberships and the
+    desired ones (both as user name -> set of group names).
+    """
+    rng = random.Random(seed)
+    group_names = [f"Group {index}" for index in range(groups)]
+    user_names = [f"user.{index}@guardians.com" for index in range(users)]
+
+    current = {name: set(rng.sample(group_names, 3)) for name in user_names}
+    desired = {}
+    for name, groups in current.items():
+        kept = set(sorted(groups)[1:])
+        desired[name] = kept | {'Engineering'}
+
+    return group_names + ['Engineering'], user_names, current, desired
+
+
+def populate(standin, group_names, user_names, current):
+    """Returns a dict of user name -> user id."""
+    user_ids = {
+        name: standin.add_user(user_resource(name, 'Peter', 'Quill'))['id']
+        for name in user_names
+    }
+    for group_name in group_names:
+        members = [user_ids[name] for name in user_names if group_name in current[name]]
+        standin.add_group(group_resource(group_name, members))
+
+    return user_ids
+
+
+def memberships(standin, user_ids):
+    """The memberships at the stand-in, as user name -> set of group names."""
+    names = {user_id: name for name, user_id in user_ids.items()}
+    found = {name: set() for name in user_ids}
+    for group in standin.groups.values():
+        for member in group['members']:
+            found[names[member['value']]].add(group['displayName'])
+
+    return found
+
+
+def get(url):
+    resp, info = scim.fetch_url(None, url, headers=HEADERS)
+    assert info['status'] == 200, info
+
+    return json.loads(resp.read())
+
+
+def patch_op(op, user_id):
+    return json.dumps({
+        'schemas': ['urn:ietf:params:scim:api:messages:2.0:PatchOp'],
+        'Operations': [{'op': op, 'path': 'members', 'value': [{'value': user_id}]}],
+    })
+
+
+def per_user_flow(base_url, user_ids, desired):
+    """The requests of the former manage_groups.yml, one user at a time."""
+    for name, user_id in user_ids.items():
+        groups = get(f"{base_url}/Groups")['Resources']
+
+        current = set()
+        for group in groups:
+            query = urllib.parse.quote(f'id eq "{group["id"]}" and members eq "{user_id}"')
+            current.update(resource['id'] for resource in get(f"{base_url}/Groups?filter={query}")['Resources'])
+
+        requested = set()
+        for group_name in desired[name]:
+            query = urllib.parse.quote(f'displayName eq "{group_name}"')
+            requested.update(resource['id'] for resource in get(f"{base_url}/Groups?filter={query}")['Resources'])
+
+        for group_id in requested - current:
+            _, info = scim.fetch_url(None, f"{base_url}/Groups/{group_id}", headers=HEADERS,
+                                     method='PATCH', data=patch_op('add', user_id))
+            assert info['status'] == 204, info
+        for group_id in current - requested:
+            _, info = scim.fetch_url(None, f"{base_url}/Groups/{group_id}", headers=HEADERS,
+                                     method='DELETE', data=patch_op('remove', user_id))
+            assert info['status'] == 204, info
+
+
+def module_flow(base_url, user_ids, desired, member_lookup, max_concurrency):
+    return run_module(
+        scim_group_membership,
+        base_url=base_url,
+        authorization=HEADERS['Authorization'],
+        memberships=[
+            {'user_id': user_id, 'groups': sorted(desired[name])}
+            for name, user_id in user_ids.items()
+        ],
+        member_lookup=member_lookup,
+        max_concurrency=max_concurrency,
+    )
+
+
+def run(args, label, list_members, flow):
+    group_names, user_names, current, desired = scenario(args.users, args.groups)
+
+    with ScimStandIn(list_members=list_members, latency=args.latency) as standin:
+        user_ids = populate(standin, group_names, user_names, current)
+        scim.POOL.close()
+
+        _, seconds = timed(flow, standin.url, user_ids, desired)
+        assert memberships(standin, user_ids) == desired, f"{label} did not reach the desired state"
+
+        return [label, standin.request_count, standin.requests.get('PATCH', 0)
+                + standin.requests.get('DELETE', 0), f"{seconds:.2f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds added to every request')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    rows = [
+        run(args, 'per user (manage_groups.yml)', False, per_user_flow),
+        run(args, 'module, member_lookup=query', False,
+            lambda *flow_args: module_flow(*flow_args, 'query', 1)),
+        run(args, f"module, member_lookup=query, {args.concurrency} concurrent", False,
+            lambda *flow_args: module_flow(*flow_args, 'query', args.concurrency)),
+        run(args, 'module, member_lookup=list', True,
+            lambda *flow_args: module_flow(*flow_args, 'list', 1)),
+    ]
+
+    print(f"{args.users} users, {args.groups + 1} groups, {args.latency * 1000:.0f} ms latency")
+    print_table(['flow', 'requests', 'writes', 'seconds'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Count the TLS handshakes needed to reconcile SCIM users, with and without
+the keep-alive connection pool of `module_utils/scim.py`.
+
+Every user exists at a local TLS stand-in, but with an outdated name, so
+reconciling it takes a lookup and an update.  Without the pool every
+request opens a new connection, just like `ansible.module_utils.urls`.
+
+    python benchmarks/scim_pool.py --users 100 --latency 0.01
+"""
+
+import argparse
+
+from common import (
+    BenchmarkModule,
+    import_library,
+    import_module_utils,
+    print_table,
+    timed,
+    tls_contexts,
+)
+from scim_standin import ScimStandIn, user_resource
+
+scim = import_module_utils('scim')
+scim_user = import_library('scim_user')
+
+
+def user_entries(count):
+    return [
+        {
+            'givenName': 'Peter',
+            'familyName': f"Quill {index}",
+            'userName': f"peter.quill.{index}@guardians.com",
+            'email': f"peter.quill.{index}@guardians.com",
+            'search_query': f'userName eq "peter.quill.{index}@guardians.com"',
+        }
+        for index in range(count)
+    ]
+
+
+def module_for(base_url, users, max_concurrency):
+    return BenchmarkModule(
+        base_url=base_url,
+        authorization='Bearer benchmark',
+        users=users,
+        givenName=None,
+        familyName=None,
+        userName=None,
+        email=None,
+        search_query=None,
+        update=True,
+        ignored_attributes_on_update=[],
+        active=True,
+        extra_attributes={},
+        state='present',
+        scim_version='v2',
+        bulk_chunk_size=100,
+        snapshot=False,
+        snapshot_page_size=100,
+        projection=False,
+        max_concurrency=max_concurrency,
+        max_retries=0,
+        retry_budget=0,
+    )
+
+
+def run(server_context, client_context, users, latency, max_concurrency, pooled):
+    with ScimStandIn(server_context, latency=latency) as standin:
+        for user in users:
+            standin.add_user(user_resource(user['userName'], 'Star-Lord', user['familyName']))
+
+        scim.POOL.close()
+        scim.POOL.ssl_context = client_context
+        scim.POOL.opened = 0
+
+        release = scim.POOL.release
+        if not pooled:
+            # a new connection for every request
+            scim.POOL.release = lambda scheme, netloc, connection: connection.close()
+
+        try:
+            module = module_for(standin.url, users, max_concurrency)
+            result, seconds = timed(scim_user.run_users, module, standin.url, {
+                'Authorization': 'Bearer benchmark',
+                'Content-Type': 'application/json',
+            })
+        finally:
+            scim.POOL.release = release
+            scim.POOL.close()
+
+        assert result['summary']['updated'] == len(users), result['summary']
+        assert scim.POOL.opened == standin.connections
+
+        return standin.connections, standin.request_count, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='seconds added to every request (and twice to every handshake)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    server_context, client_context = tls_contexts()
+    users = user_entries(args.users)
+
+    rows = []
+    for max_concurrency in args.concurrency:
+        for pooled in (False, True):
+            handshakes, requests, seconds = run(
+                server_context, client_context, users, args.latency, max_concurrency, pooled
+            )
+            rows.append([
+                'pooled' if pooled else 'new connection per request',
+                max_concurrency,
+                requests,
+                handshakes,
+                f"{handshakes / len(users):.2f}",
+                f"{seconds:.2f}",
+            ])
+
+    print(f"{len(users)} users, {args.latency * 1000:.0f} ms latency")
+    print_table(
+        ['transport', 'concurrency', 'requests', 'handshakes', 'handshakes/user', 'seconds'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
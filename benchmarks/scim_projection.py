@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Measure the payload the SCIM modules receive with and without the
+`projection` option (i.e. the `attributes` query parameter), against a
+local SCIM stand-in whose resources carry about as many attributes as the
+ones of real services.
+
+    python benchmarks/scim_projection.py --users 2000 --groups 50 --members 200
+"""
+
+import argparse
+import random
+
+from common import BenchmarkModule, import_library, import_module_utils, print_table, timed
+from scim_standin import ScimStandIn, group_resource, user_resource
+
+import_module_utils('scim')
+scim_user = import_library('scim_user')
+scim_group_membership = import_library('scim_group_membership')
+
+HEADERS = {
+    'Authorization': 'Bearer benchmark',
+    'Content-Type': 'application/json',
+}
+
+
+def desired_user(index):
+    return {
+        'givenName': 'Peter',
+        'familyName': f"Quill {index}",
+        'userName': f"user.{index}@guardians.com",
+        'email': f"user.{index}@guardians.com",
+        'search_query': f'userName eq "user.{index}@guardians.com"',
+        'extra_attributes': {},
+        'ignored_attributes_on_update': [],
+    }
+
+
+def snapshot(standin, users, projection):
+    module = BenchmarkModule(projection=projection)
+    scim_user.snapshot_users(module, standin.url, HEADERS, users, 100)
+
+
+def lookups(standin, users, projection):
+    module = BenchmarkModule(projection=projection)
+    for user in users:
+        scim_user.find_user(module, standin.url, HEADERS, user)
+
+
+def groups(member_lookup):
+    def load(standin, users, projection):
+        module = BenchmarkModule(projection=projection, page_size=100, member_lookup=member_lookup)
+        scim_group_membership.load_groups(module, standin.url, HEADERS)
+    return load
+
+
+def member_queries(standin, users, projection):
+    module = BenchmarkModule(projection=projection, page_size=100, max_concurrency=1)
+    scim_group_membership.lookup_members(
+        module, standin.url, HEADERS, list(standin.groups), [user['id'] for user in users],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=100,
+                        help='number of single user lookups and member queries')
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--members', type=int, default=200)
+    args = parser.parse_args()
+
+    users = [desired_user(index) for index in range(args.users)]
+
+    with ScimStandIn() as standin:
+        resources = [
+            standin.add_user(user_resource(user['userName'], user['givenName'], user['familyName']))
+            for user in users
+        ]
+        user_ids = [resource['id'] for resource in resources]
+        for index in range(args.groups):
+            members = random.Random(index).sample(user_ids, min(args.members, len(user_ids)))
+            standin.add_group(group_resource(f"Group {index}", members))
+
+        operations = [
+            (f"user snapshot ({args.users} users)", snapshot, users),
+            (f"user lookups ({args.lookups})", lookups, users[:args.lookups]),
+            (f"list groups with members ({args.groups})", groups('list'), None),
+            ("list groups, member_lookup=query", groups('query'), None),
+            (f"member queries ({args.lookups} users)", member_queries, resources[:args.lookups]),
+        ]
+
+        rows = []
+        for label, operation, operation_users in operations:
+            row = [label]
+            sizes = []
+            for projection in (False, True):
+                standin.reset_counters()
+                _, seconds = timed(operation, standin, operation_users, projection)
+                sizes.append(standin.bytes_sent)
+                row += [f"{standin.bytes_sent / 1024:.0f}", f"{seconds * 1000:.0f}"]
+            row.append(f"{sizes[0] / max(sizes[1], 1):.1f}x")
+            rows.append(row)
+
+    print_table(
+        ['operation', 'KiB', 'ms', 'KiB (projection)', 'ms (projection)', 'reduction'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+# A local stand-in for a SCIM 2.0 service, used by the benchmarks.
+#
+# It keeps users and groups in memory, understands the requests the SCIM
+# modules send (lookups with simple `eq` filters, paged listings, PatchOps)
+# and counts connections, requests and the bytes it sends.  Every request
+# can be slowed down by a fixed latency to mimic a service far away.
+
+import http.server
+import json
+import re
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+
+FILTER_TERM = re.compile(r'^\s*([\w.]+)\s+eq\s+"(.*)"\s*$', re.IGNORECASE)
+
+
+def parse_filter(expression):
+    """Parse `a eq "x" and b eq "y"` into a list of (attribute, value)."""
+    terms = []
+    for term in re.split(r'\s+and\s+', expression, flags=re.IGNORECASE):
+        match = FILTER_TERM.match(term)
+        if match is None:
+            raise ValueError(f"unsupported filter: {expression}")
+        terms.append((match.group(1), match.group(2)))
+
+    return terms
+
+
+def matches(resource, terms):
+    for attribute, value in terms:
+        if attribute == 'members':
+            if not any(member['value'] == value for member in resource.get('members', [])):
+                return False
+        elif attribute in ('emails', 'emails.value'):
+            if not any(email['value'].lower() == value.lower() for email in resource.get('emails', [])):
+                return False
+        elif str(resource.get(attribute, '')).lower() != value.lower():
+            return False
+
+    return True
+
+
+def project(resource, attributes):
+    """Only keep the requested (top-level) attributes of a resource."""
+    if not attributes:
+        return resource
+
+    keep = {'id', 'schemas'} | {attribute.split('.')[0] for attribute in attributes.split(',')}
+
+    return {key: value for key, value in resource.items() if key in keep}
+
+
+def user_resource(user_name, given_name, family_name, **extra):
+    """A user resource with about as many attributes as real services return."""
+    user_id = str(uuid.uuid4())
+
+    return {
+        'schemas': [
+            'urn:ietf:params:scim:schemas:core:2.0:User',
+            'urn:ietf:params:scim:schemas:extension:enterprise:2.0:User',
+        ],
+        'id': user_id,
+        'externalId': str(uuid.uuid4()),
+        'userName': user_name,
+        'name': {
+            'formatted': f"{given_name} {family_name}",
+            'familyName': family_name,
+            'givenName': given_name,
+        },
+        'displayName': f"{given_name} {family_name}",
+        'nickName': given_name,
+        'title': 'Guardian',
+        'userType': 'Employee',
+        'preferredLanguage': 'en-US',
+        'locale': 'en-US',
+        'timezone': 'Europe/Vienna',
+        'active': True,
+        'emails': [{'value': user_name, 'type': 'work', 'primary': True}],
+        'phoneNumbers': [{'value': '+43 1 234 5678', 'type': 'work'}],
+        'addresses': [{
+            'type': 'work',
+            'streetAddress': 'Pluskaufstraße 7',
+            'locality': 'Linz',
+            'postalCode': '4061',
+            'country': 'AT',
+            'primary': True,
+        }],
+        'urn:ietf:params:scim:schemas:extension:enterprise:2.0:User': {
+            'employeeNumber': str(uuid.uuid4().int)[:8],
+            'costCenter': 'Galaxy',
+            'organization': 'Guardians',
+            'division': 'Ship',
+            'department': 'Milano',
+            'manager': {'value': str(uuid.uuid4())},
+        },
+        'meta': {
+            'resourceType': 'User',
+            'created': '2024-01-01T00:00:00Z',
+            'lastModified': '2024-01-01T00:00:00Z',
+            'location': f"/Users/{user_id}",
+        },
+        **extra,
+    }
+
+
+def group_resource(display_name, members=()):
+    group_id = str(uuid.uuid4())
+
+    return {
+        'schemas': ['urn:ietf:params:scim:schemas:core:2.0:Group'],
+        'id': group_id,
+        'displayName': display_name,
+        'members': [{'value': member, 'type': 'User'} for member in members],
+        'meta': {
+            'resourceType': 'Group',
+            'created': '2024-01-01T00:00:00Z',
+            'lastModified': '2024-01-01T00:00:00Z',
+            'location': f"/Groups/{group_id}",
+        },
+    }
+
+
+class ScimStandIn:
+    """
+    A SCIM service on localhost, to be used as a context manager.
+
+    `list_members` controls whether the members of groups are returned (AWS
+    IAM Identity Center does not), `latency` is added to every request and
+    twice to every new connection (for the TCP and TLS handshakes).
+    """
+
+    def __init__(self, ssl_context=None, list_members=True, latency=0.0, bulk=False):
+        self.ssl_context = ssl_context
+        self.list_members = list_members
+        self.latency = latency
+        self.bulk = bulk
+
+        self.lock = threading.Lock()
+        self.users = {}
+        self.groups = {}
+        self.reset_counters()
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        scheme = 'https' if self.ssl_context else 'http'
+        host = 'localhost' if self.ssl_context else '127.0.0.1'
+
+        return f"{scheme}://{host}:{self.server.server_address[1]}/scim/v2"
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = {}
+            self.bytes_sent = 0
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def add_user(self, resource):
+        self.users[resource['id']] = resource
+        return resource
+
+    def add_group(self, resource):
+        self.groups[resource['id']] = resource
+        return resource
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        standin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                with standin.lock:
+                    standin.connections += 1
+                time.sleep(2 * standin.latency)
+
+                # headers and body are written separately, do not let Nagle's
+                # algorithm wait for the ACK in between
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if standin.ssl_context is not None:
+                    self.request = standin.ssl_context.wrap_socket(self.request, server_side=True)
+                super().setup()
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.dispatch()
+
+            def do_POST(self):
+                self.dispatch()
+
+            def do_PUT(self):
+                self.dispatch()
+
+            def do_PATCH(self):
+                self.dispatch()
+
+            def do_DELETE(self):
+                self.dispatch()
+
+            def dispatch(self):
+                with standin.lock:
+                    standin.requests[self.command] = standin.requests.get(self.command, 0) + 1
+                time.sleep(standin.latency)
+
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+
+                parsed = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(parsed.query))
+                path = parsed.path.split('/scim/v2', 1)[-1].strip('/').split('/')
+
+                with standin.lock:
+                    status, response = standin.handle(self.command, path, query, body)
+
+                data = b'' if response is None else json.dumps(response).encode('utf-8')
+                with standin.lock:
+                    standin.bytes_sent += len(data)
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/scim+json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def handle(self, method, path, query, body):
+        """Returns the status and the (JSON) body of the response."""
+        resource_type = path[0]
+
+        if resource_type == 'ServiceProviderConfig':
+            return 200, {
+                'bulk': {'supported': self.bulk, 'maxOperations': 1000},
+                'filter': {'supported': True, 'maxResults': 100},
+                'patch': {'supported': True},
+            }
+
+        if resource_type == 'Bulk':
+            return self.handle_bulk(body)
+
+        store = self.users if resource_type == 'Users' else self.groups
+        resource_id = path[1] if len(path) > 1 else None
+
+        if resource_id is None and method == 'GET':
+            return 200, self.list(store, query)
+        if resource_id is None and method == 'POST':
+            return 201, self.create(store, resource_type, body)
+
+        resource = store.get(resource_id)
+        if resource is None:
+            return 404, {'detail': 'Resource not found', 'status': '404'}
+
+        if method == 'GET':
+            return 200, self.present(resource, query.get('attributes'))
+        if method == 'PUT':
+            resource.update(body)
+            return 200, self.present(resource)
+        if method == 'PATCH' or (method == 'DELETE' and body):
+            # the old membership tasks removed members with a DELETE that
+            # carried a PatchOp
+            self.patch(resource, body)
+            return 204, None
+        if method == 'DELETE':
+            del store[resource_id]
+            return 204, None
+
+        return 405, {'detail': 'Method not allowed', 'status': '405'}
+
+    def present(self, resource, attributes=None):
+        if not self.list_members and 'members' in resource:
+            resource = {key: value for key, value in resource.items() if key != 'members'}
+
+        return project(resource, attributes)
+
+    def list(self, store, query):
+        resources = list(store.values())
+        if 'filter' in query:
+            terms = parse_filter(query['filter'])
+            resources = [resource for resource in resources if matches(resource, terms)]
+
+        start_index = int(query.get('startIndex', 1))
+        count = int(query.get('count', 100))
+        page = resources[start_index - 1:start_index - 1 + count]
+
+        return {
+            'schemas': ['urn:ietf:params:scim:api:messages:2.0:ListResponse'],
+            'totalResults': len(resources),
+            'startIndex': start_index,
+            'itemsPerPage': len(page),
+            'Resources': [self.present(resource, query.get('attributes')) for resource in page],
+        }
+
+    def create(self, store, resource_type, body):
+        if resource_type == 'Users':
+            resource = user_resource(
+                body['userName'],
+                body.get('name', {}).get('givenName', ''),
+                body.get('name', {}).get('familyName', ''),
+            )
+            resource.update(body)
+        else:
+            resource = group_resource(body['displayName'])
+
+        store[resource['id']] = resource
+
+        return self.present(resource)
+
+    def patch(self, resource, body):
+        for operation in body.get('Operations', []):
+            op = operation['op'].lower()
+            path = operation.get('path')
+            value = operation.get('value')
+
+            if path == 'members':
+                members = resource.setdefault('members', [])
+                values = {member['value'] for member in value}
+                if op == 'add':
+                    known = {member['value'] for member in members}
+                    members.extend({'value': member} for member in sorted(values - known))
+                elif op == 'remove':
+                    resource['members'] = [member for member in members if member['value'] not in values]
+            elif path is None:
+                resource.update(value)
+            elif '.' in path:
+                parent, child = path.split('.', 1)
+                resource.setdefault(parent, {})[child] = value
+            else:
+                resource[path] = value
+
+    def handle_bulk(self, body):
+        responses = []
+        for operation in body.get('Operations', []):
+            path = operation['path'].strip('/').split('/')
+            status, response = self.handle(operation['method'], path, {}, operation.get('data'))
+
+            result = {'bulkId': operation.get('bulkId'), 'method': operation['method'], 'status': str(status)}
+            if status == 201:
+                result['location'] = f"/Users/{response['id']}"
+            responses.append(result)
+
+        return 200, {
+            'schemas': ['urn:ietf:params:scim:api:messages:2.0:BulkResponse'],
+            'Operations': responses,
+        }
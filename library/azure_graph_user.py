@@ -0,0 +1,496 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.azure import (
+    GRAPH_URL,
+    delta_sync,
+    graph_batch,
+    graph_error,
+    graph_list,
+)
+from ansible.module_utils.scim import RETRY
+
+import urllib.parse # quote
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: azure_graph_user
+
+short_description: Manage Azure users and their group memberships
+
+version_added: "4.0"
+
+description:
+  - "This module creates, updates and deletes a user in Azure AD via the
+    Microsoft Graph API, and manages which groups the user is a member of."
+  - "All requests are sent as JSON batches (`$batch`) of up to 20 requests:
+    the user, all of its current groups and the requested groups (unless a
+    `group_index` is given) are looked up with one batch, the user is
+    updated and its memberships are changed with another one.  Requests
+    throttled by Graph are sent again after waiting for as long as Graph
+    asks for."
+
+options:
+  access_token:
+    description:
+      - An access token for the Graph API, e.g. from `azure_token`.
+    required: true
+  username:
+    description:
+      - The user principal name of the user.
+    required: true
+  displayName:
+    description:
+      - The display name of the user.
+      - Required if `state` is 'present'.
+    required: false
+  password:
+    description:
+      - The initial password of the user, which has to be changed on the
+        first sign in.  Only used when the user gets created.
+    required: false
+  groups:
+    description:
+      - The display names of the groups the user should be a member of.
+      - The user is removed from every other group, except for
+        `ignored_groups`.
+      - Default is '[]'.
+    required: false
+  ignored_groups:
+    description:
+      - Groups the user is never removed from, as a list of dicts with the
+        `id` (and optionally the `displayName`) of the group.
+      - Default is '[]'.
+    required: false
+  state:
+    description:
+      - Default is 'present'. If 'absent' the user will be deleted.
+    required: false
+  group_index:
+    description:
+      - An index of group display name -> list of group ids, as returned by
+        `azure_group_index`.  Requested groups are resolved with it instead
+        of being looked up one by one.
+      - Group names used by more than one group can not be resolved and
+        fail the module.
+    required: false
+  delta_state_file:
+    description:
+      - Path of a file in which a mirror of all users and groups of the
+        tenant is kept, and kept up to date with delta queries
+        (`/users/delta` and `/groups/delta`).  The user, its groups and the
+        requested groups are then looked up in the mirror instead of asking
+        Graph about them.
+      - Only the first run (or a run after Graph invalidated the delta link)
+        loads the whole directory, later runs only load the changes.
+      - Default is to not use a mirror.
+    required: false
+  max_retries:
+    description:
+      - How often a batch is sent again if Graph throttles it or some of its
+        requests.
+      - Default is '5'.
+    required: false
+  retry_budget:
+    description:
+      - The maximum number of seconds to spend waiting for retries during
+        the whole module run.
+      - Default is '300'.
+    required: false
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Manage an Azure user
+  azure_graph_user:
+    access_token: "{{ azure_client_credentials.access_token }}"
+    username: "peter.quill@guardians.com"
+    displayName: "Peter Quill"
+    password: "{{ azure_initial_password }}"
+    groups:
+      - Guardians
+      - Ravagers
+    ignored_groups:
+      - displayName: "All Users"
+        id: c58cf0c7-3f62-48f6-83e5-105c00da31a9
+
+- name: Delete an Azure user
+  azure_graph_user:
+    access_token: "{{ azure_client_credentials.access_token }}"
+    username: "yondu.udonta@guardians.com"
+    state: absent
+'''
+
+RETURN = '''
+changed:
+    description: Returns if anything has changed
+    type: boolean
+    returned: always
+id:
+    description: The id of the user, if it exists (or got created)
+    type: str
+    returned: always
+created:
+    description: Whether the user got created
+    type: boolean
+    returned: always
+updated:
+    description: Whether the user got updated
+    type: boolean
+    returned: always
+deleted:
+    description: Whether the user got deleted
+    type: boolean
+    returned: always
+added:
+    description: The display names of the groups the user got added to
+    type: list
+    returned: always
+removed:
+    description: The display names of the groups the user got removed from
+    type: list
+    returned: always
+unknown_groups:
+    description: Requested group names which do not exist
+    type: list
+    returned: always
+delta_resync:
+    description: The object types (`users`, `groups`) which got loaded completely into the mirror of `delta_state_file`
+    type: list
+    returned: when `delta_state_file` is set
+retries:
+    description: How many requests got retried
+    type: int
+    returned: always
+retry_sleep:
+    description: How many seconds were spent waiting for retries
+    type: float
+    returned: always
+'''
+
+
+def quote(value):
+    return urllib.parse.quote(value, safe='')
+
+
+def odata_string(value):
+    """Quote a string for a `$filter` expression."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def resolve_groups(module, index, names):
+    """
+    Resolve the requested group names with `index`, a dict of display name
+    -> list of group ids.
+
+    Returns a dict of group id -> display name of the requested groups, and
+    the list of requested group names which do not exist.  Names used by
+    more than one group can not be resolved and fail the module.
+    """
+    ambiguous = sorted({name for name in names if len(index.get(name, [])) > 1})
+    if ambiguous:
+        module.fail_json(msg=f"group names are not unique: {', '.join(ambiguous)}")
+
+    requested = {}
+    unknown_groups = []
+    for name in names:
+        if not index.get(name):
+            unknown_groups.append(name)
+            continue
+        requested[index[name][0]] = name
+
+    return requested, unknown_groups
+
+
+def lookup(module, access_token, username, groups, group_index=None):
+    """
+    Look up the user, the groups it is a member of and the requested groups
+    with as few batches as possible.  All pages of the user's groups are
+    loaded.  The requested groups are only looked up one by one if no
+    `group_index` (see `azure_group_index`) is given.
+
+    Returns the user (`None` if it does not exist), a dict of group id ->
+    display name of its current groups and of the requested groups, and the
+    list of requested group names which do not exist.
+    """
+    urls = {
+        'user': f"/users?$filter={quote(f'userPrincipalName eq {odata_string(username)}')}"
+                + "&$select=id,displayName",
+        'memberOf': f"/users/{quote(username)}/memberOf/microsoft.graph.group"
+                    + "?$select=id,displayName&$top=999",
+    }
+    if group_index is None:
+        for index, name in enumerate(groups):
+            urls[f"group-{index}"] = f"/groups?$filter={quote(f'displayName eq {odata_string(name)}')}" \
+                                     + "&$select=id,displayName"
+
+    lists = graph_list(module, access_token, urls)
+
+    users, error = lists['user']
+    if error is not None:
+        module.fail_json(msg=f"ERROR while looking up user {username}: {graph_error(error)}")
+    user = users[0] if users else None
+
+    current = {}
+    if user is not None:
+        member_of, error = lists['memberOf']
+        if error is not None:
+            module.fail_json(msg=f"ERROR while listing the groups of user {username}: {graph_error(error)}")
+        current = {group['id']: group['displayName'] for group in member_of}
+
+    if group_index is None:
+        group_index = {}
+        for index, name in enumerate(groups):
+            found, error = lists[f"group-{index}"]
+            if error is not None:
+                module.fail_json(msg=f"ERROR while looking up group {name}: {graph_error(error)}")
+            group_index[name] = [group['id'] for group in found]
+
+    requested, unknown_groups = resolve_groups(module, group_index, groups)
+
+    return user, current, requested, unknown_groups
+
+
+def lookup_mirror(module, mirror, username, groups):
+    """
+    Like `lookup`, but look up everything in the mirror of the directory
+    kept by `delta_sync`.
+    """
+    user = None
+    for candidate in mirror['users'].values():
+        if candidate.get('userPrincipalName', '').lower() == username.lower():
+            user = candidate
+            break
+
+    group_index = {}
+    for group in mirror['groups'].values():
+        group_index.setdefault(group.get('displayName'), []).append(group['id'])
+
+    current = {}
+    if user is not None:
+        current = {
+            group['id']: group.get('displayName')
+            for group in mirror['groups'].values()
+            if user['id'] in group.get('members', [])
+        }
+
+    requested, unknown_groups = resolve_groups(module, group_index, groups)
+
+    return user, current, requested, unknown_groups
+
+
+def create_user(module, access_token, username, displayName, password):
+    # https://learn.microsoft.com/en-us/graph/api/user-post-users
+    responses = graph_batch(module, access_token, [{
+        'id': 'create',
+        'method': 'POST',
+        'url': '/users',
+        'body': {
+            'accountEnabled': True,
+            'displayName': displayName,
+            'mailNickname': username.split('@')[0],
+            'userPrincipalName': username,
+            'passwordProfile': {
+                'forceChangePasswordNextSignIn': True,
+                'password': password,
+            },
+        },
+    }])
+
+    response = responses['create']
+    if response['status'] != 201:
+        module.fail_json(msg=f"ERROR while creating user {username}: {graph_error(response)}")
+
+    return response['body']
+
+
+def change_requests(user, displayName, add, remove):
+    """
+    Build the requests which update the user and change its memberships.
+    Membership changes only happen once the update succeeded.
+    """
+    requests = []
+    depends = []
+
+    if user['displayName'] != displayName:
+        # https://learn.microsoft.com/en-us/graph/api/user-update
+        requests.append({
+            'id': 'update',
+            'method': 'PATCH',
+            'url': f"/users/{user['id']}",
+            'body': {'displayName': displayName},
+        })
+        depends = ['update']
+
+    for group_id in sorted(add):
+        # https://learn.microsoft.com/en-us/graph/api/group-post-members
+        requests.append({
+            'id': f"add-{group_id}",
+            'method': 'POST',
+            'url': f"/groups/{group_id}/members/$ref",
+            'body': {'@odata.id': f"{GRAPH_URL}/directoryObjects/{user['id']}"},
+            'dependsOn': depends,
+        })
+
+    for group_id in sorted(remove):
+        # https://learn.microsoft.com/en-us/graph/api/group-delete-members
+        requests.append({
+            'id': f"remove-{group_id}",
+            'method': 'DELETE',
+            'url': f"/groups/{group_id}/members/{user['id']}/$ref",
+            'dependsOn': depends,
+        })
+
+    return requests
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        access_token=dict(type='str', required=True, no_log=True),
+        username=dict(type='str', required=True),
+        displayName=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+        groups=dict(type='list', elements='str', required=False, default=[]),
+        ignored_groups=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            default=[],
+            options=dict(
+                id=dict(type='str', required=True),
+                displayName=dict(type='str', required=False),
+            ),
+        ),
+        state=dict(choices=['present', 'absent'], default='present'),
+        group_index=dict(type='dict', required=False),
+        delta_state_file=dict(type='path', required=False),
+        max_retries=dict(type='int', required=False, default=5),
+        retry_budget=dict(type='int', required=False, default=300),
+    )
+
+    result = dict(
+        changed=False,
+        id=None,
+        created=False,
+        updated=False,
+        deleted=False,
+        added=[],
+        removed=[],
+        unknown_groups=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_if=[('state', 'present', ['displayName'])],
+        supports_check_mode=True
+    )
+
+    # vars for easier usage
+    access_token = module.params['access_token']
+    username = module.params['username']
+    displayName = module.params['displayName']
+    RETRY.configure(module.params['max_retries'], module.params['retry_budget'])
+
+    groups = module.params['groups'] if module.params['state'] == 'present' else []
+    if module.params['delta_state_file']:
+        mirror, result['delta_resync'] = delta_sync(
+            module, access_token, module.params['delta_state_file']
+        )
+        user, current, requested, unknown_groups = lookup_mirror(module, mirror, username, groups)
+    else:
+        user, current, requested, unknown_groups = lookup(
+            module, access_token, username, groups, module.params['group_index']
+        )
+
+    if module.params['state'] == 'absent':
+        if user is not None:
+            result.update(changed=True, id=user['id'], deleted=True)
+            if not module.check_mode:
+                # https://learn.microsoft.com/en-us/graph/api/user-delete
+                response = graph_batch(module, access_token, [{
+                    'id': 'delete',
+                    'method': 'DELETE',
+                    'url': f"/users/{user['id']}",
+                }])['delete']
+                if response['status'] != 204:
+                    module.fail_json(
+                        msg=f"ERROR while deleting user {username}: {graph_error(response)}",
+                        **RETRY.stats()
+                    )
+
+        module.exit_json(**result, **RETRY.stats())
+
+    for name in unknown_groups:
+        module.warn(f"group {name} does not exist")
+    result['unknown_groups'] = unknown_groups
+
+    # groups which are ignored are never removed
+    ignored = {group['id'] for group in module.params['ignored_groups']}
+    add = requested.keys() - current.keys()
+    remove = current.keys() - requested.keys() - ignored
+    names = {**current, **requested}
+
+    if user is None:
+        if module.params['password'] is None:
+            module.fail_json(msg=f"password is required to create user {username}")
+
+        result.update(changed=True, created=True)
+        if module.check_mode:
+            result['added'] = sorted(names[group_id] for group_id in add)
+            module.exit_json(**result, **RETRY.stats())
+
+        user = create_user(module, access_token, username, displayName, module.params['password'])
+    result['id'] = user['id']
+
+    requests = change_requests(user, displayName, add, remove)
+    if module.check_mode:
+        result.update(
+            changed=result['changed'] or bool(requests),
+            updated=any(request['id'] == 'update' for request in requests),
+            added=sorted(names[group_id] for group_id in add),
+            removed=sorted(names[group_id] for group_id in remove),
+        )
+        module.exit_json(**result, **RETRY.stats())
+
+    responses = graph_batch(module, access_token, requests)
+
+    failed = []
+    for request in requests:
+        response = responses[request['id']]
+        if response['status'] >= 400:
+            failed.append(f"ERROR during {request['id']} of user {username}: {graph_error(response)}")
+        elif request['id'] == 'update':
+            result['updated'] = True
+        elif request['method'] == 'POST':
+            result['added'].append(names[request['id'][len('add-'):]])
+        else:
+            result['removed'].append(names[request['id'][len('remove-'):]])
+
+    result['changed'] = result['created'] or result['updated'] or bool(result['added'] or result['removed'])
+
+    if failed:
+        module.fail_json(
+            msg=f"failed to manage user {username}: {len(failed)} request(s) failed",
+            failed=failed,
+            **result,
+            **RETRY.stats()
+        )
+
+    module.exit_json(**result, **RETRY.stats())
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
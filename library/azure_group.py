@@ -0,0 +1,436 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.azure import (
+    delta_sync,
+    graph_batch,
+    graph_error,
+    graph_list,
+    group_index,
+)
+from ansible.module_utils.scim import RETRY
+
+import uuid
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: azure_group
+
+short_description: Manage Azure security groups and their licenses
+
+version_added: "4.0"
+
+description:
+  - "This module creates, updates and deletes security groups in Azure AD
+    via the Microsoft Graph API, and manages the licenses assigned to them
+    (group based licensing)."
+  - "The license catalog of the tenant (`subscribedSkus`) and all groups
+    are loaded once, instead of looking up every group on its own.  Groups
+    whose display name is used by more than one group are not touched."
+  - "Every group gets a single `assignLicense` request with all of its
+    added and removed licenses, and only if its licenses differ."
+  - "All requests are sent as JSON batches (`$batch`) of up to 20 requests."
+
+options:
+  access_token:
+    description:
+      - An access token for the Graph API, e.g. from `azure_token`.
+    required: true
+  groups:
+    description:
+      - A list of groups to manage. Every entry needs the `displayName` of
+        the group, and takes its `description`, `licenses` (a list of SKU
+        part numbers, e.g. `ENTERPRISEPACK`) and `state`.
+      - Groups with a `state` of 'absent' get their licenses removed and are
+        deleted.
+    required: true
+  delta_state_file:
+    description:
+      - Path of a file in which a mirror of all users and groups of the
+        tenant is kept, and kept up to date with delta queries
+        (`/users/delta` and `/groups/delta`).  The groups are then looked up
+        in the mirror instead of asking Graph about every one of them.
+      - Only the first run (or a run after Graph invalidated the delta link)
+        loads the whole directory, later runs only load the changes.
+      - Default is to not use a mirror.
+    required: false
+  max_retries:
+    description:
+      - How often a batch is sent again if Graph throttles it or some of its
+        requests.
+      - Default is '5'.
+    required: false
+  retry_budget:
+    description:
+      - The maximum number of seconds to spend waiting for retries during
+        the whole module run.
+      - Default is '300'.
+    required: false
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Manage Azure groups
+  azure_group:
+    access_token: "{{ azure_client_credentials.access_token }}"
+    groups:
+    - displayName: Guardians
+      description: The best team in the galaxy
+      licenses:
+      - ENTERPRISEPACK
+    - displayName: Ravagers
+      state: absent
+'''
+
+RETURN = '''
+changed:
+    description: Returns if anything has changed
+    type: boolean
+    returned: always
+groups:
+    description: The result for every group, with its `displayName`, `id`, whether it got `created`, `updated` or `deleted`, and the `licenses_added` and `licenses_removed` (as SKU part numbers)
+    type: list
+    returned: always
+summary:
+    description: The number of groups created, updated, deleted and failed
+    type: dict
+    returned: always
+unknown_licenses:
+    description: Requested licenses which are not part of the tenant's subscriptions
+    type: list
+    returned: always
+delta_resync:
+    description: The object types (`users`, `groups`) which got loaded completely into the mirror of `delta_state_file`
+    type: list
+    returned: when `delta_state_file` is set
+retries:
+    description: How many requests got retried
+    type: int
+    returned: always
+retry_sleep:
+    description: How many seconds were spent waiting for retries
+    type: float
+    returned: always
+'''
+
+# the properties of the groups which are needed to manage them
+GROUP_SELECT = 'id,displayName,description,assignedLicenses'
+
+# maps the actions which can be done on a group to the key in its result
+ACTION_RESULTS = {
+    'create': 'created',
+    'update': 'updated',
+    'delete': 'deleted',
+}
+
+
+def load(module, access_token, mirror=None):
+    """
+    Load the license catalog of the tenant and all of its groups (with a
+    single paged listing).  If a `mirror` of the directory (see
+    `delta_sync`) is given, the groups are taken from there instead.
+
+    Returns a dict of SKU part number -> SKU id, and an index of display
+    name -> list of groups.
+    """
+    # https://learn.microsoft.com/en-us/graph/api/subscribedsku-list
+    skus, error = graph_list(module, access_token, {
+        'skus': '/subscribedSkus?$select=skuId,skuPartNumber',
+    })['skus']
+    if error is not None:
+        module.fail_json(msg=f"ERROR while loading the subscribed SKUs: {graph_error(error)}")
+
+    sku_ids = {sku['skuPartNumber']: sku['skuId'] for sku in skus}
+
+    if mirror is not None:
+        index = {}
+        for resource in mirror['groups'].values():
+            index.setdefault(resource.get('displayName'), []).append(resource)
+        return sku_ids, index
+
+    index, _ = group_index(module, access_token, GROUP_SELECT)
+
+    return sku_ids, index
+
+
+def mark_failed(group_result, message):
+    # keep the first error of a group, later ones are most likely caused by it
+    if not group_result.get('failed'):
+        group_result['failed'] = True
+        group_result['msg'] = message
+
+
+def plan_group(group, resource, sku_ids):
+    """
+    Figure out what needs to be done for a group.
+
+    Returns the actions (`create`, `update` and/or `delete`), the body of the
+    create or update request, and the sets of SKU ids to add and to remove.
+    """
+    assigned = set()
+    if resource is not None:
+        assigned = {license['skuId'] for license in resource.get('assignedLicenses', [])}
+
+    if group['state'] == 'absent':
+        if resource is None:
+            return [], None, set(), set()
+        # licenses have to be removed before the group can be deleted
+        return ['delete'], None, set(), assigned
+
+    requested = {sku_ids[name] for name in group['licenses'] if name in sku_ids}
+
+    if resource is None:
+        body = {
+            'displayName': group['displayName'],
+            'securityEnabled': True,
+            'mailEnabled': False,
+            'mailNickname': str(uuid.uuid4()),
+        }
+        if group['description'] is not None:
+            body['description'] = group['description']
+        return ['create'], body, requested, set()
+
+    actions = []
+    body = None
+    if group['description'] is not None and group['description'] != resource.get('description'):
+        actions.append('update')
+        body = {'description': group['description']}
+
+    return actions, body, requested - assigned, assigned - requested
+
+
+def license_request(request_id, group_id, add, remove):
+    # https://learn.microsoft.com/en-us/graph/api/group-assignlicense
+    return {
+        'id': request_id,
+        'method': 'POST',
+        'url': f"/groups/{group_id}/assignLicense",
+        'body': {
+            'addLicenses': [{'skuId': sku_id, 'disabledPlans': []} for sku_id in sorted(add)],
+            'removeLicenses': sorted(remove),
+        },
+    }
+
+
+def group_requests(plans):
+    """
+    Build the requests for all groups which exist already, and for creating
+    the missing ones.
+    """
+    requests = []
+    for index, (group, resource, actions, body, (add, remove), _) in enumerate(plans):
+        if 'create' in actions:
+            # https://learn.microsoft.com/en-us/graph/api/group-post-groups
+            requests.append({
+                'id': f"{index}-create",
+                'method': 'POST',
+                'url': '/groups',
+                'body': body,
+            })
+            continue
+
+        if 'update' in actions:
+            # https://learn.microsoft.com/en-us/graph/api/group-update
+            requests.append({
+                'id': f"{index}-update",
+                'method': 'PATCH',
+                'url': f"/groups/{resource['id']}",
+                'body': body,
+            })
+
+        if add or remove:
+            requests.append(license_request(f"{index}-licenses", resource['id'], add, remove))
+
+        if 'delete' in actions:
+            # https://learn.microsoft.com/en-us/graph/api/group-delete
+            requests.append({
+                'id': f"{index}-delete",
+                'method': 'DELETE',
+                'url': f"/groups/{resource['id']}",
+                'dependsOn': [f"{index}-licenses"] if remove else [],
+            })
+
+    return requests
+
+
+def apply_groups(module, access_token, plans, sku_names):
+    """
+    Create, update and delete all groups and change their licenses with as
+    few batches as possible.  Created groups get their licenses in a second
+    round, once their id is known.
+    """
+    responses = graph_batch(module, access_token, group_requests(plans))
+
+    created = []
+    for index, (group, resource, actions, _, (add, remove), group_result) in enumerate(plans):
+        if 'create' not in actions and (add or remove):
+            response = responses[f"{index}-licenses"]
+            if response['status'] >= 400:
+                mark_failed(
+                    group_result,
+                    f"ERROR while changing the licenses of group {group['displayName']}: {graph_error(response)}"
+                )
+            else:
+                group_result['licenses_added'] = sorted(sku_names.get(sku_id, sku_id) for sku_id in add)
+                group_result['licenses_removed'] = sorted(sku_names.get(sku_id, sku_id) for sku_id in remove)
+
+        for action in actions:
+            response = responses[f"{index}-{action}"]
+            if response['status'] >= 400:
+                mark_failed(
+                    group_result,
+                    f"ERROR during {action} of group {group['displayName']}: {graph_error(response)}"
+                )
+                continue
+
+            group_result[ACTION_RESULTS[action]] = True
+            if action == 'create':
+                group_result['id'] = response['body']['id']
+                if add:
+                    created.append(index)
+
+    responses = graph_batch(module, access_token, [
+        license_request(f"{index}-licenses", plans[index][5]['id'], plans[index][4][0], set())
+        for index in created
+    ])
+
+    for index in created:
+        group, _, _, _, (add, _), group_result = plans[index]
+        response = responses[f"{index}-licenses"]
+        if response['status'] >= 400:
+            mark_failed(
+                group_result,
+                f"ERROR while changing the licenses of group {group['displayName']}: {graph_error(response)}"
+            )
+            continue
+        group_result['licenses_added'] = sorted(sku_names.get(sku_id, sku_id) for sku_id in add)
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        access_token=dict(type='str', required=True, no_log=True),
+        groups=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                displayName=dict(type='str', required=True),
+                description=dict(type='str', required=False),
+                licenses=dict(type='list', elements='str', required=False, default=[]),
+                state=dict(choices=['present', 'absent'], default='present'),
+            ),
+        ),
+        delta_state_file=dict(type='path', required=False),
+        max_retries=dict(type='int', required=False, default=5),
+        retry_budget=dict(type='int', required=False, default=300),
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    # vars for easier usage
+    access_token = module.params['access_token']
+    groups = module.params['groups']
+    RETRY.configure(module.params['max_retries'], module.params['retry_budget'])
+
+    mirror = None
+    delta_resync = None
+    if module.params['delta_state_file']:
+        mirror, delta_resync = delta_sync(module, access_token, module.params['delta_state_file'])
+
+    sku_ids, index = load(module, access_token, mirror)
+    sku_names = {sku_id: name for name, sku_id in sku_ids.items()}
+
+    unknown_licenses = sorted({
+        name for group in groups for name in group['licenses'] if name not in sku_ids
+    })
+    for name in unknown_licenses:
+        module.warn(f"license {name} is not part of any subscription")
+
+    # figure out what needs to be done for every group
+    plans = []
+    for group in groups:
+        resources = index.get(group['displayName'], [])
+        resource = resources[0] if resources else None
+        group_result = dict(
+            displayName=group['displayName'],
+            id=resource['id'] if resource is not None else None,
+            changed=False,
+            created=False,
+            updated=False,
+            deleted=False,
+            licenses_added=[],
+            licenses_removed=[],
+        )
+
+        if len(resources) > 1:
+            # display names are not unique, but we can not tell which one is meant
+            mark_failed(
+                group_result,
+                f"{len(resources)} groups are named {group['displayName']}"
+            )
+            group_result['id'] = None
+            plans.append((group, None, [], None, (set(), set()), group_result))
+            continue
+
+        actions, body, add, remove = plan_group(group, resource, sku_ids)
+        plans.append((group, resource, actions, body, (add, remove), group_result))
+
+    if module.check_mode:
+        # just report what would have been done
+        for _, _, actions, _, (add, remove), group_result in plans:
+            for action in actions:
+                group_result[ACTION_RESULTS[action]] = True
+            group_result['licenses_added'] = sorted(sku_names[sku_id] for sku_id in add)
+            group_result['licenses_removed'] = sorted(sku_names.get(sku_id, sku_id) for sku_id in remove)
+    else:
+        apply_groups(module, access_token, plans, sku_names)
+
+    results = [plan[5] for plan in plans]
+    for group_result in results:
+        group_result['changed'] = any(group_result[key] for key in ACTION_RESULTS.values()) \
+            or bool(group_result['licenses_added'] or group_result['licenses_removed'])
+
+    succeeded = [group_result for group_result in results if not group_result.get('failed')]
+    summary = {
+        key: sum(1 for group_result in succeeded if group_result[key])
+        for key in ACTION_RESULTS.values()
+    }
+    summary['failed'] = len(results) - len(succeeded)
+
+    result = dict(
+        changed=any(group_result['changed'] for group_result in results),
+        groups=results,
+        summary=summary,
+        unknown_licenses=unknown_licenses,
+    )
+    if delta_resync is not None:
+        result['delta_resync'] = delta_resync
+
+    if summary['failed']:
+        module.fail_json(
+            msg=f"failed to manage {summary['failed']} group(s)",
+            **result,
+            **RETRY.stats()
+        )
+
+    module.exit_json(**result, **RETRY.stats())
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
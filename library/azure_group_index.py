@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.azure import group_index
+from ansible.module_utils.scim import RETRY
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: azure_group_index
+
+short_description: Index the Azure groups by their display name
+
+version_added: "4.0"
+
+description:
+  - "This module loads all groups of an Azure AD tenant with a single paged
+    listing (`$select=id,displayName`, `$top=999`) and returns an index of
+    display name -> group ids."
+  - "Register its result once per play and hand `groups` to
+    `azure_graph_user` (as `group_index`), so that requested groups do not
+    have to be looked up one by one for every user."
+  - "Display names are not unique in Azure AD, names used by more than one
+    group are reported as `duplicates`."
+
+options:
+  access_token:
+    description:
+      - An access token for the Graph API, e.g. from `azure_token`.
+    required: true
+  max_retries:
+    description:
+      - How often a request is sent again if Graph throttles it.
+      - Default is '5'.
+    required: false
+  retry_budget:
+    description:
+      - The maximum number of seconds to spend waiting for retries during
+        the whole module run.
+      - Default is '300'.
+    required: false
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Index Azure groups
+  azure_group_index:
+    access_token: "{{ azure_client_credentials.access_token }}"
+  register: azure_group_index
+
+- name: Manage an Azure user
+  azure_graph_user:
+    access_token: "{{ azure_client_credentials.access_token }}"
+    username: "peter.quill@guardians.com"
+    displayName: "Peter Quill"
+    groups:
+      - Guardians
+    group_index: "{{ azure_group_index.groups }}"
+'''
+
+RETURN = '''
+groups:
+    description: A dict of display name -> list of the ids of the groups with this name
+    type: dict
+    returned: always
+duplicates:
+    description: The display names which are used by more than one group
+    type: list
+    returned: always
+count:
+    description: The number of groups
+    type: int
+    returned: always
+retries:
+    description: How many requests got retried
+    type: int
+    returned: always
+retry_sleep:
+    description: How many seconds were spent waiting for retries
+    type: float
+    returned: always
+'''
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        access_token=dict(type='str', required=True, no_log=True),
+        max_retries=dict(type='int', required=False, default=5),
+        retry_budget=dict(type='int', required=False, default=300),
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    RETRY.configure(module.params['max_retries'], module.params['retry_budget'])
+
+    index, duplicates = group_index(module, module.params['access_token'])
+    for name in duplicates:
+        module.warn(f"{len(index[name])} groups are named {name}")
+
+    module.exit_json(
+        changed=False,
+        groups={name: [group['id'] for group in groups] for name, groups in index.items()},
+        duplicates=duplicates,
+        count=sum(len(groups) for groups in index.values()),
+        **RETRY.stats()
+    )
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
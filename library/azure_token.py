@@ -0,0 +1,127 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.azure import GRAPH_SCOPE, graph_token
+
+import time
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: azure_token
+
+short_description: Get a (cached) access token for the Microsoft Graph API
+
+version_added: "4.0"
+
+description:
+  - "This module returns an access token of an Azure app registration,
+    requested with the client credentials flow."
+  - "Tokens are cached on disk per tenant, client and scope and shared by all
+    module runs until they are about to expire, so that looping over users or
+    groups does not request a new token for every single item."
+
+options:
+  tenant_id:
+    description:
+      - The id of the Azure tenant.
+    required: true
+  client_id:
+    description:
+      - The application (client) id of the app registration.
+    required: true
+  client_secret:
+    description:
+      - A client secret of the app registration.
+    required: true
+  scope:
+    description:
+      - The scope to request the token for.
+      - Default is 'https://graph.microsoft.com/.default'.
+    required: false
+  token_cache_dir:
+    description:
+      - Directory in which the access tokens are cached. Set to an empty
+        string to disable the cache.
+      - Default is '~/.cache/ansible-iam/tokens'.
+    required: false
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Get Azure Graph API Token
+  azure_token:
+    tenant_id: "{{ azure_tenant_id }}"
+    client_id: "{{ azure_client_id }}"
+    client_secret: "{{ azure_client_secret }}"
+  register: azure_client_credentials
+  no_log: true
+
+- name: Use it
+  uri:
+    url: "https://graph.microsoft.com/v1.0/users"
+    headers:
+      Authorization: "Bearer {{ azure_client_credentials.access_token }}"
+'''
+
+RETURN = '''
+access_token:
+    description: The access token
+    type: str
+    returned: always
+expires_in:
+    description: The number of seconds the access token is still valid
+    type: int
+    returned: always
+cached:
+    description: Whether the access token was taken from the cache
+    type: boolean
+    returned: always
+'''
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        tenant_id=dict(type='str', required=True),
+        client_id=dict(type='str', required=True),
+        client_secret=dict(type='str', required=True, no_log=True),
+        scope=dict(type='str', required=False, default=GRAPH_SCOPE),
+        token_cache_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/tokens'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    token, expiry, cached = graph_token(
+        module,
+        module.params['tenant_id'],
+        module.params['client_id'],
+        module.params['client_secret'],
+        module.params['scope'],
+        module.params['token_cache_dir'],
+    )
+
+    module.exit_json(
+        changed=False,
+        access_token=token,
+        expires_in=int(expiry - time.time()),
+        cached=cached,
+    )
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 #!/usr/bin/python
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.gsuite import (
+    build_service,
+    configure_quota,
+    execute,
+    execute_batch,
+    list_items,
+    service_account_credentials,
+)
 
 import json
 import time
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
 
 ANSIBLE_METADATA = {
     'metadata_version': '1.1',
@@ -23,6 +29,7 @@ version_added: "2.8"
 
 description:
   - "With this module you can create, modify, disable and delete Google G Suite groups."
+  - "It either manages a single group, or a whole list of groups at once when `groups` is given. In list mode all groups of the domain (including their aliases) are loaded with a single paged `groups().list`. Only the needed inserts, patches, deletes, alias changes and settings patches are then sent, as batch requests."
 
 options:
   google_private_key:
@@ -36,15 +43,18 @@ options:
   email:
     description:
       - The email of the group (unique)
-    required: true
+      - Required unless `groups` is given.
+    required: false
   name:
     description:
       - The name of the group
-    required: true
+      - Required unless `groups` is given.
+    required: false
   description:
     description:
       - The description of the group
-    required: true
+      - Required unless `groups` is given.
+    required: false
   aliases:
     description:
       - A list of alias email addresses
@@ -52,12 +62,47 @@ options:
   group_settings:
     description:
       - Group settings to set.  See https://developers.google.com/admin-sdk/groups-settings/v1/reference/groups for more information.
+      - Only the settings which differ from the current ones are sent.
       - Defaults to `{ }`
     required: false
+  discovery_cache_dir:
+    description:
+      - Directory in which the discovery documents of the Google APIs are cached between runs. Set to an empty string to disable the cache.
+      - Documents placed there as `<api>.<version>.json` (e.g. `groupssettings.v1.json`) are used as is and never expire.
+      - Default is '~/.cache/ansible-iam/discovery'.
+    required: false
+  token_cache_dir:
+    description:
+      - Directory in which the OAuth access tokens of the service account are cached, so that all module runs share them until they are about to expire. Set to an empty string to disable the cache.
+      - Default is '~/.cache/ansible-iam/tokens'.
+    required: false
+  quota_state_dir:
+    description:
+      - Directory in which the state of the quota limiter is kept, so that all module runs on this host (e.g. the forks of a playbook run) share the quotas given by `quota_per_user` and `quota_per_project`.
+      - Default is '~/.cache/ansible-iam/quota'.
+    required: false
+  quota_per_user:
+    description:
+      - The maximum number of API queries per 100 seconds made as `google_subject`. Requests which would exceed it wait until they fit in again.
+      - Requests throttled by Google anyway (403 `rateLimitExceeded` or 429) are retried with exponential backoff.
+      - Default is '0', no limit.
+    required: false
+  quota_per_project:
+    description:
+      - The maximum number of API queries per 100 seconds made with the Google Cloud project of the service account.
+      - Default is '0', no limit.
+    required: false
   state:
     description:
       - Default is 'present'. If 'absent' user will be deleted.
     required: false
+  groups:
+    description:
+      - A list of groups to manage in one go. Every entry takes the same options as a single group (`email`, `name`, `description`, `aliases`, `group_settings` and `state`).
+      - Options which are not set on an entry fall back to the value given to the module itself.
+      - Groups of the domain which are not part of this list are not touched.
+      - Mutually exclusive with `email`, `name` and `description`.
+    required: false
 
 extends_documentation_fragment:
   - gsuite
@@ -79,6 +124,23 @@ EXAMPLES = '''
       whoCanViewMembership: "ALL_IN_DOMAIN_CAN_VIEW"
       whoCanPostMessage: "ALL_IN_DOMAIN_CAN_POST"
     state: present
+
+- name: Manage all GSuite groups at once
+  gsuite_group:
+    google_private_key: '{{ google_private_key }}'
+    google_subject: 'admin@example.com'
+    group_settings:
+      whoCanViewGroup: "ALL_IN_DOMAIN_CAN_VIEW"
+    groups:
+      - name: 'Some Group'
+        email: 'somegroup@example.com'
+        description: 'This is some group for testing'
+        aliases:
+          - 'some@example.com'
+      - name: 'Old Group'
+        email: 'oldgroup@example.com'
+        description: 'This group is no longer needed'
+        state: absent
 '''
 
 RETURN = '''
@@ -102,6 +164,14 @@ group_delete:
   description: Information about deleting the group
   type: dict
   returned: always
+groups:
+  description: The result of every group in list mode (`email`, `changed`, `created`, `updated`, `deleted`, and for present groups `aliases_added`, `aliases_removed` and `settings_updated`). Failed groups have `failed` and `msg` set.
+  type: list
+  returned: when groups is given
+summary:
+  description: The number of groups which got created, updated, deleted or failed in list mode
+  type: dict
+  returned: when groups is given
 '''
 
 SCOPES = {
@@ -113,20 +183,28 @@ SCOPES = {
     ]
 }
 
+# these should be changed via other means, not by group_settings; or just
+# don't make sense here
+SETTINGS_KEYS_TO_EXCLUDE = {'email', 'description', 'kind', 'name'}
 
-def google_directory(privateKey, subject):
-    creds = service_account.Credentials.from_service_account_info(
-        privateKey, scopes=SCOPES['directory'], subject=subject
+# only the fields we actually use are requested (partial responses)
+# https://developers.google.com/admin-sdk/directory/v1/guides/performance#partial
+GROUP_FIELDS = 'email,name,description,aliases,nonEditableAliases'
+
+
+def google_directory(privateKey, subject, cacheDir, tokenCacheDir):
+    creds = service_account_credentials(
+        privateKey, SCOPES['directory'], subject, tokenCacheDir
     )
-    service = build('admin', 'directory_v1', credentials=creds)
+    service = build_service('admin', 'directory_v1', creds, cacheDir)
     return service
 
 
-def google_groups_settings(privateKey, subject):
-    creds = service_account.Credentials.from_service_account_info(
-        privateKey, scopes=SCOPES['groups_settings'], subject=subject
+def google_groups_settings(privateKey, subject, cacheDir, tokenCacheDir):
+    creds = service_account_credentials(
+        privateKey, SCOPES['groups_settings'], subject, tokenCacheDir
     )
-    service = build('groupssettings', 'v1', credentials=creds)
+    service = build_service('groupssettings', 'v1', creds, cacheDir)
     return service
 
 
@@ -139,7 +217,7 @@ def group_get(module, gDirectory, email):
         #
         # this raises googleapiclient.errors.HttpError if groupKey does not
         # exist:
-        group = gDirectory.groups().get(groupKey=email).execute()
+        group = execute(gDirectory.groups().get(groupKey=email, fields='email'))
 
         # ensure we have the real email and not an alias
         primary_email = group['email']
@@ -171,7 +249,7 @@ def group_insert(module, gDirectory, email, name, description):
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#insert
-        gDirectory.groups().insert(body=groupInsert).execute()
+        execute(gDirectory.groups().insert(body=groupInsert))
         changed = True
         message = f"Group created: {email}"
     except Exception as e:
@@ -192,7 +270,7 @@ def group_patch(module, gDirectory, email, name, description):
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#patch
-        gDirectory.groups().patch(groupKey=email, body=groupPatch).execute()
+        execute(gDirectory.groups().patch(groupKey=email, body=groupPatch))
 
         # FIXME: ideally this should be only True if it was really changed
         changed = True
@@ -209,7 +287,7 @@ def group_delete(module, gDirectory, email):
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#delete
-        gDirectory.groups().delete(groupKey=email).execute()
+        execute(gDirectory.groups().delete(groupKey=email))
         changed = True
         message = f"Group deleted: {email}"
     except Exception as e:
@@ -258,7 +336,9 @@ def aliases_upsert(module, gDirectory, email, aliases):
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.aliases.html#list
-        response = gDirectory.groups().aliases().list(groupKey=email).execute()
+        response = execute(gDirectory.groups().aliases().list(
+            groupKey=email, fields='aliases(alias)'
+        ))
         # Ruby: `response["aliases"].map { |obj| obj["alias"] }`
         existing_aliases = [obj["alias"] for obj in response["aliases"]]
     except Exception:
@@ -273,10 +353,10 @@ def aliases_upsert(module, gDirectory, email, aliases):
     for alias in aliases_to_be_added:
         try:
             # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.aliases.html#insert
-            gDirectory.groups().aliases().insert(
+            execute(gDirectory.groups().aliases().insert(
                 groupKey=email,
                 body={"alias": alias}
-            ).execute()
+            ))
             changed = True
         except Exception as e:
             module.fail_json(
@@ -286,10 +366,10 @@ def aliases_upsert(module, gDirectory, email, aliases):
     for alias in aliases_to_be_removed:
         try:
             # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.aliases.html#delete
-            gDirectory.groups().aliases().delete(
+            execute(gDirectory.groups().aliases().delete(
                 groupKey=email,
                 alias=alias
-            ).execute()
+            ))
             changed = True
         except Exception as e:
             module.fail_json(
@@ -303,45 +383,416 @@ def aliases_upsert(module, gDirectory, email, aliases):
     return True, changed, message
 
 
+def settings_value(value):
+    # the Groups Settings API returns all settings as strings, even booleans
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def groups_settings_changes(gGroupsSettings, group_settings):
+    """
+    Compare the settings of many groups with the desired ones.
+
+    `group_settings` is a dict of group email -> desired settings.  The
+    current settings are fetched in batches, each only with the keys that
+    are requested for the group.
+
+    Returns a dict of group email -> (settings which differ, exception).
+    """
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/groupssettings_v1.groups.html#get
+    responses = execute_batch(gGroupsSettings, {
+        email: gGroupsSettings.groups().get(
+            groupUniqueId=email,
+            fields=','.join(sorted(settings))
+        )
+        for email, settings in group_settings.items()
+    })
+
+    changes = {}
+    for email, (current, error) in responses.items():
+        if error is not None:
+            changes[email] = (None, error)
+            continue
+
+        changes[email] = ({
+            key: value
+            for key, value in group_settings[email].items()
+            if key not in current
+            or settings_value(current[key]) != settings_value(value)
+        }, None)
+
+    return changes
+
+
+def groups_settings_patch(gGroupsSettings, group_settings):
+    """
+    Patch the settings of many groups in batches.
+
+    Returns a dict of group email -> exception (`None` on success).
+    """
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/groupssettings_v1.groups.html#patch
+    responses = execute_batch(gGroupsSettings, {
+        email: gGroupsSettings.groups().patch(
+            groupUniqueId=email,
+            body=body,
+            fields='email'
+        )
+        for email, body in group_settings.items()
+    })
+
+    return {email: error for email, (_, error) in responses.items()}
+
+
 def groups_settings_update(module, gGroupsSettings, email, group_settings):
     changed = False
     message = "Didn't touch the group settings."
 
-    # these should be changed via other means, not by group_settings; or just
-    # don't make sense here
-    keys_to_exclude = {'email', 'description', 'kind', 'name'}
-    body = {k:v for k,v in iter(group_settings.items()) if k not in keys_to_exclude}
+    body = {k:v for k,v in iter(group_settings.items()) if k not in SETTINGS_KEYS_TO_EXCLUDE}
 
     if not body:  # you have to read this as: "if body is empty:"
         # no need to change anything
         return True, changed, message
 
+    # only patch the settings which differ from the current ones
+    changes, error = groups_settings_changes(gGroupsSettings, {email: body})[email]
+    if error is not None:
+        module.fail_json(
+            msg=f"ERROR reading group settings for group {email}: {error}"
+        )
+
+    if not changes:
+        return True, changed, "Group settings are up to date."
+
+    error = groups_settings_patch(gGroupsSettings, {email: changes})[email]
+    if error is not None:
+        module.fail_json(
+            msg=f"ERROR updating group settings for group {email}: {error}"
+        )
+
+    changed = True
+    message = f"Group settings updated: {email} ({', '.join(sorted(changes))})"
+
+    return True, changed, message
+
+
+GROUP_OPTIONS = [
+    'email',
+    'name',
+    'description',
+    'aliases',
+    'group_settings',
+    'state',
+]
+
+# result key of every planned action in list mode
+ACTION_RESULTS = {
+    'insert': 'created',
+    'patch': 'updated',
+    'delete': 'deleted',
+}
+
+
+def group_params(module, entry):
+    """Merge an entry of `groups` with the module-wide defaults."""
+    group = {}
+
+    for option in GROUP_OPTIONS:
+        value = entry.get(option)
+        if value is None:
+            value = module.params[option]
+        group[option] = value
+
+    return group
+
+
+def groups_snapshot(gDirectory):
+    """
+    Load all groups of the domain with one paged `groups().list` and index
+    them by their email and aliases (all lower case).
+    """
+    index = {}
+
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#list
+    groups = list_items(
+        gDirectory.groups(),
+        gDirectory.groups().list(
+            customer='my_customer',
+            maxResults=200,
+            fields=f'groups({GROUP_FIELDS}),nextPageToken'
+        ),
+        'groups'
+    )
+    for group in groups:
+        addresses = [group['email']] + group.get('aliases', []) \
+            + group.get('nonEditableAliases', [])
+        for address in addresses:
+            index[address.lower()] = group
+
+    return index
+
+
+def plan_group(group, resource):
+    """
+    Compare a group with its resource from the snapshot (`None` if the group
+    does not exist).
+
+    Returns the list of actions needed (`insert`, `patch` and `delete`) and
+    the body of the insert or patch request.
+    """
+    if group['state'] == 'absent':
+        if resource is None:
+            return [], None
+        return ['delete'], None
+
+    body = {
+        "email": group['email'],
+        "name": group['name'],
+        "description": group['description'],
+    }
+    if resource is None:
+        return ['insert'], body
+
+    changes = {
+        key: value for key, value in body.items()
+        if key != 'email' and resource.get(key, '') != value
+    }
+    if changes:
+        return ['patch'], changes
+
+    return [], None
+
+
+def mark_failed(group_result, message):
+    # keep the first error of a group, later ones are most likely caused by it
+    if not group_result.get('failed'):
+        group_result['failed'] = True
+        group_result['msg'] = message
+
+
+def apply_actions(gDirectory, plans):
+    """Insert, patch and delete all groups in batch requests."""
+    requests = {}
+    for index, (group, _, actions, body, group_result) in enumerate(plans):
+        if group_result.get('failed'):
+            continue
+
+        email = group['email']
+        for action in actions:
+            request_id = f"{index}-{action}"
+            if action == 'insert':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#insert
+                requests[request_id] = gDirectory.groups().insert(
+                    body=body, fields='email'
+                )
+            elif action == 'patch':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#patch
+                requests[request_id] = gDirectory.groups().patch(
+                    groupKey=email, body=body, fields='email'
+                )
+            elif action == 'delete':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#delete
+                requests[request_id] = gDirectory.groups().delete(
+                    groupKey=email
+                )
+
+    responses = execute_batch(gDirectory, requests)
+    for request_id, (_, error) in responses.items():
+        index, action = request_id.split('-', 1)
+        group_result = plans[int(index)][4]
+
+        if error is None:
+            group_result[ACTION_RESULTS[action]] = True
+            group_result['changed'] = True
+        else:
+            mark_failed(
+                group_result,
+                f"ERROR during {action} of group {group_result['email']}: "
+                + f"{error}"
+            )
+
+
+def apply_aliases(gDirectory, plans):
+    """
+    Bring the aliases of all present groups in line with `aliases`, in batch
+    requests.
+    """
+    requests = {}
+    changes = {}
+    for index, (group, resource, _, _, group_result) in enumerate(plans):
+        if group['state'] != 'present' or group_result.get('failed'):
+            continue
+
+        email = group['email']
+        group_result.update(aliases_added=[], aliases_removed=[])
+
+        existing = {}
+        if resource is not None:
+            existing = {alias.lower(): alias for alias in resource.get('aliases', [])}
+        desired = {alias.lower(): alias for alias in group['aliases']}
+
+        for alias in desired.keys() - existing.keys():
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.aliases.html#insert
+            request_id = f"{index}-alias-{len(changes)}"
+            requests[request_id] = gDirectory.groups().aliases().insert(
+                groupKey=email, body={"alias": desired[alias]}
+            )
+            changes[request_id] = ('aliases_added', desired[alias])
+
+        for alias in existing.keys() - desired.keys():
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.aliases.html#delete
+            request_id = f"{index}-alias-{len(changes)}"
+            requests[request_id] = gDirectory.groups().aliases().delete(
+                groupKey=email, alias=existing[alias]
+            )
+            changes[request_id] = ('aliases_removed', existing[alias])
+
+    responses = execute_batch(gDirectory, requests)
+    for request_id, (_, error) in responses.items():
+        group_result = plans[int(request_id.split('-', 1)[0])][4]
+        key, alias = changes[request_id]
+
+        if error is None:
+            group_result[key].append(alias)
+            group_result['changed'] = True
+        else:
+            mark_failed(
+                group_result,
+                f"ERROR while changing alias {alias} of group "
+                + f"{group_result['email']}: {error}"
+            )
+
+
+def apply_settings(gGroupsSettings, plans):
+    """
+    Patch the settings of all present groups which differ from
+    `group_settings`, reading and patching them in batch requests.
+    """
+    results = {}
+    group_settings = {}
+    for group, _, _, _, group_result in plans:
+        if group['state'] != 'present' or group_result.get('failed'):
+            continue
+
+        group_result['settings_updated'] = []
+        body = {
+            k: v for k, v in group['group_settings'].items()
+            if k not in SETTINGS_KEYS_TO_EXCLUDE
+        }
+        if body:
+            results[group['email']] = group_result
+            group_settings[group['email']] = body
+
+    settings_changes = {}
+    for email, (changes, error) in \
+            groups_settings_changes(gGroupsSettings, group_settings).items():
+        if error is not None:
+            mark_failed(
+                results[email],
+                f"ERROR reading group settings for group {email}: {error}"
+            )
+        elif changes:
+            settings_changes[email] = changes
+
+    errors = groups_settings_patch(gGroupsSettings, settings_changes)
+    for email, error in errors.items():
+        if error is None:
+            results[email]['settings_updated'] = sorted(settings_changes[email])
+            results[email]['changed'] = True
+        else:
+            mark_failed(
+                results[email],
+                f"ERROR updating group settings for group {email}: {error}"
+            )
+
+
+def run_groups(module, gDirectory, gGroupsSettings):
+    groups = [group_params(module, entry) for entry in module.params['groups']]
+
     try:
-        # https://googleapis.github.io/google-api-python-client/docs/dyn/groupssettings_v1.groups.html#patch
-        gGroupsSettings.groups().patch(
-            groupUniqueId=email,
-            body=body,
-        ).execute()
-        changed = True
-        message = f"Group settings updated: {email}"
+        index = groups_snapshot(gDirectory)
+    except Exception as e:
+        module.fail_json(msg=f"ERROR while loading all groups: {e}")
+
+    # figure out what needs to be done for every group
+    plans = []
+    for group in groups:
+        email = group['email']
+        resource = index.get(email.lower())
+        group_result = dict(
+            email=email,
+            changed=False,
+            created=False,
+            updated=False,
+            deleted=False,
+        )
+
+        if resource is not None and resource['email'].lower() != email.lower():
+            # to avoid surprises fail if the email provided is NOT the primary email
+            mark_failed(
+                group_result,
+                f"Group exists, but {email} is an alias for {resource['email']}"
+            )
+            plans.append((group, resource, [], None, group_result))
+            continue
+
+        actions, body = plan_group(group, resource)
+        plans.append((group, resource, actions, body, group_result))
+
+    try:
+        apply_actions(gDirectory, plans)
+        apply_aliases(gDirectory, plans)
+        apply_settings(gGroupsSettings, plans)
     except Exception as e:
         module.fail_json(
-            msg=f"ERROR updating group settings for group {email}: {e}"
+            msg=f"ERROR while managing groups: {e}",
+            groups=[plan[4] for plan in plans]
         )
 
-    return True, changed, message
+    results = [plan[4] for plan in plans]
+    succeeded = [group_result for group_result in results if not group_result.get('failed')]
+    summary = {
+        key: sum(1 for group_result in succeeded if group_result[key])
+        for key in ACTION_RESULTS.values()
+    }
+    summary['failed'] = len(results) - len(succeeded)
+
+    return dict(
+        changed=any(group_result['changed'] for group_result in results),
+        groups=results,
+        summary=summary,
+    )
+
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
     module_args = dict(
         google_private_key=dict(type='json', required=True),
         google_subject=dict(type='str', required=True),
-        email=dict(type='str', required=True),
-        name=dict(type='str', required=True),
-        description=dict(type='str', required=True),
+        email=dict(type='str', required=False),
+        name=dict(type='str', required=False),
+        description=dict(type='str', required=False),
         aliases=dict(type='list', required=False, default=list()),
         group_settings=dict(type='dict', required=False, default={}),
-        state=dict(choices=['present', 'absent'], default='present')
+        discovery_cache_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/discovery'),
+        token_cache_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/tokens'),
+        quota_state_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/quota'),
+        quota_per_user=dict(type='int', required=False, default=0),
+        quota_per_project=dict(type='int', required=False, default=0),
+        state=dict(choices=['present', 'absent'], default='present'),
+        groups=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                email=dict(type='str', required=True),
+                name=dict(type='str', required=True),
+                description=dict(type='str', required=True),
+                aliases=dict(type='list', required=False),
+                group_settings=dict(type='dict', required=False),
+                state=dict(choices=['present', 'absent'], required=False),
+            ),
+        ),
     )
 
     # seed the result dict in the object
@@ -370,6 +821,17 @@ def run_module():
     # supports check mode
     module = AnsibleModule(
         argument_spec=module_args,
+        required_one_of=[
+            ('groups', 'email'),
+        ],
+        required_together=[
+            ('email', 'name', 'description'),
+        ],
+        mutually_exclusive=[
+            ('groups', 'email'),
+            ('groups', 'name'),
+            ('groups', 'description'),
+        ],
         supports_check_mode=True
     )
 
@@ -383,8 +845,27 @@ def run_module():
     # part where your module will do what it needs to do)
     g_private_key = json.loads(module.params['google_private_key'])
     g_subject = module.params['google_subject']
-    gDirectory = google_directory(g_private_key, g_subject)
-    gGroupsSettings = google_groups_settings(g_private_key, g_subject)
+    g_cache_dir = module.params['discovery_cache_dir']
+    g_token_cache_dir = module.params['token_cache_dir']
+    configure_quota(
+        g_private_key,
+        g_subject,
+        module.params['quota_state_dir'],
+        module.params['quota_per_user'],
+        module.params['quota_per_project'],
+    )
+    gDirectory = google_directory(g_private_key, g_subject, g_cache_dir, g_token_cache_dir)
+    gGroupsSettings = google_groups_settings(g_private_key, g_subject, g_cache_dir, g_token_cache_dir)
+
+    if module.params['groups'] is not None:
+        # list mode -> manage all groups at once
+        result = run_groups(module, gDirectory, gGroupsSettings)
+
+        failed = result['summary']['failed']
+        if failed:
+            module.fail_json(msg=f"failed to manage {failed} group(s)", **result)
+
+        module.exit_json(**result)
 
     try:
         group_exists, _ = group_get(module, gDirectory, module.params['email'])
@@ -0,0 +1,321 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.gsuite import (
+    build_service,
+    configure_quota,
+    execute_batch,
+    list_items,
+    service_account_credentials,
+)
+
+import json
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: gsuite_group_members
+
+short_description: Managing the members of a Google G Suite group
+
+version_added: "4.0"
+
+description:
+  - "With this module you can manage who is a member of a Google G Suite group, and with which role."
+  - "The current members are read with a paged `members().list`, compared with the desired members, and only the needed inserts, deletes and role updates are sent, as batch requests."
+
+options:
+  google_private_key:
+    description:
+      - The private key to authenticate to the Google API. Create it for your service account: https://console.cloud.google.com/projectselector2/iam-admin/serviceaccounts?supportedpurview=project
+    required: true
+  google_subject:
+    description:
+      - The email address of the account you want to impersonate. Google is a bit fishy here: https://stackoverflow.com/questions/60262432/service-account-not-authorized-to-access-this-resource-api-while-trying-to-acces/60262433#60262433
+    required: true
+  group:
+    description:
+      - The email (or an alias) of the group
+    required: true
+  members:
+    description:
+      - A dictionary of member email -> role (`MEMBER`, `MANAGER` or `OWNER`).
+      - Members of the group which are not part of this dictionary are removed from it.
+    required: true
+  discovery_cache_dir:
+    description:
+      - Directory in which the discovery documents of the Google APIs are cached between runs. Set to an empty string to disable the cache.
+      - Documents placed there as `<api>.<version>.json` (e.g. `admin.directory_v1.json`) are used as is and never expire.
+      - Default is '~/.cache/ansible-iam/discovery'.
+    required: false
+  token_cache_dir:
+    description:
+      - Directory in which the OAuth access tokens of the service account are cached, so that all module runs share them until they are about to expire. Set to an empty string to disable the cache.
+      - Default is '~/.cache/ansible-iam/tokens'.
+    required: false
+  quota_state_dir:
+    description:
+      - Directory in which the state of the quota limiter is kept, so that all module runs on this host (e.g. the forks of a playbook run) share the quotas given by `quota_per_user` and `quota_per_project`.
+      - Default is '~/.cache/ansible-iam/quota'.
+    required: false
+  quota_per_user:
+    description:
+      - The maximum number of API queries per 100 seconds made as `google_subject`. Requests which would exceed it wait until they fit in again.
+      - Requests throttled by Google anyway (403 `rateLimitExceeded` or 429) are retried with exponential backoff.
+      - Default is '0', no limit.
+    required: false
+  quota_per_project:
+    description:
+      - The maximum number of API queries per 100 seconds made with the Google Cloud project of the service account.
+      - Default is '0', no limit.
+    required: false
+
+extends_documentation_fragment:
+  - gsuite
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Manage the members of a GSuite group
+  gsuite_group_members:
+    google_private_key: '{{ google_private_key }}'
+    google_subject: 'admin@example.com'
+    group: 'somegroup@example.com'
+    members:
+      john.doe@example.com: OWNER
+      jane.doe@example.com: MEMBER
+      otherteam@example.com: MEMBER
+'''
+
+RETURN = '''
+changed:
+  description: Returns if anything has changed
+  type: boolean
+  returned: always
+added:
+  description: The members which got added to the group
+  type: list
+  returned: always
+removed:
+  description: The members which got removed from the group
+  type: list
+  returned: always
+updated:
+  description: The members whose role got changed
+  type: list
+  returned: always
+'''
+
+SCOPES = [
+    'https://www.googleapis.com/auth/admin.directory.group',
+]
+
+# only the fields we actually use are requested (partial responses)
+# https://developers.google.com/admin-sdk/directory/v1/guides/performance#partial
+MEMBER_FIELDS = 'email,role'
+
+
+def google_directory(privateKey, subject, cacheDir, tokenCacheDir):
+    creds = service_account_credentials(
+        privateKey, SCOPES, subject, tokenCacheDir
+    )
+    service = build_service('admin', 'directory_v1', creds, cacheDir)
+    return service
+
+
+def group_members(gDirectory, group):
+    """
+    Yield all direct members of the group, following the pages of the
+    listing.  Only the email and role of the members are requested.
+    """
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#list
+    yield from list_items(
+        gDirectory.members(),
+        gDirectory.members().list(
+            groupKey=group,
+            maxResults=200,
+            fields=f'members({MEMBER_FIELDS}),nextPageToken'
+        ),
+        'members'
+    )
+
+
+def plan_members(current, desired):
+    """
+    Compare the current with the desired members (both dicts of lower case
+    email -> role).
+
+    Returns the sets of emails to add, to remove and to update.
+    """
+    add = desired.keys() - current.keys()
+    remove = current.keys() - desired.keys()
+    update = {
+        email for email in desired.keys() & current.keys()
+        if desired[email].upper() != current[email].upper()
+    }
+
+    return add, remove, update
+
+
+def apply_members(gDirectory, group, desired, add, remove, update):
+    """
+    Add, remove and update the members of the group in batch requests.
+
+    Returns a dict of email -> (change, exception), with change being one of
+    `added`, `removed` or `updated`.
+    """
+    requests = {}
+    changes = {}
+
+    for email in add:
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#insert
+        requests[email] = gDirectory.members().insert(
+            groupKey=group, body={
+                "email": email,
+                "role": desired[email]
+            }, fields='email'
+        )
+        changes[email] = 'added'
+
+    for email in remove:
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#delete
+        requests[email] = gDirectory.members().delete(
+            groupKey=group, memberKey=email
+        )
+        changes[email] = 'removed'
+
+    for email in update:
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#update
+        requests[email] = gDirectory.members().update(
+            groupKey=group, memberKey=email, body={
+                "role": desired[email]
+            }, fields='email'
+        )
+        changes[email] = 'updated'
+
+    responses = execute_batch(gDirectory, requests)
+
+    return {
+        email: (changes[email], error)
+        for email, (_, error) in responses.items()
+    }
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        google_private_key=dict(type='json', required=True),
+        google_subject=dict(type='str', required=True),
+        group=dict(type='str', required=True),
+        members=dict(type='dict', required=True),
+        discovery_cache_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/discovery'),
+        token_cache_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/tokens'),
+        quota_state_dir=dict(type='str', required=False, default='~/.cache/ansible-iam/quota'),
+        quota_per_user=dict(type='int', required=False, default=0),
+        quota_per_project=dict(type='int', required=False, default=0),
+    )
+
+    # seed the result dict in the object
+    # we primarily care about changed and state
+    # change is if this module effectively modified the target
+    # state will include any data that you want your module to pass back
+    # for consumption, for example, in a subsequent task
+    result = dict(
+        changed=False,
+        added=[],
+        removed=[],
+        updated=[],
+    )
+
+    # the AnsibleModule object will be our abstraction working with Ansible
+    # this includes instantiation, a couple of common attr would be the
+    # args/params passed to the execution, as well as if the module
+    # supports check mode
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    g_private_key = json.loads(module.params['google_private_key'])
+    g_subject = module.params['google_subject']
+    g_cache_dir = module.params['discovery_cache_dir']
+    g_token_cache_dir = module.params['token_cache_dir']
+    configure_quota(
+        g_private_key,
+        g_subject,
+        module.params['quota_state_dir'],
+        module.params['quota_per_user'],
+        module.params['quota_per_project'],
+    )
+    gDirectory = google_directory(g_private_key, g_subject, g_cache_dir, g_token_cache_dir)
+
+    group = module.params['group']
+    desired = {
+        email.lower(): role for email, role in module.params['members'].items()
+    }
+
+    try:
+        # members without an email (e.g. the whole customer) can not be
+        # managed here, so they are left alone
+        current = {
+            member['email'].lower(): member['role']
+            for member in group_members(gDirectory, group)
+            if 'email' in member
+        }
+    except Exception as e:
+        module.fail_json(
+            msg=f"ERROR while listing the members of group {group}: {e}",
+            **result
+        )
+
+    add, remove, update = plan_members(current, desired)
+
+    if module.check_mode:
+        # just report what would have been changed
+        result.update(
+            changed=bool(add or remove or update),
+            added=sorted(add),
+            removed=sorted(remove),
+            updated=sorted(update),
+        )
+        module.exit_json(**result)
+
+    try:
+        responses = apply_members(gDirectory, group, desired, add, remove, update)
+    except Exception as e:
+        module.fail_json(
+            msg=f"ERROR while changing the members of group {group}: {e}",
+            **result
+        )
+
+    failed = {}
+    for email, (change, error) in sorted(responses.items()):
+        if error is None:
+            result[change].append(email)
+            result['changed'] = True
+        else:
+            failed[email] = f"ERROR while changing member {email} ({change}): {error}"
+
+    if failed:
+        module.fail_json(
+            msg=f"failed to change {len(failed)} member(s) of group {group}",
+            failed=failed,
+            **result
+        )
+
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,20 @@
 #!/usr/bin/python
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.gsuite import (
+    build_service,
+    configure_quota,
+    execute,
+    execute_batch,
+    list_batch,
+    list_items,
+    service_account_credentials,
+    write_file,
+)
 
 import json
+import os
 import time
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
 
 ANSIBLE_METADATA = {
     'metadata_version': '1.1',
@@ -23,6 +32,7 @@ version_added: "2.8"
 
 description:
     - "With this module you can create, modify, disable and delete Google G Suite users and add them to groups."
+    - "It either manages a single user, or a whole list of users at once when `users` is given. In list mode all users of the domain are loaded with a single paged `users().list` and the members of all groups are loaded in batches. Only the needed inserts, patches, suspends, deletes, alias inserts and membership changes are then sent, as batch requests."
 
 options:
     google_private_key:
@@ -36,19 +46,23 @@ options:
     email:
         description:
             - The email of the user (unique)
-        required: true
+            - Required unless `users` is given.
+        required: false
     familyName:
         description:
             - The family name of the user
-        required: true
+            - Required unless `users` is given.
+        required: false
     givenName:
         description:
             - The given name of the user
-        required: true
+            - Required unless `users` is given.
+        required: false
     employeeId:
         description:
             - The employee ID of the user
-        required: true
+            - Required unless `users` is given.
+        required: false
     password:
         description:
             - The password of the user
@@ -77,10 +91,62 @@ options:
         description:
             - Email address of user to which data should be transfered on deletion. Leave empty for no transfer.
         required: false
+    discovery_cache_dir:
+        description:
+            - Directory in which the discovery documents of the Google APIs are cached between runs. Set to an empty string to disable the cache.
+            - Documents placed there as `<api>.<version>.json` (e.g. `admin.directory_v1.json`) are used as is and never expire.
+            - Default is '~/.cache/ansible-iam/discovery'.
+        required: false
+    token_cache_dir:
+        description:
+            - Directory in which the OAuth access tokens of the service account are cached, so that all module runs share them until they are about to expire. Set to an empty string to disable the cache.
+            - Default is '~/.cache/ansible-iam/tokens'.
+        required: false
+    quota_state_dir:
+        description:
+            - Directory in which the state of the quota limiter is kept, so that all module runs on this host (e.g. the forks of a playbook run) share the quotas given by `quota_per_user` and `quota_per_project`.
+            - Default is '~/.cache/ansible-iam/quota'.
+        required: false
+    quota_per_user:
+        description:
+            - The maximum number of API queries per 100 seconds made as `google_subject`. Requests which would exceed it wait until they fit in again.
+            - Requests throttled by Google anyway (403 `rateLimitExceeded` or 429) are retried with exponential backoff.
+            - Default is '0', no limit.
+        required: false
+    quota_per_project:
+        description:
+            - The maximum number of API queries per 100 seconds made with the Google Cloud project of the service account.
+            - Default is '0', no limit.
+        required: false
     state:
         description:
             - Default is 'present'. If 'absent' user will be deleted.
         required: false
+    users:
+        description:
+            - A list of users to manage in one go. Every entry takes the same options as a single user (`email`, `givenName`, `familyName`, `employeeId`, `password`, `changePasswordAtNextLogin`, `aliases`, `groups`, `suspended`, `orgUnitPath`, `transferUserEmail` and `state`).
+            - Options which are not set on an entry fall back to the value given to the module itself.
+            - Users of the domain which are not part of this list are not touched.
+            - Mutually exclusive with `email`, `givenName`, `familyName` and `employeeId`.
+        required: false
+    transfer_state_file:
+        description:
+            - File in which the ids of the started data transfers are kept, so that a later run awaits them instead of starting them again.
+            - Only used when `users` is given. There all data transfers are started at once.
+        required: false
+    transfer_wait:
+        description:
+            - Whether to wait for the data transfers to complete and delete the users afterwards.
+            - If 'false' the transfers are only started and recorded in `transfer_state_file`, the users stay suspended. A later run with 'true' awaits all pending transfers together and deletes the users whose transfers completed.
+            - Only used when `users` is given.
+            - Default is 'true'.
+        required: false
+    transfer_timeout:
+        description:
+            - The maximum number of seconds to wait for data transfers, '0' means no limit. Users whose transfers are still in progress are kept until a later run.
+            - Only used when `users` is given.
+            - Default is '0'.
+        required: false
 
 extends_documentation_fragment:
     - gsuite
@@ -112,6 +178,43 @@ EXAMPLES = '''
         role: 'OWNER'
     suspended: false
     state: present
+
+- name: All G Suite users at once
+  gsuite_user:
+    google_private_key: '{{ google_private_key }}'
+    google_subject: 'admin@example.com'
+    users:
+      - email: 'john.doe@example.com'
+        familyName: 'Doe'
+        givenName: 'John'
+        employeeId: 'jdoe'
+        groups:
+          team:
+            groupKey: 'team@example.com'
+            role: 'MEMBER'
+      - email: 'jane.doe@example.com'
+        familyName: 'Doe'
+        givenName: 'Jane'
+        employeeId: 'janed'
+        transferUserEmail: 'john.doe@example.com'
+        state: absent
+
+# start the data transfers of all users to be deleted without waiting ...
+- name: Start data transfers
+  gsuite_user:
+    google_private_key: '{{ google_private_key }}'
+    google_subject: 'admin@example.com'
+    users: '{{ google_users }}'
+    transfer_state_file: '~/.cache/ansible-iam/transfers.json'
+    transfer_wait: false
+
+# ... and delete the users once their transfers completed
+- name: Await data transfers
+  gsuite_user:
+    google_private_key: '{{ google_private_key }}'
+    google_subject: 'admin@example.com'
+    users: '{{ google_users }}'
+    transfer_state_file: '~/.cache/ansible-iam/transfers.json'
 '''
 
 RETURN = '''
@@ -143,6 +246,14 @@ aliases_insert:
     description: Information about the aliases
     type: list
     returned: always
+users:
+    description: The result of every user in list mode (`email`, `changed`, `created`, `updated`, `suspended`, `transferred`, `deleted`, and for present users `aliases_added`, `groups_added`, `groups_removed` and `groups_updated`). Users whose data transfer is still in progress have `transfer_pending` set, failed users have `failed` and `msg` set.
+    type: list
+    returned: when users is given
+summary:
+    description: The number of users which got created, updated, suspended, transferred, deleted or failed in list mode, and the number of users with data transfers still in progress (`transfer_pending`)
+    type: dict
+    returned: when users is given
 '''
 
 SCOPES = [
@@ -151,33 +262,42 @@ SCOPES = [
     'https://www.googleapis.com/auth/admin.datatransfer',
 ]
 
+# only the fields we actually use are requested (partial responses)
+# https://developers.google.com/admin-sdk/directory/v1/guides/performance#partial
+USER_FIELDS = 'id,primaryEmail,emails,aliases,nonEditableAliases,name,' \
+    + 'externalIds,orgUnitPath,suspended'
+GROUP_FIELDS = 'email,aliases'
+MEMBER_FIELDS = 'email,role'
+APPLICATION_FIELDS = 'id,name,transferParams'
+
 
-def google_directory(privateKey, subject):
-    creds = service_account.Credentials.from_service_account_info(
-        privateKey, scopes=SCOPES, subject=subject
+def google_directory(privateKey, subject, cacheDir, tokenCacheDir):
+    creds = service_account_credentials(
+        privateKey, SCOPES, subject, tokenCacheDir
     )
-    service = build('admin', 'directory_v1', credentials=creds)
+    service = build_service('admin', 'directory_v1', creds, cacheDir)
     return service
 
 
-def google_datatransfer(privateKey, subject):
-    creds = service_account.Credentials.from_service_account_info(
-        privateKey, scopes=SCOPES, subject=subject
+def google_datatransfer(privateKey, subject, cacheDir, tokenCacheDir):
+    creds = service_account_credentials(
+        privateKey, SCOPES, subject, tokenCacheDir
     )
-    service = build('admin', 'datatransfer_v1', credentials=creds)
+    service = build_service('admin', 'datatransfer_v1', creds, cacheDir)
     return service
 
 
 def user_get(module, gDirectory, email):
     success = False
     message = ""
+    user = None
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#get
         #
         # this raises googleapiclient.errors.HttpError if userKey does not
         # exist:
-        user = gDirectory.users().get(userKey=email).execute()
+        user = execute(gDirectory.users().get(userKey=email, fields=USER_FIELDS))
 
         # find out the primary email of the user
         # in Ruby this would be `user.find { |e| e['primary'] }['address']` :~)
@@ -197,15 +317,12 @@ def user_get(module, gDirectory, email):
         success = False
         message = f"User NOT existing: {email} ({e})"
 
-    return success, message
+    return success, message, user
 
 
-def user_insert(gDirectory, email, givenName, familyName, employeeId, password,
-                changePasswordAtNextLogin, suspended, orgUnitPath):
-    success = False
-    message = ""
-
-    userInsert = {
+def user_insert_body(email, givenName, familyName, employeeId, password,
+                     changePasswordAtNextLogin, suspended, orgUnitPath):
+    return {
         "primaryEmail": email,
         "externalIds": [
             {"value": employeeId, "type": "organization"}
@@ -220,9 +337,20 @@ def user_insert(gDirectory, email, givenName, familyName, employeeId, password,
         }
     }
 
+
+def user_insert(gDirectory, email, givenName, familyName, employeeId, password,
+                changePasswordAtNextLogin, suspended, orgUnitPath):
+    success = False
+    message = ""
+
+    userInsert = user_insert_body(
+        email, givenName, familyName, employeeId, password,
+        changePasswordAtNextLogin, suspended, orgUnitPath
+    )
+
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#insert
-        gDirectory.users().insert(body=userInsert).execute()
+        execute(gDirectory.users().insert(body=userInsert))
         success = True
         message = f"User created: {email}"
     except Exception as e:
@@ -232,16 +360,37 @@ def user_insert(gDirectory, email, givenName, familyName, employeeId, password,
     return success, message
 
 
-def user_patch(gDirectory, email, givenName, familyName, employeeId, password,
-               suspended, orgUnitPath):
-    success = False
-    message = ""
+def is_employee_id(externalId):
+    # the entry managed by this module, other entries are left alone
+    return externalId.get('type') == 'organization' and not externalId.get('customType')
 
-    userPatch = {
-        "primaryEmail": email,
-        "externalIds": [
-            {"value": employeeId, "type": "organization"}
-        ],
+
+def external_ids_changes(current, employeeId):
+    """
+    Compare the `organization` typed external id of a user with `employeeId`.
+
+    Returns `None` if it is up to date, otherwise the list of external ids
+    with the `organization` entry set to `employeeId`.  All other entries
+    are kept as they are.
+    """
+    current = current or []
+    managed = [externalId for externalId in current if is_employee_id(externalId)]
+    if managed and managed[0].get('value') == employeeId:
+        return None
+
+    externalIds = [externalId for externalId in current if not is_employee_id(externalId)]
+    externalIds.append({"value": employeeId, "type": "organization"})
+
+    return externalIds
+
+
+def user_changes(resource, givenName, familyName, employeeId, suspended,
+                 orgUnitPath):
+    """
+    Compare an existing user with the desired values and return the fields
+    which differ, ready to be used as the body of a PATCH.
+    """
+    desired = {
         "name": {
             "givenName": givenName,
             "familyName": familyName
@@ -250,23 +399,119 @@ def user_patch(gDirectory, email, givenName, familyName, employeeId, password,
         "suspended": suspended
     }
 
+    changes = {}
+    for field, value in desired.items():
+        current = resource.get(field)
+        if field == 'name' and current is not None:
+            # the resource also contains e.g. the `fullName`
+            current = {key: current.get(key) for key in value}
+
+        if current != value:
+            changes[field] = value
+
+    # a PATCH replaces the whole list, so it has to include the other entries
+    externalIds = external_ids_changes(resource.get('externalIds'), employeeId)
+    if externalIds is not None:
+        changes['externalIds'] = externalIds
+
+    return changes
+
+
+def user_patch(gDirectory, user, email, givenName, familyName, employeeId,
+               password, suspended, orgUnitPath):
+    success = False
+    changed = False
+    message = ""
+
+    # only send the fields which actually differ from the existing user
+    userPatch = user_changes(
+        user, givenName, familyName, employeeId, suspended, orgUnitPath
+    )
+    if not userPatch:
+        return True, changed, f"User unchanged: {email}"
+
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#patch
-        gDirectory.users().patch(userKey=email, body=userPatch).execute()
+        execute(gDirectory.users().patch(userKey=email, body=userPatch))
         success = True
-        message = f"User modified: {email}"
+        changed = True
+        message = f"User modified: {email} ({', '.join(sorted(userPatch))})"
     except Exception as e:
         success = False
         message = f"ERROR modifying user {email}: {e}"
 
-    return success, message
+    return success, changed, message
 
 
 def user_get_id(gDirectory, email):
-    uid = gDirectory.users().get(userKey=email).execute()['id']
+    uid = execute(gDirectory.users().get(userKey=email, fields='id'))['id']
     return uid
 
 
+def transfer_applications(gDatatransfer):
+    """
+    Return the `applicationDataTransfers` for moving the Drive and Calendar
+    data of a user.
+    """
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.applications.html#list
+    applications = execute(gDatatransfer.applications().list(
+        fields=f'applications({APPLICATION_FIELDS})'
+    ))['applications']
+
+    transfers = []
+    for application in applications:
+        app_name = application['name']
+        if app_name == "Drive and Docs" or app_name == "Calendar":
+            transfer = {"applicationId": application['id']}
+            try:
+                transfer['applicationTransferParams'] = [
+                    application['transferParams'][0]
+                ]
+            except Exception:
+                pass
+            transfers.append(transfer)
+
+    return transfers
+
+
+def transfer_insert(gDatatransfer, oldOwnerId, newOwnerId, transfers):
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#insert
+    t = execute(gDatatransfer.transfers().insert(
+        body={
+            "oldOwnerUserId": oldOwnerId,
+            "newOwnerUserId": newOwnerId,
+            "applicationDataTransfers": transfers
+        },
+        fields='id'
+    ))
+    return t['id']
+
+
+def transfer_wait(gDatatransfer, transferId):
+    # wait until datatransfer is done and return its status code
+    #
+    # there is no documentation on what values this
+    # `overallTransferStatusCode` might have.
+    #
+    # so far I've seen:
+    #   - 'inProgress' -> data transfer is currently in progress
+    #   - 'completed'  -> data transfer is complete
+    #
+    # therefore callers should fail on every other status code
+    #
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#get
+    code = execute(gDatatransfer.transfers().get(
+        dataTransferId=transferId, fields='overallTransferStatusCode'
+    ))['overallTransferStatusCode']
+    while code.lower() == 'inprogress':
+        time.sleep(5)
+        code = execute(gDatatransfer.transfers().get(
+            dataTransferId=transferId, fields='overallTransferStatusCode'
+        ))['overallTransferStatusCode']
+
+    return code
+
+
 def user_delete(module, gDirectory, gDatatransfer, email, transfer_user):
     success = False
     message = ""
@@ -275,47 +520,29 @@ def user_delete(module, gDirectory, gDatatransfer, email, transfer_user):
     if transfer_user != "":
         try:
             # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#patch
-            gDirectory.users().patch(
+            execute(gDirectory.users().patch(
                 userKey=email, body={"suspended": True}
-            ).execute()
+            ))
             success = True
             message = f"User {email} suspended."
         except Exception as e:
             module.fail_json(msg=f"ERROR while suspending user {email}: {e}")
 
         try:
-            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.applications.html#list
-            applications = gDatatransfer.applications().list() \
-                .execute()['applications']
+            transfers = transfer_applications(gDatatransfer)
             success = True
         except Exception as e:
             module.fail_json(
                 msg=f"ERROR could not get apps for data transfer: {e}"
             )
 
-        transfers = []
-        i = 0
-        for application in applications:
-            app_name = application['name']
-            if app_name == "Drive and Docs" or app_name == "Calendar":
-                transfers.append({"applicationId": application['id']})
-                try:
-                    transfers[i]['applicationTransferParams'] = [
-                        application['transferParams'][0]
-                    ]
-                except Exception:
-                    pass
-                i = i + 1
-
         try:
-            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#insert
-            t = gDatatransfer.transfers().insert(
-                body={
-                    "oldOwnerUserId": user_get_id(gDirectory, email),
-                    "newOwnerUserId": user_get_id(gDirectory, transfer_user),
-                    "applicationDataTransfers": transfers
-                }
-            ).execute()
+            transferId = transfer_insert(
+                gDatatransfer,
+                user_get_id(gDirectory, email),
+                user_get_id(gDirectory, transfer_user),
+                transfers
+            )
             success = True
             message += f" Datatransfer from {email} to {transfer_user}" \
                 + " initiated."
@@ -326,25 +553,7 @@ def user_delete(module, gDirectory, gDatatransfer, email, transfer_user):
             )
 
         try:
-            # wait until datatransfer is successful
-            #
-            # there is no documentation on what values this
-            # `overallTransferStatusCode` might have.
-            #
-            # so far I've seen:
-            #   - 'inProgress' -> data transfer is currently in progress
-            #   - 'completed'  -> data transfer is complete
-            #
-            # therefore fail on every other status code we get back
-            #
-            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#get
-            code = gDatatransfer.transfers().get(dataTransferId=t['id']) \
-                .execute()['overallTransferStatusCode']
-            while code.lower() == 'inprogress':
-                time.sleep(5)
-                code = gDatatransfer.transfers().get(dataTransferId=t['id']) \
-                    .execute()['overallTransferStatusCode']
-
+            code = transfer_wait(gDatatransfer, transferId)
             if code.lower() != 'completed':
                 module.fail_json(msg=f"Data transfer failed ({code})")
 
@@ -364,7 +573,7 @@ def user_delete(module, gDirectory, gDatatransfer, email, transfer_user):
     if delete_user is True:
         try:
             # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#delete
-            gDirectory.users().delete(userKey=email).execute()
+            execute(gDirectory.users().delete(userKey=email))
             success = True
             message += f" User deleted: {email}"
         except Exception as e:
@@ -373,120 +582,143 @@ def user_delete(module, gDirectory, gDatatransfer, email, transfer_user):
     return success, message
 
 
+def user_groups(gDirectory, email):
+    """
+    Yield all groups the user is a direct member of, following the pages of
+    the listing.  Only the email and aliases of the groups are requested.
+    """
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#list
+    yield from list_items(
+        gDirectory.groups(),
+        gDirectory.groups().list(
+            userKey=email,
+            maxResults=200,
+            fields=f'groups({GROUP_FIELDS}),nextPageToken'
+        ),
+        'groups'
+    )
+
+
 def manage_groups(module, gDirectory, email, groups):
-    # find user's group memberships
-    current_groups = []
+    # find user's group memberships, the groups are indexed by email and alias
+    current_groups = {}
     try:
-        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#list
-        groups_list_response = gDirectory.groups().list(userKey=email).execute()
-        if 'groups' in groups_list_response:
-            for group in groups_list_response['groups']:
-                # get group member properties
-                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#get
-                member_properties = gDirectory.members().get(
-                    groupKey=group['email'],
-                    memberKey=email
-                ).execute()
-                current_groups.append({
-                    'groupKey': group['email'],
-                    'role': member_properties['role']
-                })
+        for group in user_groups(gDirectory, email):
+            for address in [group['email']] + group.get('aliases', []):
+                current_groups[address.lower()] = group['email']
     except Exception as e:
         module.fail_json(
             msg=f"ERROR while finding group memberships for {email}: {e}"
         )
 
-    # figure out groups to be removed
-    groups_list = groups.values()  # groups are passed in as a dict, but we really only care about the values
-    # only get the emails for easier comparison (also for deletion the `role` does not matter)
-    groups_list_emails = [group['groupKey'] for group in groups_list]
-    current_group_emails = [group['groupKey'] for group in current_groups]
-    groups_del = [group for group in current_group_emails if group not in groups_list_emails]
+    # groups are passed in as a dict, but we really only care about the values
+    roles = {}
+    for group in groups.values():
+        group_key = current_groups.get(group['groupKey'].lower(), group['groupKey'])
+        roles[group_key] = group['role']
+
+    current_group_emails = set(current_groups.values())
+    groups_del = current_group_emails - roles.keys()
+    groups_add = roles.keys() - current_group_emails
+    groups_keep = roles.keys() & current_group_emails
 
     results = {}
 
     # remove the user from the groups
-    for group_key in groups_del:
-        try:
-            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#delete
-            gDirectory.members().delete(
-                groupKey=group_key, memberKey=email
-            ).execute()
-
-            results.update({
-                group_key: {
-                    'success': True,
-                    'message': f"User {email} removed from group {group_key}"
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#delete
+    responses = execute_batch(gDirectory, {
+        group_key: gDirectory.members().delete(
+            groupKey=group_key, memberKey=email
+        )
+        for group_key in groups_del
+    })
+    for group_key, (_, error) in responses.items():
+        if error is None:
+            results[group_key] = {
+                'success': True,
+                'changed': True,
+                'message': f"User {email} removed from group {group_key}"
+            }
+        else:
+            results[group_key] = {
+                'success': False,
+                'changed': False,
+                'message': f"ERROR while removing {email} from group "
+                           + f"{group_key}: {error}"
+            }
+
+    # the roles are only needed for groups the user stays in, get them all
+    # in one batch
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#get
+    responses = execute_batch(gDirectory, {
+        group_key: gDirectory.members().get(
+            groupKey=group_key, memberKey=email, fields='role'
+        )
+        for group_key in groups_keep
+    })
+
+    changes = {}
+    for group_key in groups_keep:
+        member_properties, error = responses[group_key]
+        if error is not None:
+            results[group_key] = {
+                'success': False,
+                'changed': False,
+                'message': f"ERROR while finding role of {email} in group "
+                           + f"{group_key}: {error}"
+            }
+        elif member_properties['role'].upper() == roles[group_key].upper():
+            # already a member with the right role --> nothing to do
+            results[group_key] = {
+                'success': True,
+                'changed': False,
+                'message': f"User {email} already in group {group_key}"
+            }
+        else:  # a member --> update group member (because of role)
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#update
+            changes[group_key] = gDirectory.members().update(
+                groupKey=group_key, memberKey=email, body={
+                    "role": roles[group_key]
                 }
-            })
-        except Exception as e:
-            module.fail_json(
-                msg=f"ERROR while removing {email} from group {group_key}: {e}"
             )
 
-    for group in groups_list:
-        group_key = group['groupKey']
-        role = group['role']
-        is_member = False
-
-        try:
-            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#hasMember
-            has_member_response = gDirectory.members().hasMember(
-                groupKey=group_key, memberKey=email
-            ).execute()
-            if has_member_response['isMember']:
-                is_member = True
-                results.update({
-                    group_key: {
-                        'success': True,
-                        'message': f"User {email} is already a member of"
-                                   + f" {group_key}"
-                    }
-                })
-        except Exception:
-            pass  # assume user is not in group
+    for group_key in groups_add:  # not a member --> insert new group member
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#insert
+        changes[group_key] = gDirectory.members().insert(
+            groupKey=group_key, body={
+                "email": email,
+                "role": roles[group_key]
+            }
+        )
 
-        if is_member:  # a member --> update group member (because of role)
-            try:
-                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#update
-                gDirectory.members().update(
-                    groupKey=group_key, memberKey=email, body={
-                        "role": role
-                    }
-                ).execute()
+    responses = execute_batch(gDirectory, changes)
+    for group_key, (_, error) in responses.items():
+        updated = group_key in groups_keep
+
+        if error is None and updated:
+            message = f"Updated membership of {email} in group {group_key}"
+        elif error is None:
+            message = f"User {email} added to group {group_key}"
+        elif updated:
+            message = f"ERROR while updating membership of {email} in group " \
+                + f"{group_key}: {error}"
+        else:
+            message = f"ERROR while adding {email} to group {group_key}: " \
+                + f"{error}"
 
-                results.update({
-                    group_key: {
-                        'success': True,
-                        'message': f"Updated membership of {email} in group"
-                                   + f" {group_key}"
-                    }
-                })
-            except Exception as e:
-                module.fail_json(
-                    msg=f"ERROR while updating membership of {email} in group "
-                        + f"{group_key}: {e}"
-                )
-        else:  # not a member --> insert new group member
-            try:
-                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#insert
-                gDirectory.members().insert(
-                    groupKey=group_key, body={
-                        "email": email,
-                        "role": role
-                    }
-                ).execute()
+        results[group_key] = {
+            'success': error is None,
+            'changed': error is None,
+            'message': message
+        }
 
-                results.update({
-                    group_key: {
-                        'success': True,
-                        'message': f"User {email} added to group {group_key}"
-                    }
-                })
-            except Exception as e:
-                module.fail_json(
-                    msg=f"ERROR while adding {email} to group {group_key}: {e}"
-                )
+    failed = [key for key, value in results.items() if not value['success']]
+    if failed:
+        module.fail_json(
+            msg=f"ERROR while managing groups of {email}: "
+                + f"{len(failed)} group(s) failed",
+            manage_groups=results
+        )
 
     return results
 
@@ -496,8 +728,9 @@ def aliases_insert(gDirectory, email, aliases):
 
     try:
         # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.aliases.html#list
-        aliasesExisting = gDirectory.users().aliases().list(userKey=email) \
-            .execute()["aliases"]
+        aliasesExisting = execute(gDirectory.users().aliases().list(
+            userKey=email, fields='aliases(alias)'
+        ))["aliases"]
     except Exception:
         aliasesExisting = False
 
@@ -512,19 +745,21 @@ def aliases_insert(gDirectory, email, aliases):
             results.update({
                 alias: {
                     'success': True,
+                    'changed': False,
                     'message': f"Alias {alias} already exists for user {email}"
                 }
             })
         else:
             try:
                 # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.aliases.html#insert
-                gDirectory.users().aliases().insert(
+                execute(gDirectory.users().aliases().insert(
                     userKey=email,
                     body={"alias": alias}
-                ).execute()
+                ))
                 results.update({
                     alias: {
                         'success': True,
+                        'changed': True,
                         'message': f"Alias {alias} created for user {email}"
                     }
                 })
@@ -532,6 +767,7 @@ def aliases_insert(gDirectory, email, aliases):
                 results.update({
                     alias: {
                         'success': False,
+                        'changed': False,
                         'message': f"ERROR creating alias {alias} for user"
                                    + f" {email}: {e}"
                     }
@@ -540,15 +776,634 @@ def aliases_insert(gDirectory, email, aliases):
     return results
 
 
+USER_OPTIONS = [
+    'email',
+    'givenName',
+    'familyName',
+    'employeeId',
+    'password',
+    'changePasswordAtNextLogin',
+    'aliases',
+    'groups',
+    'suspended',
+    'orgUnitPath',
+    'transferUserEmail',
+    'state',
+]
+
+# polling interval of pending data transfers in list mode, in seconds
+TRANSFER_POLL_INTERVAL = 5
+TRANSFER_POLL_MAX_INTERVAL = 60
+
+# result key of every planned action in list mode
+ACTION_RESULTS = {
+    'insert': 'created',
+    'patch': 'updated',
+    'suspend': 'suspended',
+    'transfer': 'transferred',
+    'delete': 'deleted',
+}
+
+
+def user_params(module, entry):
+    """Merge an entry of `users` with the module-wide defaults."""
+    user = {}
+
+    for option in USER_OPTIONS:
+        value = entry.get(option)
+        if value is None:
+            value = module.params[option]
+        user[option] = value
+
+    return user
+
+
+def users_snapshot(gDirectory):
+    """
+    Load all users of the domain with one paged `users().list` and index them
+    by their primary email and aliases (all lower case).
+    """
+    index = {}
+
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#list
+    users = list_items(
+        gDirectory.users(),
+        gDirectory.users().list(
+            customer='my_customer',
+            projection='full',
+            maxResults=500,
+            fields=f'users({USER_FIELDS}),nextPageToken'
+        ),
+        'users'
+    )
+    for user in users:
+        addresses = [user['primaryEmail']] + user.get('aliases', []) \
+            + user.get('nonEditableAliases', [])
+        for address in addresses:
+            index[address.lower()] = user
+
+    return index
+
+
+def memberships_snapshot(gDirectory):
+    """
+    Load the members of all groups of the domain.
+
+    Returns an index of group email/alias -> group email, and an index of
+    member email -> dict of group email -> role (all lower case).
+    """
+    groups = {}
+
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.groups.html#list
+    group_list = list_items(
+        gDirectory.groups(),
+        gDirectory.groups().list(
+            customer='my_customer',
+            maxResults=200,
+            fields=f'groups({GROUP_FIELDS}),nextPageToken'
+        ),
+        'groups'
+    )
+    for group in group_list:
+        for address in [group['email']] + group.get('aliases', []):
+            groups[address.lower()] = group['email'].lower()
+
+    # the members of all groups, paged in batches
+    # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#list
+    responses = list_batch(gDirectory, {
+        group_email: (
+            lambda token, group_email=group_email: gDirectory.members().list(
+                groupKey=group_email,
+                maxResults=200,
+                pageToken=token,
+                fields=f'members({MEMBER_FIELDS}),nextPageToken'
+            )
+        )
+        for group_email in set(groups.values())
+    }, 'members')
+
+    memberships = {}
+    for group_email, (members, error) in responses.items():
+        if error is not None:
+            raise Exception(
+                f"could not list the members of group {group_email}: {error}"
+            )
+
+        for member in members:
+            if 'email' in member:
+                memberships.setdefault(member['email'].lower(), {})[group_email] \
+                    = member['role']
+
+    return groups, memberships
+
+
+def plan_user(user, resource):
+    """
+    Compare a user with its resource from the snapshot (`None` if the user
+    does not exist).
+
+    Returns the list of actions needed (`insert`, `patch`, `suspend`,
+    `transfer` and `delete`) and the body of the insert or patch request.
+    """
+    if user['state'] == 'absent':
+        if resource is None:
+            return [], None
+
+        if user['transferUserEmail'] == "":
+            return ['delete'], None
+
+        actions = ['transfer', 'delete']
+        if not resource.get('suspended'):
+            actions.insert(0, 'suspend')
+        return actions, None
+
+    if resource is None:
+        return ['insert'], user_insert_body(
+            user['email'],
+            user['givenName'],
+            user['familyName'],
+            user['employeeId'],
+            user['password'],
+            user['changePasswordAtNextLogin'],
+            user['suspended'],
+            user['orgUnitPath']
+        )
+
+    changes = user_changes(
+        resource,
+        user['givenName'],
+        user['familyName'],
+        user['employeeId'],
+        user['suspended'],
+        user['orgUnitPath']
+    )
+    if changes:
+        return ['patch'], changes
+
+    return [], None
+
+
+def mark_failed(user_result, message):
+    # keep the first error of a user, later ones are most likely caused by it
+    if not user_result.get('failed'):
+        user_result['failed'] = True
+        user_result['msg'] = message
+
+
+def apply_actions(gDirectory, plans, action_names):
+    """
+    Perform the given actions of all users which did not fail so far, all in
+    batch requests.
+    """
+    requests = {}
+    for index, (user, resource, actions, body, user_result) in enumerate(plans):
+        if user_result.get('failed'):
+            continue
+
+        email = user['email']
+        for action in actions:
+            if action not in action_names:
+                continue
+
+            request_id = f"{index}-{action}"
+            if action == 'insert':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#insert
+                requests[request_id] = gDirectory.users().insert(body=body)
+            elif action == 'patch':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#patch
+                requests[request_id] = gDirectory.users().patch(
+                    userKey=email, body=body
+                )
+            elif action == 'suspend':
+                requests[request_id] = gDirectory.users().patch(
+                    userKey=email, body={"suspended": True}
+                )
+            elif action == 'delete':
+                # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.html#delete
+                requests[request_id] = gDirectory.users().delete(userKey=email)
+
+    responses = execute_batch(gDirectory, requests)
+    for request_id, (_, error) in responses.items():
+        index, action = request_id.split('-', 1)
+        user_result = plans[int(index)][4]
+
+        if error is None:
+            user_result[ACTION_RESULTS[action]] = True
+            user_result['changed'] = True
+        else:
+            mark_failed(
+                user_result,
+                f"ERROR during {action} of user {user_result['email']}: "
+                + f"{error}"
+            )
+
+
+def transfers_load(path):
+    """Return the pending data transfers recorded in the state file."""
+    if not path:
+        return {}
+
+    try:
+        with open(os.path.expanduser(path), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def transfers_save(path, pending):
+    if not path:
+        return
+
+    path = os.path.abspath(os.path.expanduser(path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_file(path, json.dumps(pending, indent=2, sort_keys=True))
+
+
+def transfers_start(gDirectory, gDatatransfer, plans, index, pending):
+    """
+    Start the data transfers of all given users at once and record them in
+    `pending` (email -> transfer).
+    """
+    if not plans:
+        return
+
+    try:
+        transfers = transfer_applications(gDatatransfer)
+    except Exception as e:
+        for _, _, _, _, user_result in plans:
+            mark_failed(
+                user_result,
+                f"ERROR could not get apps for data transfer: {e}"
+            )
+        return
+
+    requests = {}
+    for user, resource, _, _, user_result in plans:
+        email = user['email']
+        transfer_user = user['transferUserEmail']
+
+        # the ids of most new owners are known from the snapshot already
+        new_owner = index.get(transfer_user.lower())
+        try:
+            if new_owner is not None:
+                newOwnerId = new_owner['id']
+            else:
+                newOwnerId = user_get_id(gDirectory, transfer_user)
+                index[transfer_user.lower()] = {'id': newOwnerId}
+        except Exception as e:
+            mark_failed(
+                user_result,
+                f"ERROR could not find {transfer_user} for data transfer: {e}"
+            )
+            continue
+
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#insert
+        requests[email.lower()] = gDatatransfer.transfers().insert(
+            body={
+                "oldOwnerUserId": resource['id'],
+                "newOwnerUserId": newOwnerId,
+                "applicationDataTransfers": transfers
+            },
+            fields='id'
+        )
+
+    responses = execute_batch(gDatatransfer, requests)
+    for user, _, _, _, user_result in plans:
+        email = user['email']
+        if email.lower() not in responses:
+            continue
+
+        response, error = responses[email.lower()]
+        if error is not None:
+            mark_failed(
+                user_result,
+                f"ERROR while initiating data transfer from {email} to "
+                + f"{user['transferUserEmail']}: {error}"
+            )
+            continue
+
+        pending[email.lower()] = {
+            'id': response['id'],
+            'newOwner': user['transferUserEmail'],
+            'started': int(time.time()),
+        }
+
+
+def transfers_await(gDatatransfer, plans, pending, timeout):
+    """
+    Poll the pending data transfers of all given users together, backing off
+    between polls, until all of them are done or `timeout` seconds passed
+    (`0` means no limit).
+
+    Failed transfers are removed from `pending`.  Completed ones stay there
+    until their user got deleted (see `transfers_forget`), so that a failed
+    delete does not start another transfer on the next run.
+    """
+    results = {plan[0]['email'].lower(): plan[4] for plan in plans}
+    waiting = {
+        email: pending[email]['id']
+        for email, user_result in results.items()
+        if email in pending and not user_result.get('failed')
+    }
+
+    deadline = time.time() + timeout if timeout else None
+    interval = TRANSFER_POLL_INTERVAL
+
+    while waiting:
+        # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_datatransfer_v1.transfers.html#get
+        responses = execute_batch(gDatatransfer, {
+            email: gDatatransfer.transfers().get(
+                dataTransferId=transferId, fields='overallTransferStatusCode'
+            )
+            for email, transferId in waiting.items()
+        })
+
+        for email, (response, error) in responses.items():
+            user_result = results[email]
+
+            # see transfer_wait() on the status codes
+            if error is None:
+                code = response['overallTransferStatusCode']
+                if code.lower() == 'inprogress':
+                    continue
+
+            del waiting[email]
+
+            if error is not None:
+                # unknown, e.g. because it is too old -> forget about it
+                del pending[email]
+                mark_failed(
+                    user_result,
+                    f"ERROR while transferring data from {user_result['email']}: "
+                    + f"{error}"
+                )
+            elif code.lower() != 'completed':
+                del pending[email]
+                mark_failed(user_result, f"Data transfer failed ({code})")
+            else:
+                user_result['transferred'] = True
+                user_result['changed'] = True
+
+        if not waiting:
+            break
+
+        if deadline is not None and time.time() + interval > deadline:
+            break
+
+        time.sleep(interval)
+        interval = min(interval * 2, TRANSFER_POLL_MAX_INTERVAL)
+
+
+def apply_transfers(module, gDirectory, gDatatransfer, plans, index):
+    """
+    Transfer the data of all users to be deleted to their `transferUserEmail`.
+
+    All transfers are started at once and recorded in `transfer_state_file`,
+    so that a later run picks them up instead of starting them again.
+    Unless `transfer_wait` is disabled, all pending transfers are then
+    awaited together.  Users whose transfer did not complete (yet) are not
+    deleted.
+
+    Returns the pending transfers, to be passed on to `transfers_forget`
+    once the users are deleted.
+    """
+    state_file = module.params['transfer_state_file']
+    pending = transfers_load(state_file)
+
+    transfer_plans = [
+        plan for plan in plans
+        if 'transfer' in plan[2] and not plan[4].get('failed')
+    ]
+
+    # forget about transfers of users which are no longer to be transferred,
+    # but keep the ones of failed users so that the next run picks them up
+    for user, _, actions, _, _ in plans:
+        if 'transfer' not in actions:
+            pending.pop(user['email'].lower(), None)
+
+    transfers_start(
+        gDirectory,
+        gDatatransfer,
+        [plan for plan in transfer_plans if plan[0]['email'].lower() not in pending],
+        index,
+        pending
+    )
+    transfers_save(state_file, pending)
+
+    if module.params['transfer_wait']:
+        transfers_await(
+            gDatatransfer,
+            transfer_plans,
+            pending,
+            module.params['transfer_timeout']
+        )
+        transfers_save(state_file, pending)
+
+    for user, _, actions, _, user_result in transfer_plans:
+        if user_result.get('failed') or user_result['transferred']:
+            continue
+
+        # still in progress -> keep the user until a later run
+        actions.remove('delete')
+        user_result['transfer_pending'] = True
+        if not state_file:
+            mark_failed(
+                user_result,
+                f"Data transfer from {user['email']} still in progress"
+            )
+
+    return pending
+
+
+def transfers_forget(module, plans, pending):
+    """
+    Remove the transfers of all deleted users from `transfer_state_file`.
+    Users which could not be deleted keep their (completed) transfer, so
+    that the next run only retries the delete.
+    """
+    deleted = [
+        plan[0]['email'].lower() for plan in plans
+        if plan[4]['deleted'] and plan[0]['email'].lower() in pending
+    ]
+    if not deleted:
+        return
+
+    for email in deleted:
+        del pending[email]
+    transfers_save(module.params['transfer_state_file'], pending)
+
+
+def apply_aliases_and_groups(gDirectory, plans):
+    """
+    Add the missing aliases of all present users and bring their group
+    memberships in line with `groups`, all in batch requests.
+    """
+    present = [
+        (index, plan) for index, plan in enumerate(plans)
+        if plan[0]['state'] == 'present' and not plan[4].get('failed')
+    ]
+    if not present:
+        return
+
+    groups, memberships = memberships_snapshot(gDirectory)
+
+    requests = {}
+    changes = {}
+    for index, (user, resource, _, _, user_result) in present:
+        email = user['email']
+        user_result.update(
+            aliases_added=[], groups_added=[], groups_removed=[],
+            groups_updated=[]
+        )
+
+        existing = set()
+        if resource is not None:
+            existing = {alias.lower() for alias in resource.get('aliases', [])}
+        for alias in user['aliases']:
+            if alias.lower() in existing:
+                continue
+
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.users.aliases.html#insert
+            request_id = f"{index}-alias-{len(changes)}"
+            requests[request_id] = gDirectory.users().aliases().insert(
+                userKey=email, body={"alias": alias}
+            )
+            changes[request_id] = ('aliases_added', alias)
+
+        current = {}
+        if resource is not None:
+            current = memberships.get(email.lower(), {})
+
+        # groups are passed in as a dict, but we really only care about the values
+        desired = {}
+        for group in user['groups'].values():
+            group_key = group['groupKey'].lower()
+            desired[groups.get(group_key, group_key)] = group['role']
+
+        for group_key in current.keys() - desired.keys():
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#delete
+            request_id = f"{index}-group-{len(changes)}"
+            requests[request_id] = gDirectory.members().delete(
+                groupKey=group_key, memberKey=email
+            )
+            changes[request_id] = ('groups_removed', group_key)
+
+        for group_key in desired.keys() - current.keys():
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#insert
+            request_id = f"{index}-group-{len(changes)}"
+            requests[request_id] = gDirectory.members().insert(
+                groupKey=group_key, body={
+                    "email": email,
+                    "role": desired[group_key]
+                }
+            )
+            changes[request_id] = ('groups_added', group_key)
+
+        for group_key in desired.keys() & current.keys():
+            if desired[group_key].upper() == current[group_key].upper():
+                continue
+
+            # https://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.members.html#update
+            request_id = f"{index}-group-{len(changes)}"
+            requests[request_id] = gDirectory.members().update(
+                groupKey=group_key, memberKey=email, body={
+                    "role": desired[group_key]
+                }
+            )
+            changes[request_id] = ('groups_updated', group_key)
+
+    responses = execute_batch(gDirectory, requests)
+    for request_id, (_, error) in responses.items():
+        user_result = plans[int(request_id.split('-', 1)[0])][4]
+        key, value = changes[request_id]
+
+        if error is None:
+            user_result[key].append(value)
+            user_result['changed'] = True
+        else:
+            mark_failed(
+                user_result,
+                f"ERROR while changing {key.split('_')[0]} of "
+                + f"{user_result['email']} ({value}): {error}"
+            )
+
+
+def run_users(module, gDirectory, gDatatransfer):
+    users = [user_params(module, entry) for entry in module.params['users']]
+
+    try:
+        index = users_snapshot(gDirectory)
+    except Exception as e:
+        module.fail_json(msg=f"ERROR while loading all users: {e}")
+
+    # figure out what needs to be done for every user
+    plans = []
+    for user in users:
+        email = user['email']
+        resource = index.get(email.lower())
+        user_result = dict(
+            email=email,
+            changed=False,
+            created=False,
+            updated=False,
+            suspended=False,
+            transferred=False,
+            deleted=False,
+        )
+
+        if resource is not None and \
+                resource['primaryEmail'].lower() != email.lower():
+            # to avoid surprises fail if the email provided is NOT the primary email
+            mark_failed(
+                user_result,
+                f"User exists, but {email} is an alias for "
+                + f"{resource['primaryEmail']}"
+            )
+            plans.append((user, resource, [], None, user_result))
+            continue
+
+        actions, body = plan_user(user, resource)
+        plans.append((user, resource, actions, body, user_result))
+
+    try:
+        apply_actions(gDirectory, plans, ('insert', 'patch', 'suspend'))
+        pending = apply_transfers(module, gDirectory, gDatatransfer, plans, index)
+        apply_actions(gDirectory, plans, ('delete',))
+        transfers_forget(module, plans, pending)
+        apply_aliases_and_groups(gDirectory, plans)
+    except Exception as e:
+        module.fail_json(
+            msg=f"ERROR while managing users: {e}",
+            users=[plan[4] for plan in plans]
+        )
+
+    results = [plan[4] for plan in plans]
+    succeeded = [user_result for user_result in results if not user_result.get('failed')]
+    summary = {
+        key: sum(1 for user_result in succeeded if user_result[key])
+        for key in ACTION_RESULTS.values()
+    }
+    summary['transfer_pending'] = sum(
+        1 for user_result in succeeded if user_result.get('transfer_pending')
+    )
+    summary['failed'] = len(results) - len(succeeded)
+
+    return dict(
+        changed=any(user_result['changed'] for user_result in results),
+        users=results,
+        summary=summary,
+    )
+
+
 def run_module():
     # define available arguments/parameters a user can pass to the module
     module_args = dict(
         google_private_key=dict(type='json', required=True),
         google_subject=dict(type='str', required=True),
-        email=dict(type='str', required=True),
-        givenName=dict(type='str', required=True),
-        familyName=dict(type='str', required=True),
-        employeeId=dict(type='str', required=True),
+        email=dict(type='str', required=False),
+        givenName=dict(type='str', required=False),
+        familyName=dict(type='str', required=False),
+        employeeId=dict(type='str', required=False),
         password=dict(type='str', required=False,
                       default='change.this.password.now!', no_log=True),
         changePasswordAtNextLogin=dict(type='bool', required=False,
@@ -564,7 +1419,37 @@ def run_module():
         suspended=dict(type='bool', required=False, default=False),
         orgUnitPath=dict(type='str', required=False, default='/'),
         transferUserEmail=dict(type='str', required=False, default=''),
-        state=dict(choices=['present', 'absent'], default='present')
+        discovery_cache_dir=dict(type='str', required=False,
+                                 default='~/.cache/ansible-iam/discovery'),
+        token_cache_dir=dict(type='str', required=False,
+                             default='~/.cache/ansible-iam/tokens'),
+        quota_state_dir=dict(type='str', required=False,
+                             default='~/.cache/ansible-iam/quota'),
+        quota_per_user=dict(type='int', required=False, default=0),
+        quota_per_project=dict(type='int', required=False, default=0),
+        state=dict(choices=['present', 'absent'], default='present'),
+        users=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                email=dict(type='str', required=True),
+                givenName=dict(type='str', required=True),
+                familyName=dict(type='str', required=True),
+                employeeId=dict(type='str', required=True),
+                password=dict(type='str', required=False, no_log=True),
+                changePasswordAtNextLogin=dict(type='bool', required=False),
+                aliases=dict(type='list', required=False),
+                groups=dict(type='dict', required=False),
+                suspended=dict(type='bool', required=False),
+                orgUnitPath=dict(type='str', required=False),
+                transferUserEmail=dict(type='str', required=False),
+                state=dict(choices=['present', 'absent'], required=False),
+            ),
+        ),
+        transfer_state_file=dict(type='path', required=False),
+        transfer_wait=dict(type='bool', required=False, default=True),
+        transfer_timeout=dict(type='int', required=False, default=0),
     )
 
     # seed the result dict in the object
@@ -590,6 +1475,21 @@ def run_module():
     # supports check mode
     module = AnsibleModule(
         argument_spec=module_args,
+        required_one_of=[
+            ('users', 'email'),
+        ],
+        required_together=[
+            ('email', 'givenName', 'familyName', 'employeeId'),
+        ],
+        mutually_exclusive=[
+            ('users', 'email'),
+            ('users', 'givenName'),
+            ('users', 'familyName'),
+            ('users', 'employeeId'),
+        ],
+        required_if=[
+            ('transfer_wait', False, ('transfer_state_file',)),
+        ],
         supports_check_mode=True
     )
 
@@ -603,11 +1503,32 @@ def run_module():
     # part where your module will do what it needs to do)
     g_private_key = json.loads(module.params['google_private_key'])
     g_subject = module.params['google_subject']
-    gDirectory = google_directory(g_private_key, g_subject)
-    gDatatransfer = google_datatransfer(g_private_key, g_subject)
+    g_cache_dir = module.params['discovery_cache_dir']
+    g_token_cache_dir = module.params['token_cache_dir']
+    configure_quota(
+        g_private_key,
+        g_subject,
+        module.params['quota_state_dir'],
+        module.params['quota_per_user'],
+        module.params['quota_per_project'],
+    )
+    gDirectory = google_directory(g_private_key, g_subject, g_cache_dir, g_token_cache_dir)
+    gDatatransfer = google_datatransfer(g_private_key, g_subject, g_cache_dir, g_token_cache_dir)
+
+    if module.params['users'] is not None:
+        # list mode -> manage all users at once
+        result = run_users(module, gDirectory, gDatatransfer)
+
+        failed = result['summary']['failed']
+        if failed:
+            module.fail_json(msg=f"failed to manage {failed} user(s)", **result)
+
+        module.exit_json(**result)
 
     try:
-        user_exists, _ = user_get(module, gDirectory, module.params['email'])
+        user_exists, _, user = user_get(
+            module, gDirectory, module.params['email']
+        )
         result['success'] = user_exists
     except Exception as e:
         module.fail_json(msg=f'Failed to check user existence: {e}', **result)
@@ -625,13 +1546,15 @@ def run_module():
                 result['user_delete']['success'] = user_del_success
                 result['user_delete']['message'] = user_del_message
                 result['success'] = user_del_success
+                result['changed'] = user_del_success
             except Exception as e:
                 module.fail_json(msg=f'Failed to delete user: {e}', **result)
     else:
         if user_exists:  # user exists -> update them
             try:
-                user_patch_success, user_patch_message = user_patch(
+                user_patch_success, user_patch_changed, user_patch_message = user_patch(
                     gDirectory,
+                    user,
                     module.params['email'],
                     module.params['givenName'],
                     module.params['familyName'],
@@ -641,8 +1564,10 @@ def run_module():
                     module.params['orgUnitPath']
                 )
                 result['user_patch']['success'] = user_patch_success
+                result['user_patch']['changed'] = user_patch_changed
                 result['user_patch']['message'] = user_patch_message
                 result['success'] = user_patch_success
+                result['changed'] = user_patch_changed
             except Exception as e:
                 module.fail_json(msg=f'Failed to patch user: {e}', **result)
         else:  # user does not exist -> create them
@@ -661,6 +1586,7 @@ def run_module():
                 result['user_insert']['success'] = user_insert_success
                 result['user_insert']['message'] = user_insert_message
                 result['success'] = user_insert_success
+                result['changed'] = user_insert_success
             except Exception as e:
                 module.fail_json(msg=f'Failed to insert user: {e}', **result)
 
@@ -672,6 +1598,8 @@ def run_module():
                 module.params['groups']
             )
             result['success'] = True
+            if any(group['changed'] for group in result['manage_groups'].values()):
+                result['changed'] = True
         except Exception as e:
             module.fail_json(
                 msg=f'Failed to add user to groups: {e}', **result
@@ -684,17 +1612,14 @@ def run_module():
                 module.params['aliases']
             )
             result['success'] = True
+            if any(alias['changed'] for alias in result['aliases_insert'].values()):
+                result['changed'] = True
         except Exception as e:
             module.fail_json(
                 msg=f'Failed create aliases for user: {e}',
                 **result
             )
 
-    # use whatever logic you need to determine whether or not this module
-    # made any modifications to your target
-    if result['success']:
-        result['changed'] = True
-
     # during the execution of the module, if there is an exception or a
     # conditional state that effectively causes a failure, run
     # AnsibleModule.fail_json() to pass in the message and the result
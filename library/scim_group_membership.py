@@ -0,0 +1,437 @@
+#!/usr/bin/python
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.scim import (
+    RETRY,
+    FailureRaisingModule,
+    RequestFailure,
+    fetch_url,
+    list_resources,
+    map_concurrently,
+)
+
+import urllib.parse # quote
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['production'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: scim_group_membership
+
+short_description: Manage the group memberships of SCIM users
+
+version_added: "4.0"
+
+description:
+  - "This module is used to manage which groups users are a member of at
+    external services via SCIM."
+  - "All groups (and their members, if the service returns them) are loaded
+    once, the memberships of all given users are then compared in memory and
+    only the missing memberships are added or the superfluous ones removed."
+  - "Membership changes are grouped by group, so that a group gets a single
+    `PatchOp` request with all of its added and removed members."
+  - "Services which do not return the members of a group when listing them
+    (e.g. AWS IAM Identity Center) are asked for the groups of every user
+    with a `members eq ...` filter instead (see `member_lookup`)."
+
+options:
+  base_url:
+    description:
+      - The base url for accessing a service's SCIM API.
+    required: true
+  authorization:
+    description:
+      - Contents of the `Authorization` header.
+    required: true
+  memberships:
+    description:
+      - A list of users and the groups they should be a member of.
+      - Every entry needs the `user_id` of the user at the external system
+        and `groups`, a list of group display names.
+      - The users are removed from every group which is not part of
+        `groups`.  Users which are not part of this list are not touched.
+    required: true
+  page_size:
+    description:
+      - The number of groups to request per page while loading the groups.
+      - Default is '100'.
+    required: false
+  members_per_request:
+    description:
+      - All membership changes of a group are sent as a single `PatchOp`
+        request.  This is the maximum number of members added or removed
+        with one request, larger changes are split into multiple requests.
+      - Default is '100'.
+    required: false
+  member_lookup:
+    description:
+      - How the current members of the groups are found out.
+      - With 'list' they are taken from the listing of all groups.
+      - With 'query' the groups of every user are requested with a
+        `members eq ...` filter, one (paged) query per user.  Use this for
+        services which do not return the members of a group when listing
+        them, e.g. AWS IAM Identity Center.
+      - Default is 'list'.
+    required: false
+    choices: ['list', 'query']
+  projection:
+    description:
+      - Only ask the service for the attributes which are actually used
+        (via the `attributes` query parameter), instead of whole group
+        resources.
+      - Not every service supports the `attributes` parameter, some ignore
+        it and others reject the request.  Only enable this for services it
+        has been checked with.
+      - Default is 'false'.
+    required: false
+  max_concurrency:
+    description:
+      - The maximum number of requests in flight to `base_url`.
+      - Default is '4'.
+    required: false
+  max_retries:
+    description:
+      - How often a single request is retried if the service throttles it
+        (429/503) or fails with a 5xx status.
+      - Default is '5'.
+    required: false
+  retry_budget:
+    description:
+      - The maximum number of seconds to spend waiting for retries during
+        the whole module run.
+      - Default is '300'.
+    required: false
+
+author:
+  - Georg Gadinger (georg.gadinger@runtastic.com)
+'''
+
+EXAMPLES = '''
+- name: Manage AWS group memberships (via SCIM)
+  scim_group_membership:
+    base_url: "https://scim.eu-west-1.amazonaws.com/foobar/scim/v2"
+    authorization: "Bearer {{ aws_api_token }}"
+    member_lookup: query
+
+    memberships:
+    - user_id: "906722b2be-8b7a9f05-3f2c-4b9a-9d35-2b6b2a1f7d4e"
+      groups:
+      - Guardians
+      - Avengers
+    - user_id: "906722b2be-1c2d3e4f-5a6b-7c8d-9e0f-a1b2c3d4e5f6"
+      groups: []
+'''
+
+RETURN = '''
+changed:
+    description: Returns if anything has changed
+    type: boolean
+    returned: always
+added:
+    description: The memberships which got added, as a list of `user_id`/`group` pairs
+    type: list
+    returned: always
+removed:
+    description: The memberships which got removed, as a list of `user_id`/`group` pairs
+    type: list
+    returned: always
+unknown_groups:
+    description: Requested group names which do not exist at the external system
+    type: list
+    returned: always
+retries:
+    description: How many requests got retried
+    type: int
+    returned: always
+retry_sleep:
+    description: How many seconds were spent waiting for retries
+    type: float
+    returned: always
+'''
+
+
+# attributes needed to index the groups and their members
+GROUP_ATTRIBUTES = 'displayName,members'
+
+
+def load_groups(module, base_url, default_headers):
+    """
+    Load all groups of the service.
+
+    Returns an index of display name -> list of group ids, and an index of
+    group id -> set of member ids.  The latter is `None` if the members are
+    not taken from the listing (see `member_lookup`).
+    """
+    groups_by_name = {}
+    members_by_group = {}
+    listed = module.params['member_lookup'] == 'list'
+
+    url = f"{base_url}/Groups"
+    if module.params['projection']:
+        attributes = GROUP_ATTRIBUTES if listed else 'displayName'
+        url = f"{url}?attributes={attributes}"
+
+    resources = list_resources(
+        module,
+        url,
+        default_headers,
+        module.params['page_size'],
+    )
+    for group in resources:
+        groups_by_name.setdefault(group['displayName'], []).append(group['id'])
+
+        # services may leave out `members` if a group has none
+        members_by_group[group['id']] = {
+            member['value'] for member in group.get('members', [])
+        }
+
+    if not listed:
+        return groups_by_name, None
+
+    return groups_by_name, members_by_group
+
+
+def user_groups(module, base_url, default_headers, user_id):
+    """Return the ids of all groups `user_id` is a member of."""
+    query = urllib.parse.quote(f'members eq "{user_id}"')
+    url = f"{base_url}/Groups?filter={query}"
+    if module.params['projection']:
+        # only the ids matter, not the (possibly huge) groups
+        url = f"{url}&attributes=id"
+
+    return {
+        group['id']
+        for group in list_resources(module, url, default_headers, module.params['page_size'])
+    }
+
+
+def lookup_members(module, base_url, default_headers, group_ids, user_ids):
+    """
+    Build the index of group id -> set of member ids by asking for the groups
+    of every user, with one (paged) query per user.  Only the given users are
+    looked at.
+    """
+    found = map_concurrently(
+        lambda user_id: user_groups(module, base_url, default_headers, user_id),
+        user_ids,
+        module.params['max_concurrency'],
+    )
+
+    members_by_group = {group_id: set() for group_id in group_ids}
+    for user_id, groups in zip(user_ids, found):
+        for group_id in groups:
+            if group_id in members_by_group:
+                members_by_group[group_id].add(user_id)
+
+    return members_by_group
+
+
+def patch_members(module, base_url, default_headers, group_id, changes):
+    """
+    Add and remove many members of a single group with one PatchOp.
+
+    `changes` is a list of (user id, op) pairs, with op being either `add` or
+    `remove`.
+    """
+    operations = []
+    for op in ('add', 'remove'):
+        user_ids = [user_id for user_id, change_op in changes if change_op == op]
+        if not user_ids:
+            continue
+
+        operations.append({
+            'op': op,
+            'path': 'members',
+            'value': [{'value': user_id} for user_id in user_ids],
+        })
+
+    body = {
+        'schemas': [
+            'urn:ietf:params:scim:api:messages:2.0:PatchOp',
+        ],
+        'Operations': operations,
+    }
+
+    resp, info = fetch_url(
+        module,
+        f"{base_url}/Groups/{group_id}",
+        headers=default_headers,
+        method='PATCH',
+        data=module.jsonify(body),
+    )
+
+    status_code = info['status']
+    if status_code not in range(200, 300):
+        module.fail_json(
+            msg=f"changing {len(changes)} member(s) of group {group_id} failed: "
+                + f"received status {status_code}, expected 2xx",
+            info=info,
+        )
+
+    return True
+
+
+def group_requests(add, remove, members_per_request):
+    """
+    Group the membership changes by group and split them into chunks of at
+    most `members_per_request` members.
+
+    Returns a list of (group id, list of (user id, op) pairs).
+    """
+    changes_by_group = {}
+    for op, pairs in (('add', add), ('remove', remove)):
+        for group_id, user_id in pairs:
+            changes_by_group.setdefault(group_id, []).append((user_id, op))
+
+    return [
+        (group_id, changes[start:start + members_per_request])
+        for group_id, changes in changes_by_group.items()
+        for start in range(0, len(changes), members_per_request)
+    ]
+
+
+def plan_memberships(memberships, groups_by_name, members_by_group):
+    """
+    Compare the requested memberships with the current ones.
+
+    Returns the lists of (group id, user id) pairs to add and to remove, and
+    the list of requested group names which do not exist.
+    """
+    add = []
+    remove = []
+    unknown_groups = set()
+
+    for membership in memberships:
+        user_id = membership['user_id']
+
+        wanted = set()
+        for name in membership['groups']:
+            if name not in groups_by_name:
+                unknown_groups.add(name)
+                continue
+            wanted.update(groups_by_name[name])
+
+        current = {
+            group_id
+            for group_id, members in members_by_group.items()
+            if user_id in members
+        }
+
+        add.extend((group_id, user_id) for group_id in sorted(wanted - current))
+        remove.extend((group_id, user_id) for group_id in sorted(current - wanted))
+
+    return add, remove, sorted(unknown_groups)
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        base_url=dict(type='str', required=True),
+        authorization=dict(type='str', required=True),
+        memberships=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                user_id=dict(type='str', required=True),
+                groups=dict(type='list', elements='str', required=True),
+            ),
+        ),
+        page_size=dict(type='int', required=False, default=100),
+        members_per_request=dict(type='int', required=False, default=100),
+        member_lookup=dict(type='str', required=False, default='list', choices=['list', 'query']),
+        projection=dict(type='bool', required=False, default=False),
+        max_concurrency=dict(type='int', required=False, default=4),
+        max_retries=dict(type='int', required=False, default=5),
+        retry_budget=dict(type='int', required=False, default=300),
+    )
+
+    result = dict(
+        changed=False,
+        added=[],
+        removed=[],
+        unknown_groups=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=False
+    )
+
+    # vars for easier usage
+    base_url = module.params['base_url']
+    default_headers = {
+        'Authorization': module.params['authorization'],
+        'Content-Type': 'application/json',
+    }
+    memberships = module.params['memberships']
+    max_concurrency = module.params['max_concurrency']
+    RETRY.configure(module.params['max_retries'], module.params['retry_budget'])
+
+    # requests sent from worker threads must not end the module run
+    thread_module = FailureRaisingModule(module)
+
+    groups_by_name, members_by_group = load_groups(module, base_url, default_headers)
+    if members_by_group is None:
+        # the service does not tell us about the members -> ask for the
+        # groups of the users we care about
+        try:
+            members_by_group = lookup_members(
+                thread_module,
+                base_url,
+                default_headers,
+                [group_id for group_ids in groups_by_name.values() for group_id in group_ids],
+                [membership['user_id'] for membership in memberships],
+            )
+        except RequestFailure as failure:
+            module.fail_json(**failure.details, **result)
+
+    add, remove, unknown_groups = plan_memberships(memberships, groups_by_name, members_by_group)
+    for name in unknown_groups:
+        module.warn(f"group {name} does not exist")
+    result['unknown_groups'] = unknown_groups
+
+    # one request per group (and chunk of members) instead of one per user
+    requests = group_requests(add, remove, module.params['members_per_request'])
+
+    def apply(request):
+        group_id, changes = request
+        try:
+            patch_members(thread_module, base_url, default_headers, group_id, changes)
+        except RequestFailure as failure:
+            return failure.details['msg']
+
+    failed = []
+    for (group_id, changes), error in zip(requests, map_concurrently(apply, requests, max_concurrency)):
+        for user_id, op in changes:
+            membership = {'group': group_id, 'user_id': user_id}
+            if error is not None:
+                failed.append({**membership, 'op': op, 'msg': error})
+            elif op == 'add':
+                result['added'].append(membership)
+            else:
+                result['removed'].append(membership)
+
+    result['changed'] = bool(result['added'] or result['removed'])
+
+    if failed:
+        module.fail_json(
+            msg=f"failed to change {len(failed)} membership(s)",
+            failed=failed,
+            **result,
+            **RETRY.stats()
+        )
+
+    module.exit_json(**result, **RETRY.stats())
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
 #!/usr/bin/python
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.urls import fetch_url
+from ansible.module_utils.scim import (
+    RETRY,
+    FailureRaisingModule,
+    RequestFailure,
+    fetch_url,
+    list_resources,
+    map_concurrently,
+)
 
 import json
+import re
 import time
 import urllib.parse # quote
 
@@ -23,6 +31,11 @@ version_added: "4.0"
 
 description:
   - "This module is used to manage users at external services via SCIM."
+  - "It either manages a single user, or a whole list of users at once when
+    `users` is given.  In list mode the create/activate/update/delete
+    operations for all users are sent through the SCIM `/Bulk` endpoint if
+    the service advertises bulk support, otherwise they are sent one by
+    one."
 
 options:
   base_url:
@@ -36,22 +49,30 @@ options:
   givenName:
     description:
       - The given name of a user.
-    required: true
+      - Required unless `users` is given.
+    required: false
   familyName:
     description:
       - The family name of a user.
-    required: true
+      - Required unless `users` is given.
+    required: false
   userName:
     description:
       - An unique identifier of a user.
-    required: true
+      - Required unless `users` is given.
+    required: false
   email:
     description:
       - The email address for a user.
-    required: true
+      - Required unless `users` is given.
+    required: false
   update:
     description:
       - Whether the user should be updated if they already exist.
+      - The user is only updated if any of its attributes differ from the
+        ones on the external system.  SCIM v2 services only receive the
+        changed attributes as a `PatchOp`, SCIM v1 services receive the
+        whole user.
       - Default is 'true'.
     required: false
   ignored_attributes_on_update:
@@ -76,11 +97,83 @@ options:
   search_query:
     description:
       - The search query used to find the user, e.g. `email Eq "fritzfantom@example.com"`.
-    required: true
+      - Required unless `users` is given.
+    required: false
   state:
     description:
       - Default is 'present'. If 'absent' user will be deleted.
     required: false
+  users:
+    description:
+      - A list of users to manage in one go.  Every entry takes the same
+        options as a single user (`givenName`, `familyName`, `userName`,
+        `email`, `search_query`, `extra_attributes`, `update`,
+        `ignored_attributes_on_update`, `active` and `state`).
+      - Options which are not set on an entry fall back to the value given
+        to the module itself.
+      - Mutually exclusive with `givenName`, `familyName`, `userName`,
+        `email` and `search_query`.
+    required: false
+  bulk_chunk_size:
+    description:
+      - The maximum number of operations to send in a single `/Bulk`
+        request.  The service's own `maxOperations` limit is respected as
+        well.
+      - Only used when `users` is given.
+      - Default is '100'.
+    required: false
+  snapshot:
+    description:
+      - Instead of searching for every user with its own `search_query`,
+        page through all users of the service once and look them up in an
+        index by `userName`, primary email and `id`.
+      - Only users which are part of `users` are kept while paging, so
+        memory usage does not grow with the size of the directory.
+      - Search queries which are not of the form `<attribute> eq "<value>"`
+        (with `<attribute>` being `userName`, `email`, `emails`,
+        `emails.value` or `id`) are still sent as a filter request.
+      - Only used when `users` is given.
+      - Default is 'false'.
+    required: false
+  snapshot_page_size:
+    description:
+      - The number of users to request per page while taking the snapshot.
+        The service's `filter.maxResults` limit is respected as well.
+      - Default is '100'.
+    required: false
+  projection:
+    description:
+      - Only ask the service for the attributes which are compared with
+        the desired user (via the `attributes` query parameter), instead
+        of whole user resources.
+      - Not every service supports the `attributes` parameter, some ignore
+        it and others reject the request.  Only enable this for services it
+        has been checked with.
+      - Default is 'false'.
+    required: false
+  max_concurrency:
+    description:
+      - The maximum number of users which are managed at the same time,
+        i.e. the maximum number of requests in flight to `base_url`.  The
+        requests for a single user are always sent one after another.
+      - Only used when `users` is given.
+      - Default is '4'.
+    required: false
+  max_retries:
+    description:
+      - How often a single request is retried if the service throttles it
+        (429/503) or fails with a 5xx status.  The delay between retries
+        honours `Retry-After` and `X-RateLimit-Reset`, otherwise it backs
+        off exponentially.
+      - Default is '5'.
+    required: false
+  retry_budget:
+    description:
+      - The maximum number of seconds to spend waiting for retries during
+        the whole module run.  Once it is used up failed requests are not
+        retried anymore.
+      - Default is '300'.
+    required: false
 
 author:
   - Georg Gadinger (georg.gadinger@runtastic.com)
@@ -154,6 +247,34 @@ EXAMPLES = '''
     search_query: 'userName eq "fritz.fantom@runtastic.com"'
 
     state: present
+
+- name: Manage a list of Miro users at once (via SCIM /Bulk)
+  scim_user:
+    base_url: "https://miro.com/api/v1/scim"
+    authorization: "Bearer {{ miro_api_token }}"
+    scim_version: 'v2'
+
+    # applies to every user unless the entry overrides it
+    extra_attributes:
+      userType: 'Full'
+
+    users:
+    - givenName: "Fritz"
+      familyName: "Fantom"
+      userName: "fritz.fantom@runtastic.com"
+      email: "fritz.fantom@runtastic.com"
+      search_query: 'userName eq "fritz.fantom@runtastic.com"'
+    - givenName: "Peter"
+      familyName: "Quill"
+      userName: "peter.quill@runtastic.com"
+      email: "peter.quill@runtastic.com"
+      search_query: 'userName eq "peter.quill@runtastic.com"'
+      state: absent
+
+    bulk_chunk_size: 50
+
+    # look up all users by paging through /Users once
+    snapshot: yes
 '''
 
 RETURN = '''
@@ -189,35 +310,204 @@ deleted:
     description: Whether the user got deleted
     type: boolean
     returned: always
+users:
+    description: One result per entry of `users`, in the same order.  Every
+        result has the same keys as a single user run, plus `userName`.  If
+        managing the user failed, `failed` is set and `msg` tells why.
+    type: list
+    returned: when `users` is given
+summary:
+    description: The number of users which got created, activated,
+        deactivated, updated, deleted or failed.
+    type: dict
+    returned: when `users` is given
+bulk:
+    description: Whether the operations were sent through the `/Bulk` endpoint
+    type: boolean
+    returned: when `users` is given
+retries:
+    description: How many requests got retried
+    type: int
+    returned: always
+retry_sleep:
+    description: How many seconds were spent waiting for retries
+    type: float
+    returned: always
 '''
 
+# options which can be set per entry of `users`
+USER_OPTIONS = [
+    'givenName',
+    'familyName',
+    'userName',
+    'email',
+    'search_query',
+    'extra_attributes',
+    'update',
+    'ignored_attributes_on_update',
+    'active',
+    'state',
+]
+
+# /Bulk requests can take quite a bit longer than regular requests
+BULK_TIMEOUT = 120
+
+# search query attributes which can be answered from a snapshot
+SNAPSHOT_ATTRIBUTES = {
+    'username': 'userName',
+    'email': 'email',
+    'emails': 'email',
+    'emails.value': 'email',
+    'id': 'id',
+}
+SNAPSHOT_QUERY = re.compile(r'^\s*([\w.]+)\s+eq\s+"(.*)"\s*$', re.IGNORECASE)
+
+# attributes needed besides the ones set via user_body(): to find a user in
+# the snapshot and to know whether they need to be (de)activated
+LOOKUP_ATTRIBUTES = ['id', 'userName', 'emails', 'active']
+
+
+def user_attributes(module, users):
+    """
+    Return the `attributes` query parameter which limits the returned
+    resources to the attributes needed to compare them with `users`.
+
+    Returns an empty string if `projection` is disabled.
+    """
+    if not module.params['projection']:
+        return ''
+
+    attributes = set(LOOKUP_ATTRIBUTES)
+    for user in users:
+        attributes.update(user_body(user))
+
+    return 'attributes=' + urllib.parse.quote(','.join(sorted(attributes)), safe=',:')
+
 
-def find_user(module, base_url, default_headers):
-    search_query = urllib.parse.quote(module.params['search_query'])
+def find_user(module, base_url, default_headers, user, index=None):
+    if index is not None:
+        key = snapshot_key(user['search_query'])
+        if key is not None:
+            # the snapshot has every user we are looking for
+            return index.get(key)
+
+    search_query = urllib.parse.quote(user['search_query'])
+    url = f"{base_url}/Users?filter={search_query}"
+
+    attributes = user_attributes(module, [user])
+    if attributes:
+        url = f"{url}&{attributes}"
 
     resp, info = fetch_url(
         module,
-        f"{base_url}/Users?filter={search_query}",
+        url,
         headers=default_headers,
     )
 
+    status_code = info['status']
+    if status_code not in range(200, 300):
+        module.fail_json(
+            msg=f"search failed: received status {status_code}, expected 2xx",
+            info=info,
+        )
+
     body = json.loads(resp.read())
 
     if (not 'Resources' in body) or (len(body['Resources']) == 0):
         # no user found for the query
-        return None, False
+        return None
+
+    return body['Resources'][0]
+
+
+def service_provider_config(module, base_url, default_headers):
+    """
+    Fetch the service provider configuration of the service.
+
+    Returns an empty dict if the service does not provide one.
+    """
+    endpoint = 'ServiceProviderConfig'
+    if module.params['scim_version'] != 'v2':
+        endpoint = 'ServiceProviderConfigs'
+
+    resp, info = fetch_url(
+        module,
+        f"{base_url}/{endpoint}",
+        headers=default_headers,
+    )
+
+    if info['status'] not in range(200, 300):
+        # no (readable) service provider configuration
+        return {}
+
+    return json.loads(resp.read())
+
+
+def snapshot_key(search_query):
+    """
+    Turn a search query like `userName eq "frf"` into a key for the snapshot
+    index.
+
+    Returns `None` if the query can not be answered from the snapshot.
+    """
+    match = SNAPSHOT_QUERY.match(search_query)
+    if match is None:
+        return None
+
+    attribute = SNAPSHOT_ATTRIBUTES.get(match.group(1).lower())
+    if attribute is None:
+        return None
 
-    user = body['Resources'][0]
+    value = match.group(2)
+    if attribute != 'id':
+        # user names and emails are case insensitive
+        value = value.lower()
 
-    return user['id'], user['active']
+    return attribute, value
 
 
-def user_body(module, ignored_attributes=[]):
-    given_name       = module.params['givenName']
-    family_name      = module.params['familyName']
-    user_name        = module.params['userName']
-    email            = module.params['email']
-    extra_attributes = module.params['extra_attributes']
+def snapshot_keys(resource):
+    """Return all snapshot index keys of a user resource."""
+    keys = [('id', resource['id'])]
+
+    if 'userName' in resource:
+        keys.append(('userName', resource['userName'].lower()))
+
+    emails = resource.get('emails', [])
+    primary = [email for email in emails if email.get('primary')] or emails[:1]
+    for email in primary:
+        keys.append(('email', email['value'].lower()))
+
+    return keys
+
+
+def snapshot_users(module, base_url, default_headers, users, page_size):
+    """
+    Page through all users of the service once and index the ones we are
+    looking for by their snapshot keys.
+    """
+    wanted = {snapshot_key(user['search_query']) for user in users}
+    index = {}
+
+    url = f"{base_url}/Users"
+    attributes = user_attributes(module, users)
+    if attributes:
+        url = f"{url}?{attributes}"
+
+    for resource in list_resources(module, url, default_headers, page_size):
+        for key in snapshot_keys(resource):
+            if key in wanted:
+                index.setdefault(key, resource)
+
+    return index
+
+
+def user_body(user, ignored_attributes=[]):
+    given_name       = user['givenName']
+    family_name      = user['familyName']
+    user_name        = user['userName']
+    email            = user['email']
+    extra_attributes = user['extra_attributes']
 
     display_name = f"{given_name} {family_name}"
 
@@ -258,7 +548,7 @@ def user_body(module, ignored_attributes=[]):
     return merged
 
 
-def create_user(module, base_url, default_headers):
+def create_body(module, user):
     use_scim_v2 = module.params['scim_version'] == 'v2'
     schemas = []
 
@@ -272,33 +562,14 @@ def create_user(module, base_url, default_headers):
             'urn:scim:schemas:core:1.0',
         ]
 
-    body = {**user_body(module), 'schemas': schemas}
-
-    resp, info = fetch_url(
-        module,
-        f"{base_url}/Users",
-        headers=default_headers,
-        method='POST',
-        data=module.jsonify(body),
-    )
-
-    status_code = info['status']
-    if status_code not in range(200, 300):
-        module.fail_json(
-            msg=f"create failed: received status {status_code}, expected 2xx",
-            info=info,
-        )
-
-    response = json.loads(resp.read())
-
-    return response['id']
+    return {**user_body(user), 'schemas': schemas}
 
 
-def activate_user(module, base_url, default_headers, user_id, active=True):
+def activate_body(module, active=True):
     use_scim_v2 = module.params['scim_version'] == 'v2'
 
     if use_scim_v2:
-        body = {
+        return {
             'schemas': [
                 'urn:ietf:params:scim:api:messages:2.0:PatchOp',
             ],
@@ -310,20 +581,141 @@ def activate_user(module, base_url, default_headers, user_id, active=True):
                 },
             ],
         }
-    else:
+
+    return {
+        'schemas': [
+            'urn:scim:schemas:core:1.0',
+        ],
+        'active': active
+    }
+
+
+def attribute_matches(desired, current):
+    """
+    Check whether the current value of an attribute already is the desired
+    one.  Additional sub-attributes returned by the service are ignored, and
+    the order of multi-valued attributes does not matter.
+    """
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(
+            attribute_matches(value, current.get(key))
+            for key, value in desired.items()
+        )
+
+    if isinstance(desired, list):
+        return isinstance(current, list) and len(desired) == len(current) and all(
+            any(attribute_matches(value, current_value) for current_value in current)
+            for value in desired
+        )
+
+    return desired == current
+
+
+def user_changes(user, resource):
+    """
+    Compare the desired user with the resource returned by the service.
+
+    Returns a dict of attribute path -> desired value for every attribute
+    which needs to be changed.
+    """
+    desired = user_body(user, ignored_attributes=user['ignored_attributes_on_update'])
+    # (de)activating a user is handled on its own
+    desired.pop('active', None)
+
+    changes = {}
+    for attribute, value in desired.items():
+        current = resource.get(attribute)
+
+        if isinstance(value, dict) and isinstance(current, dict):
+            # only change the sub-attributes that differ, e.g. `name.givenName`
+            separator = ':' if attribute.startswith('urn:') else '.'
+            for sub_attribute, sub_value in value.items():
+                if not attribute_matches(sub_value, current.get(sub_attribute)):
+                    changes[f"{attribute}{separator}{sub_attribute}"] = sub_value
+        elif not attribute_matches(value, current):
+            changes[attribute] = value
+
+    return changes
+
+
+def update_body(module, user, user_id):
+    body = {
+        **user_body(user, ignored_attributes=user['ignored_attributes_on_update']),
+        'id': user_id,
+    }
+    use_scim_v2 = module.params['scim_version'] == 'v2'
+
+    if use_scim_v2:
         body = {
             'schemas': [
-                'urn:scim:schemas:core:1.0',
+                'urn:ietf:params:scim:schemas:core:2.0:User',
+                'urn:ietf:params:scim:schemas:extension:enterprise:2.0:User',
             ],
-            'active': active
+            **body
         }
 
+    return body
+
+
+def patch_body(changes):
+    return {
+        'schemas': [
+            'urn:ietf:params:scim:api:messages:2.0:PatchOp',
+        ],
+        'Operations': [
+            {
+                'op': 'Replace',
+                'path': path,
+                'value': value,
+            }
+            for path, value in changes.items()
+        ],
+    }
+
+
+def update_request(module, user, resource):
+    """
+    Build the request for updating a user.
+
+    SCIM v2 services only get the changed attributes as a PatchOp, for SCIM
+    v1 services the whole user is replaced.
+
+    Returns the method and the body of the request.
+    """
+    if module.params['scim_version'] == 'v2':
+        return 'PATCH', patch_body(user_changes(user, resource))
+
+    return 'PUT', update_body(module, user, resource['id'])
+
+
+def create_user(module, base_url, default_headers, user):
+    resp, info = fetch_url(
+        module,
+        f"{base_url}/Users",
+        headers=default_headers,
+        method='POST',
+        data=module.jsonify(create_body(module, user)),
+    )
+
+    status_code = info['status']
+    if status_code not in range(200, 300):
+        module.fail_json(
+            msg=f"create failed: received status {status_code}, expected 2xx",
+            info=info,
+        )
+
+    response = json.loads(resp.read())
+
+    return response['id']
+
+
+def activate_user(module, base_url, default_headers, user_id, active=True):
     resp, info = fetch_url(
         module,
         f"{base_url}/Users/{user_id}",
         headers=default_headers,
         method='PATCH',
-        data=module.jsonify(body),
+        data=module.jsonify(activate_body(module, active=active)),
     )
 
     status_code = info['status']
@@ -337,24 +729,14 @@ def activate_user(module, base_url, default_headers, user_id, active=True):
     return True
 
 
-def update_user(module, base_url, default_headers, user_id, ignored_attributes_on_update):
-    body = {**user_body(module, ignored_attributes=ignored_attributes_on_update), 'id': user_id}
-    use_scim_v2 = module.params['scim_version'] == 'v2'
-
-    if use_scim_v2:
-        body = {
-            'schemas': [
-                'urn:ietf:params:scim:schemas:core:2.0:User',
-                'urn:ietf:params:scim:schemas:extension:enterprise:2.0:User',
-            ],
-            **body
-        }
+def update_user(module, base_url, default_headers, user, resource):
+    method, body = update_request(module, user, resource)
 
     resp, info = fetch_url(
         module,
-        f"{base_url}/Users/{user_id}",
+        f"{base_url}/Users/{resource['id']}",
         headers=default_headers,
-        method='PUT',
+        method=method,
         data=module.jsonify(body),
     )
 
@@ -387,29 +769,14 @@ def delete_user(module, base_url, default_headers, user_id):
     return True
 
 
-def run_module():
-    # define available arguments/parameters a user can pass to the module
-    module_args = dict(
-        base_url=dict(type='str', required=True),
-        authorization=dict(type='str', required=True),
-        givenName=dict(type='str', required=True),
-        familyName=dict(type='str', required=True),
-        userName=dict(type='str', required=True),
-        email=dict(type='str', required=True),
-        update=dict(type='bool', required=False, default=True),
-        ignored_attributes_on_update=dict(type='list', required=False, default=[]),
-        active=dict(type='bool', required=False, default=True),
-        scim_version=dict(type='str', required=False, default='v1', choices=['v1', 'v2']),
-        extra_attributes=dict(type='dict', required=False, default=dict()),
-        search_query=dict(type='str', required=True),
-        state=dict(choices=['present', 'absent'], default='present')
-    )
+def plan_user(user, resource):
+    """
+    Figure out which actions are needed to bring a single user into the
+    desired state.
 
-    # seed the result dict in the object
-    # we primarily care about changed and state
-    # change is if this module effectively modified the target
-    # state will include any data that you want your module to pass back
-    # for consumption, for example, in a subsequent task
+    Returns the list of actions (in the order they need to be performed in)
+    and the result for this user, assuming all of the actions succeed.
+    """
     result = dict(
         changed=False,
 
@@ -421,46 +788,20 @@ def run_module():
         updated=False,
         deleted=False,
     )
+    actions = []
 
-    # the AnsibleModule object will be our abstraction working with Ansible
-    # this includes instantiation, a couple of common attr would be the
-    # args/params passed to the execution, as well as if the module
-    # supports check mode
-    module = AnsibleModule(
-        argument_spec=module_args,
-        supports_check_mode=False
-    )
-
-    # if the user is working with this module in only check mode we do not
-    # want to make any changes to the environment, just return the current
-    # state with no modifications
-    if module.check_mode:
-        module.exit_json(**result)
-
-    # manipulate or modify the state as needed (this is going to be the
-    # part where your module will do what it needs to do)
-
-    # vars for easier usage
-    base_url = module.params['base_url']
-    default_headers = {
-        'Authorization': module.params['authorization'],
-        'Content-Type': 'application/json',
-    }
-    should_be_present = module.params['state'] != 'absent'
-    should_update_user = module.params['update']
-    should_be_active = module.params['active']
-    ignored_attributes_on_update = module.params['ignored_attributes_on_update']
+    should_be_present = user['state'] != 'absent'
+    should_update_user = user['update']
+    should_be_active = user['active']
 
-    user_id, user_active = find_user(module, base_url, default_headers)
-    if user_id is None:
+    if resource is None:
         # no user found -> create them, set the user_id later
 
         if should_be_present:
             # user should exist -> create them
-            user_id = create_user(module, base_url, default_headers)
+            actions.append('create')
             result.update({
                 'changed': True,
-                'user_id': user_id,
                 'exists': True,
                 'created': True,
             })
@@ -468,7 +809,7 @@ def run_module():
             if not should_be_active:
                 # for some reason the user should not be active after creation
                 # -> deactivate them
-                activate_user(module, base_url, default_headers, user_id, active=False)
+                actions.append('deactivate')
                 result.update({
                     'changed': True,
                     'exists': False,
@@ -479,7 +820,8 @@ def run_module():
             pass
     else:
         # the user is known at the external system -> set the user_id
-        result.update({'user_id': user_id, 'exists': True})
+        user_active = resource['active']
+        result.update({'user_id': resource['id'], 'exists': True})
 
         if should_be_present:
             # state is present
@@ -490,14 +832,14 @@ def run_module():
                     pass
                 else:
                     # user exists and is not active, but should be -> activate them
-                    activate_user(module, base_url, default_headers, user_id, active=True)
+                    actions.append('activate')
                     result.update({'changed': True, 'activated': True})
                     user_active = True
             else:
                 # user should NOT be active
                 if user_active:
                     # user exists and is active -> deactivate them
-                    activate_user(module, base_url, default_headers, user_id, active=False)
+                    actions.append('deactivate')
                     result.update({
                         'changed': True,
                         'exists': False,
@@ -508,28 +850,457 @@ def run_module():
                     # user exists and is already inactive -> no need to do anything
                     pass
 
-            if user_active and should_update_user:
-                # user exists and is active -> update the user
-                update_user(
-                    module,
-                    base_url,
-                    default_headers,
-                    user_id,
-                    ignored_attributes_on_update,
-                )
-                # can't really tell if the user actually changed, so always set changed to true
+            if user_active and should_update_user and user_changes(user, resource):
+                # user exists, is active and differs from what we want -> update the user
+                actions.append('update')
                 result.update({'changed': True, 'updated': True})
         else:
             # state is absent -> delete them
-            delete_user(module, base_url, default_headers, user_id)
+            actions.append('delete')
             result.update({
                 'changed': True,
                 'exists': False,
                 'deleted': True,
             })
 
+    return actions, result
+
+
+def apply_actions(module, base_url, default_headers, user, resource, actions):
+    """
+    Perform the planned actions for a single user one request at a time.
+
+    Returns the user_id, which is only known after a `create`.
+    """
+    user_id = resource['id'] if resource is not None else None
+
+    for action in actions:
+        if action == 'create':
+            user_id = create_user(module, base_url, default_headers, user)
+        elif action == 'activate':
+            activate_user(module, base_url, default_headers, user_id, active=True)
+        elif action == 'deactivate':
+            activate_user(module, base_url, default_headers, user_id, active=False)
+        elif action == 'update':
+            update_user(module, base_url, default_headers, user, resource)
+        elif action == 'delete':
+            delete_user(module, base_url, default_headers, user_id)
+
+    return user_id
+
+
+def bulk_config(module, config):
+    """
+    Look up the bulk capabilities of the service.
+
+    Returns the `bulk` section of the service provider configuration, or
+    `None` if the service does not support /Bulk.
+    """
+    if module.params['scim_version'] != 'v2':
+        # only SCIM 2.0 /Bulk requests are supported
+        return None
+
+    bulk = config.get('bulk', {})
+    if not bulk.get('supported', False):
+        return None
+
+    return bulk
+
+
+def bulk_operation(module, index, action, user, resource):
+    """Build a single /Bulk operation for `action` of the user at `index`."""
+    bulk_id = f"{index}-{action}"
+
+    if resource is None:
+        # the user is created in the same request -> refer to its bulkId
+        path = f"/Users/bulkId:{index}-create"
+    else:
+        path = f"/Users/{resource['id']}"
+
+    if action == 'create':
+        return {
+            'method': 'POST',
+            'bulkId': bulk_id,
+            'path': '/Users',
+            'data': create_body(module, user),
+        }
+    if action in ('activate', 'deactivate'):
+        return {
+            'method': 'PATCH',
+            'bulkId': bulk_id,
+            'path': path,
+            'data': activate_body(module, active=(action == 'activate')),
+        }
+    if action == 'update':
+        method, body = update_request(module, user, resource)
+        return {
+            'method': method,
+            'bulkId': bulk_id,
+            'path': path,
+            'data': body,
+        }
+    if action == 'delete':
+        return {
+            'method': 'DELETE',
+            'bulkId': bulk_id,
+            'path': path,
+        }
+
+
+def bulk_chunks(module, operations, max_operations, max_payload_size):
+    """
+    Split the operations (a list of per-user lists) into chunks that fit into
+    a single /Bulk request each.
+
+    The operations of a single user always end up in the same chunk, as later
+    operations might refer to the bulkId of an earlier one.
+    """
+    chunk = []
+    chunk_size = 0
+
+    for user_operations in operations:
+        size = sum(len(module.jsonify(op)) for op in user_operations)
+
+        too_many = len(chunk) + len(user_operations) > max_operations
+        too_large = max_payload_size and chunk_size + size > max_payload_size
+        if chunk and (too_many or too_large):
+            yield chunk
+            chunk = []
+            chunk_size = 0
+
+        chunk.extend(user_operations)
+        chunk_size += size
+
+    if chunk:
+        yield chunk
+
+
+def bulk_send(module, base_url, default_headers, chunk):
+    """
+    Send a single /Bulk request.
+
+    Returns a dict of bulkId -> operation response.
+    """
+    body = {
+        'schemas': [
+            'urn:ietf:params:scim:api:messages:2.0:BulkRequest',
+        ],
+        'Operations': chunk,
+    }
+
+    resp, info = fetch_url(
+        module,
+        f"{base_url}/Bulk",
+        headers=default_headers,
+        method='POST',
+        data=module.jsonify(body),
+        timeout=BULK_TIMEOUT,
+    )
+
+    status_code = info['status']
+    if status_code not in range(200, 300):
+        module.fail_json(
+            msg=f"bulk request failed: received status {status_code}, expected 2xx",
+            info=info,
+        )
+
+    response = json.loads(resp.read())
+
+    return {op.get('bulkId'): op for op in response.get('Operations', [])}
+
+
+def bulk_status(operation_response):
+    # the status is a string in SCIM 2.0, some services return an object
+    # like in SCIM 1.1 (`{"code": "201"}`) though
+    status = operation_response.get('status', 0)
+    if isinstance(status, dict):
+        status = status.get('code', 0)
+
+    return int(status)
+
+
+def bulk_user_id(operation_response):
+    # the id of a created user is only available as part of the location
+    location = operation_response.get('location', '')
+
+    return location.rstrip('/').rsplit('/', 1)[-1] or None
+
+
+def mark_failed(user_result, details):
+    user_result.update({
+        'failed': True,
+        'msg': details['msg'],
+    })
+    if details.get('info'):
+        user_result['status'] = details['info'].get('status')
+    if details.get('response'):
+        user_result['response'] = details['response']
+
+
+def user_params(module, entry):
+    """Merge an entry of `users` with the module-wide defaults."""
+    user = {}
+
+    for option in USER_OPTIONS:
+        value = entry.get(option)
+        if value is None:
+            value = module.params[option]
+        user[option] = value
+
+    return user
+
+
+def run_users(module, base_url, default_headers):
+    users = [user_params(module, entry) for entry in module.params['users']]
+    max_concurrency = module.params['max_concurrency']
+    user_module = FailureRaisingModule(module)
+    config = None
+    index = None
+
+    if module.params['snapshot'] and users:
+        config = service_provider_config(module, base_url, default_headers)
+
+        page_size = module.params['snapshot_page_size']
+        max_results = config.get('filter', {}).get('maxResults')
+        if max_results:
+            page_size = min(page_size, max_results)
+
+        index = snapshot_users(module, base_url, default_headers, users, page_size)
+
+    # figure out what needs to be done for every user
+    def plan(user):
+        try:
+            resource = find_user(user_module, base_url, default_headers, user, index)
+        except RequestFailure as failure:
+            user_result = {'userName': user['userName'], 'changed': False}
+            mark_failed(user_result, failure.details)
+            return user, None, [], user_result
+
+        actions, user_result = plan_user(user, resource)
+        user_result['userName'] = user['userName']
+        return user, resource, actions, user_result
+
+    plans = map_concurrently(plan, users, max_concurrency)
+
+    results = [user_result for _, _, _, user_result in plans]
+    result = dict(
+        changed=any(user_result['changed'] for user_result in results),
+        users=results,
+        bulk=False,
+    )
+
+    if result['changed']:
+        if config is None:
+            config = service_provider_config(module, base_url, default_headers)
+
+        bulk = bulk_config(module, config)
+        if bulk is None:
+            # no /Bulk support -> fall back to individual requests
+            apply_individually(user_module, base_url, default_headers, plans, max_concurrency)
+        else:
+            result['bulk'] = True
+            apply_bulk(user_module, base_url, default_headers, plans, bulk, max_concurrency)
+
+    succeeded = [user_result for user_result in results if not user_result.get('failed')]
+    result['summary'] = {
+        key: sum(1 for user_result in succeeded if user_result[key])
+        for key in ('created', 'activated', 'deactivated', 'updated', 'deleted')
+    }
+    result['summary']['failed'] = len(results) - len(succeeded)
+
+    return result
+
+
+def apply_individually(module, base_url, default_headers, plans, max_concurrency):
+    """
+    Perform the planned actions of every user with individual requests.
+
+    Users are reconciled concurrently, the actions of a single user are
+    always performed in order.
+    """
+    def apply(plan):
+        user, resource, actions, user_result = plan
+        if not actions:
+            return
+
+        try:
+            user_result['user_id'] = apply_actions(module, base_url, default_headers, user, resource, actions)
+        except RequestFailure as failure:
+            mark_failed(user_result, failure.details)
+
+    map_concurrently(apply, plans, max_concurrency)
+
+
+def apply_bulk(module, base_url, default_headers, plans, bulk, max_concurrency):
+    """Perform the planned actions of every user via /Bulk requests."""
+    max_operations = module.params['bulk_chunk_size']
+    if bulk.get('maxOperations'):
+        max_operations = min(max_operations, bulk['maxOperations'])
+
+    operations = [
+        [
+            bulk_operation(module, index, action, user, resource)
+            for action in actions
+        ]
+        for index, (user, resource, actions, _) in enumerate(plans)
+        if actions
+    ]
+    chunks = list(bulk_chunks(module, operations, max_operations, bulk.get('maxPayloadSize')))
+
+    def send(chunk):
+        try:
+            return bulk_send(module, base_url, default_headers, chunk)
+        except RequestFailure as failure:
+            # the whole request failed -> so did every operation in it
+            status = failure.details.get('info', {}).get('status', 0)
+            return {
+                op['bulkId']: {'status': status, 'response': failure.details['msg']}
+                for op in chunk
+            }
+
+    responses = {}
+    for chunk_responses in map_concurrently(send, chunks, max_concurrency):
+        responses.update(chunk_responses)
+
+    for index, (user, _, actions, user_result) in enumerate(plans):
+        for action in actions:
+            operation_response = responses.get(f"{index}-{action}", {})
+            status_code = bulk_status(operation_response)
+
+            if status_code not in range(200, 300):
+                mark_failed(user_result, {
+                    'msg': f"{action} failed: received status {status_code}, expected 2xx",
+                    'response': operation_response.get('response'),
+                })
+                break
+
+            if action == 'create':
+                user_result['user_id'] = bulk_user_id(operation_response)
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        base_url=dict(type='str', required=True),
+        authorization=dict(type='str', required=True),
+        givenName=dict(type='str', required=False),
+        familyName=dict(type='str', required=False),
+        userName=dict(type='str', required=False),
+        email=dict(type='str', required=False),
+        update=dict(type='bool', required=False, default=True),
+        ignored_attributes_on_update=dict(type='list', required=False, default=[]),
+        active=dict(type='bool', required=False, default=True),
+        scim_version=dict(type='str', required=False, default='v1', choices=['v1', 'v2']),
+        extra_attributes=dict(type='dict', required=False, default=dict()),
+        search_query=dict(type='str', required=False),
+        state=dict(choices=['present', 'absent'], default='present'),
+        users=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                givenName=dict(type='str', required=True),
+                familyName=dict(type='str', required=True),
+                userName=dict(type='str', required=True),
+                email=dict(type='str', required=True),
+                search_query=dict(type='str', required=True),
+                update=dict(type='bool', required=False),
+                ignored_attributes_on_update=dict(type='list', required=False),
+                active=dict(type='bool', required=False),
+                extra_attributes=dict(type='dict', required=False),
+                state=dict(choices=['present', 'absent'], required=False),
+            ),
+        ),
+        bulk_chunk_size=dict(type='int', required=False, default=100),
+        snapshot=dict(type='bool', required=False, default=False),
+        snapshot_page_size=dict(type='int', required=False, default=100),
+        projection=dict(type='bool', required=False, default=False),
+        max_concurrency=dict(type='int', required=False, default=4),
+        max_retries=dict(type='int', required=False, default=5),
+        retry_budget=dict(type='int', required=False, default=300),
+    )
+
+    # seed the result dict in the object
+    # we primarily care about changed and state
+    # change is if this module effectively modified the target
+    # state will include any data that you want your module to pass back
+    # for consumption, for example, in a subsequent task
+    result = dict(
+        changed=False,
+
+        exists=False,
+
+        created=False,
+        activated=False,
+        deactivated=False,
+        updated=False,
+        deleted=False,
+    )
+
+    # the AnsibleModule object will be our abstraction working with Ansible
+    # this includes instantiation, a couple of common attr would be the
+    # args/params passed to the execution, as well as if the module
+    # supports check mode
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[
+            ('users', 'userName'),
+        ],
+        required_together=[
+            ('givenName', 'familyName', 'userName', 'email', 'search_query'),
+        ],
+        mutually_exclusive=[
+            ('users', 'givenName'),
+            ('users', 'familyName'),
+            ('users', 'userName'),
+            ('users', 'email'),
+            ('users', 'search_query'),
+        ],
+        supports_check_mode=False
+    )
+
+    # if the user is working with this module in only check mode we do not
+    # want to make any changes to the environment, just return the current
+    # state with no modifications
+    if module.check_mode:
+        module.exit_json(**result)
+
+    # manipulate or modify the state as needed (this is going to be the
+    # part where your module will do what it needs to do)
+
+    # vars for easier usage
+    base_url = module.params['base_url']
+    default_headers = {
+        'Authorization': module.params['authorization'],
+        'Content-Type': 'application/json',
+    }
+    RETRY.configure(module.params['max_retries'], module.params['retry_budget'])
+
+    if module.params['users'] is not None:
+        # list mode -> manage all users at once
+        result = run_users(module, base_url, default_headers)
+
+        failed = result['summary']['failed']
+        if failed:
+            module.fail_json(
+                msg=f"failed to manage {failed} user(s)",
+                **result,
+                **RETRY.stats()
+            )
+
+        module.exit_json(**result, **RETRY.stats())
+
+    user = {option: module.params[option] for option in USER_OPTIONS}
+
+    resource = find_user(module, base_url, default_headers, user)
+    actions, result = plan_user(user, resource)
+
+    user_id = apply_actions(module, base_url, default_headers, user, resource, actions)
+    if user_id is not None:
+        result['user_id'] = user_id
+
     # we are done here
-    module.exit_json(**result)
+    module.exit_json(**result, **RETRY.stats())
 
 
 def main():
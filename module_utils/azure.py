@@ -0,0 +1,451 @@
+# Shared code for the Azure modules in `library/`.
+#
+# Ansible picks up this directory automatically as it is adjacent to the
+# playbooks, modules import it via `ansible.module_utils.azure`.
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+
+from ansible.module_utils.scim import RETRY, fetch_url, server_delay
+
+GRAPH_SCOPE = 'https://graph.microsoft.com/.default'
+GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+
+# Graph accepts up to 20 requests per JSON batch
+BATCH_SIZE = 20
+
+# refresh cached access tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 5 * 60
+
+# the delta queries which keep the local mirror of the directory up to date
+# https://learn.microsoft.com/en-us/graph/delta-query-overview
+DELTA_QUERIES = {
+    'users': '/users/delta?$select=id,userPrincipalName,displayName',
+    'groups': '/groups/delta?$select=id,displayName,description,assignedLicenses,members',
+}
+
+# error codes meaning the delta link is no longer valid -> start over
+RESYNC_CODES = ('syncStateNotFound', 'syncStateInvalid', 'resyncRequired')
+
+
+def write_file(path, content):
+    """
+    Replace the file at `path` atomically, so that concurrent module runs
+    never read a half written file.  The file is only readable by the
+    current user.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def request_token(module, tenant_id, client_id, client_secret, scope):
+    """
+    Request a new access token with the client credentials flow.
+
+    Returns the token and the unix time at which it expires.
+    """
+    resp, info = fetch_url(
+        module,
+        f"https://login.microsoftonline.com/{urllib.parse.quote(tenant_id)}/oauth2/v2.0/token",
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        method='POST',
+        data=urllib.parse.urlencode({
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'scope': scope,
+            'grant_type': 'client_credentials',
+        }),
+    )
+
+    status_code = info['status']
+    if status_code != 200:
+        module.fail_json(
+            msg=f"requesting an access token failed: received status {status_code}, expected 200",
+            info=info,
+        )
+
+    body = json.loads(resp.read())
+
+    return body['access_token'], time.time() + int(body['expires_in'])
+
+
+def graph_token(module, tenant_id, client_id, client_secret, scope=GRAPH_SCOPE, cache_dir=None):
+    """
+    Return an access token for `scope`, sharing it with all other module runs
+    through `cache_dir`.
+
+    Tokens are cached per tenant, client and scope.  A token is requested
+    again once it is about to expire; a lock file ensures only one module run
+    requests a new token at a time.
+
+    Returns the token, the unix time at which it expires and whether it was
+    taken from the cache.
+    """
+    if not cache_dir:
+        return (*request_token(module, tenant_id, client_id, client_secret, scope), False)
+
+    cache_dir = os.path.expanduser(cache_dir)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    key = hashlib.sha256(json.dumps(
+        ['azure', tenant_id, client_id, scope]
+    ).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.json")
+
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+        if cached.get('expiry', 0) - time.time() > TOKEN_REFRESH_MARGIN:
+            return cached['token'], cached['expiry'], True
+
+        token, expiry = request_token(module, tenant_id, client_id, client_secret, scope)
+        write_file(path, json.dumps({
+            'token': token,
+            'expiry': expiry,
+        }))
+
+    return token, expiry, False
+
+
+def relative_url(url):
+    """Turn an absolute Graph URL (e.g. a `@odata.nextLink`) into a relative one."""
+    if url.startswith(GRAPH_URL):
+        return url[len(GRAPH_URL):]
+
+    return url
+
+
+def graph_error(response):
+    """Describe a failed response of `graph_batch`."""
+    body = response.get('body') or {}
+    error = body.get('error', {}) if isinstance(body, dict) else {}
+
+    return f"status {response['status']}: {error.get('message', error.get('code', body))}"
+
+
+def graph_batch(module, access_token, requests, batch_size=BATCH_SIZE):
+    """
+    Send many Graph API requests with as few HTTP requests as possible via
+    JSON batching (`$batch`).
+
+    `requests` is a list of dicts with the `id`, `method` and `url` (relative
+    to GRAPH_URL) of a request, and optionally its JSON `body` and
+    `dependsOn`, a list of ids of requests which have to succeed before it is
+    sent.  Dependencies have to come before the requests depending on them.
+
+    Requests throttled by Graph (429) are sent again in a later batch, after
+    waiting for as long as Graph asked for via `Retry-After`; requests
+    depending on them are held back as well.
+
+    Returns a dict of request id -> response, a dict with the `status`,
+    `headers` and `body` of the response.  Requests whose dependencies failed
+    get a response with status 424 without being sent.
+    """
+    order = {request['id']: index for index, request in enumerate(requests)}
+    responses = {}
+    queue = list(requests)
+    attempt = 0
+
+    while queue:
+        batch = []
+        deferred = []
+        for request in queue:
+            depends = request.get('dependsOn', [])
+            failed = [
+                request_id for request_id in depends
+                if request_id in responses and responses[request_id]['status'] >= 400
+            ]
+            if failed:
+                responses[request['id']] = {
+                    'status': 424,
+                    'headers': {},
+                    'body': {'error': {
+                        'code': 'FailedDependency',
+                        'message': f"request {failed[0]} failed",
+                    }},
+                }
+                continue
+
+            # dependencies which did not run yet have to be part of this batch
+            pending = [request_id for request_id in depends if request_id not in responses]
+            batch_ids = {sub_request['id'] for sub_request in batch}
+            if len(batch) >= batch_size or not batch_ids.issuperset(pending):
+                deferred.append(request)
+                continue
+
+            sub_request = {
+                'id': request['id'],
+                'method': request['method'],
+                'url': request['url'],
+            }
+            if 'body' in request:
+                sub_request['body'] = request['body']
+                sub_request['headers'] = {'Content-Type': 'application/json'}
+            if pending:
+                sub_request['dependsOn'] = pending
+            batch.append(sub_request)
+
+        if not batch:
+            if deferred:
+                module.fail_json(msg="unresolvable dependencies in batch requests")
+            break
+
+        # https://learn.microsoft.com/en-us/graph/json-batching
+        resp, info = fetch_url(
+            module,
+            f"{GRAPH_URL}/$batch",
+            headers={
+                'Authorization': f"Bearer {access_token}",
+                'Content-Type': 'application/json',
+            },
+            method='POST',
+            data=json.dumps({'requests': batch}),
+        )
+
+        status_code = info['status']
+        if status_code != 200:
+            module.fail_json(
+                msg=f"batch request failed: received status {status_code}, expected 200",
+                info=info,
+            )
+
+        batch_responses = {
+            response['id']: response for response in json.loads(resp.read())['responses']
+        }
+
+        throttled = {
+            request_id: response for request_id, response in batch_responses.items()
+            if response['status'] == 429
+        }
+        delay = None
+        if throttled:
+            # wait for the longest Retry-After of the throttled requests,
+            # which can be a number of seconds or a HTTP date
+            retry_after = None
+            longest = -1
+            for response in throttled.values():
+                value = {
+                    name.lower(): value for name, value in response.get('headers', {}).items()
+                }.get('retry-after')
+                if value is None:
+                    continue
+                seconds = server_delay({'retry-after': str(value)})
+                if seconds is not None and seconds > longest:
+                    retry_after, longest = str(value), seconds
+            delay = RETRY.delay('POST', attempt, {
+                'status': 429,
+                'retry-after': retry_after,
+            })
+
+        retry = []
+        for sub_request in batch:
+            request_id = sub_request['id']
+            response = batch_responses[request_id]
+            held_back = response['status'] == 424 and any(
+                dependency in throttled for dependency in sub_request.get('dependsOn', [])
+            )
+
+            if delay is not None and (request_id in throttled or held_back):
+                retry.append(requests[order[request_id]])
+            else:
+                responses[request_id] = {
+                    'status': response['status'],
+                    'headers': response.get('headers', {}),
+                    'body': response.get('body'),
+                }
+
+        queue = sorted(retry + deferred, key=lambda request: order[request['id']])
+        if retry:
+            time.sleep(delay)
+            attempt += 1
+
+    return responses
+
+
+def graph_list(module, access_token, urls, batch_size=BATCH_SIZE):
+    """
+    Page through many Graph API list requests at once.
+
+    `urls` is a dict of request id -> URL (relative to GRAPH_URL).  The first
+    pages of all of them are fetched with `graph_batch`, then the next pages
+    of the ones which have more (`@odata.nextLink`), and so on.
+
+    Returns a dict of request id -> (list of items, failed response), with
+    the failed response being `None` if all pages could be fetched.
+    """
+    items = {request_id: [] for request_id in urls}
+    errors = {}
+    next_urls = dict(urls)
+
+    while next_urls:
+        responses = graph_batch(module, access_token, [
+            {'id': request_id, 'method': 'GET', 'url': url}
+            for request_id, url in next_urls.items()
+        ], batch_size)
+
+        next_urls = {}
+        for request_id, response in responses.items():
+            if response['status'] != 200:
+                errors[request_id] = response
+                continue
+
+            items[request_id].extend(response['body'].get('value', []))
+            if response['body'].get('@odata.nextLink'):
+                next_urls[request_id] = relative_url(response['body']['@odata.nextLink'])
+
+    return {
+        request_id: (items[request_id], errors.get(request_id))
+        for request_id in urls
+    }
+
+
+def graph_items(module, access_token, url):
+    """
+    Yield all items of a Graph API list request (e.g. `/groups`), one page
+    at a time, following `@odata.nextLink` until the last page.
+    """
+    while url:
+        response = graph_batch(module, access_token, [{'id': 'list', 'method': 'GET', 'url': url}])['list']
+        if response['status'] != 200:
+            module.fail_json(msg=f"ERROR while listing {url}: {graph_error(response)}")
+
+        yield from response['body'].get('value', [])
+
+        next_link = response['body'].get('@odata.nextLink')
+        url = relative_url(next_link) if next_link else None
+
+
+def group_index(module, access_token, select='id,displayName'):
+    """
+    Load all groups of the tenant with a single paged listing into an index
+    of display name -> list of groups (with the `select`ed properties).
+
+    Display names are not unique in Azure AD, so a name can belong to more
+    than one group.  Returns the index and the sorted list of such names.
+    """
+    index = {}
+    for group in graph_items(module, access_token, f"/groups?$select={select}&$top=999"):
+        index.setdefault(group['displayName'], []).append(group)
+
+    duplicates = sorted(name for name, groups in index.items() if len(groups) > 1)
+
+    return index, duplicates
+
+
+def needs_resync(response):
+    """Whether a delta query failed because its delta link expired."""
+    if response['status'] == 410:
+        return True
+
+    body = response.get('body') or {}
+    error = body.get('error', {}) if isinstance(body, dict) else {}
+
+    return error.get('code') in RESYNC_CODES
+
+
+def apply_delta(items, changes):
+    """
+    Apply the changes returned by a delta query to `items`, a dict of object
+    id -> object.
+
+    Changed objects only contain the properties which changed, members of
+    groups are returned as `members@delta` with the added and removed
+    members.
+    """
+    for change in changes:
+        if '@removed' in change:
+            items.pop(change['id'], None)
+            continue
+
+        item = items.setdefault(change['id'], {})
+        for key, value in change.items():
+            if key == 'members@delta':
+                members = set(item.get('members', []))
+                for member in value:
+                    if '@removed' in member:
+                        members.discard(member['id'])
+                    else:
+                        members.add(member['id'])
+                item['members'] = sorted(members)
+            elif not key.startswith('@'):
+                item[key] = value
+
+
+def delta_sync(module, access_token, state_file):
+    """
+    Bring the local mirror of all users and groups (with the ids of their
+    members) in `state_file` up to date.
+
+    Only the changes since the last run are requested, using the
+    `@odata.deltaLink` stored with the mirror.  The whole directory is only
+    loaded on the first run, or if Graph does not accept the delta link
+    anymore.  A lock file ensures only one module run updates the mirror at
+    a time.
+
+    Returns the mirror, a dict with the `users` and `groups` (each a dict of
+    object id -> object), and the list of object types which got loaded
+    completely.
+    """
+    state_file = os.path.expanduser(state_file)
+    os.makedirs(os.path.dirname(state_file) or '.', mode=0o700, exist_ok=True)
+
+    with open(f"{state_file}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        try:
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        urls = {}
+        resynced = []
+        for kind, url in DELTA_QUERIES.items():
+            if state.get(kind, {}).get('deltaLink'):
+                urls[kind] = relative_url(state[kind]['deltaLink'])
+            else:
+                state[kind] = {'items': {}}
+                urls[kind] = url
+                resynced.append(kind)
+
+        while urls:
+            responses = graph_batch(module, access_token, [
+                {'id': kind, 'method': 'GET', 'url': url}
+                for kind, url in urls.items()
+            ])
+
+            urls = {}
+            for kind, response in responses.items():
+                if needs_resync(response) and kind not in resynced:
+                    # the delta link expired -> load everything again
+                    state[kind] = {'items': {}}
+                    urls[kind] = DELTA_QUERIES[kind]
+                    resynced.append(kind)
+                    continue
+
+                if response['status'] != 200:
+                    module.fail_json(msg=f"ERROR while syncing the {kind}: {graph_error(response)}")
+
+                body = response['body']
+                apply_delta(state[kind]['items'], body.get('value', []))
+                if body.get('@odata.nextLink'):
+                    urls[kind] = relative_url(body['@odata.nextLink'])
+                else:
+                    state[kind]['deltaLink'] = body['@odata.deltaLink']
+
+        write_file(state_file, json.dumps(state))
+
+    return {kind: state[kind]['items'] for kind in DELTA_QUERIES}, resynced
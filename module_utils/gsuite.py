@@ -0,0 +1,416 @@
+# Shared code for the Google Workspace modules in `library/`.
+#
+# Ansible picks up this directory automatically as it is adjacent to the
+# playbooks, modules import it via `ansible.module_utils.gsuite`.
+
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+
+try:
+    from googleapiclient.version import __version__ as googleapiclient_version
+except ImportError:
+    # google-api-python-client < 2.0
+    from googleapiclient import __version__ as googleapiclient_version
+
+# the Directory API accepts up to 1000 calls per batch request
+BATCH_SIZE = 1000
+
+# discovery documents rarely change, re-fetch them once a day
+DISCOVERY_MAX_AGE = 24 * 60 * 60
+
+# refresh cached access tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 5 * 60
+
+# Google API quotas are given in queries per 100 seconds
+QUOTA_PERIOD = 100
+
+# reasons of 403 responses which mean we have been throttled
+QUOTA_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+
+
+class DiscoveryCache:
+    """
+    Keeps discovery documents on disk, so that they are shared by all module
+    runs instead of being fetched again by every single one.
+
+    Implements the interface of `googleapiclient.discovery_cache.base.Cache`.
+    Cached documents are keyed by the version of google-api-python-client
+    too, so that upgrading the library does not pick up stale documents.
+    """
+
+    def __init__(self, directory, max_age=DISCOVERY_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+
+    def path(self, url):
+        key = hashlib.sha256(f"{googleapiclient_version} {url}".encode('utf-8'))
+        return os.path.join(self.directory, f"{key.hexdigest()}.json")
+
+    def get(self, url):
+        path = self.path(url)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_file(self.path(url), content)
+        except OSError:
+            pass  # caching is best effort only
+
+
+class QuotaLimiter:
+    """
+    Token buckets which are shared by all module runs on this host (e.g. the
+    forks of a playbook run), so that together they stay below the quotas of
+    the Google APIs instead of each running into them on its own.
+
+    Every bucket holds up to `limit` tokens and is refilled with `limit`
+    tokens per 100 seconds.  Its state lives in a file in `directory`, which
+    is locked while tokens are taken.  Requests failing because of the quota
+    anyway are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, retries=5, backoff=1, max_backoff=64):
+        self.directory = None
+        self.buckets = {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def configure(self, directory, buckets):
+        """
+        `buckets` is a dict of bucket name -> queries per 100 seconds, a limit
+        of 0 (or no `directory`) disables the bucket.
+        """
+        self.directory = os.path.expanduser(directory) if directory else None
+        self.buckets = {name: limit for name, limit in buckets.items() if limit}
+
+    def acquire(self, count=1):
+        """Wait until `count` queries are allowed by all buckets."""
+        if not self.directory:
+            return
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        for name, limit in self.buckets.items():
+            self.take(name, limit, min(count, limit))
+
+    def take(self, name, limit, count):
+        key = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        path = os.path.join(self.directory, f"{key}.json")
+
+        while True:
+            with open(f"{path}.lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+
+                now = time.time()
+                elapsed = max(0.0, now - state.get('updated', now))
+                tokens = min(limit, state.get('tokens', limit) + elapsed * limit / QUOTA_PERIOD)
+
+                if tokens >= count:
+                    tokens -= count
+                    wait = 0
+                else:
+                    wait = (count - tokens) * QUOTA_PERIOD / limit
+
+                write_file(path, json.dumps({'tokens': tokens, 'updated': now}))
+
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def delay(self, attempt):
+        """
+        Return the number of seconds to wait before retrying a throttled
+        request, or `None` if it should not be retried anymore.
+        """
+        if attempt >= self.retries:
+            return None
+
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay + random.uniform(0, delay / 2)
+
+
+# one limiter per module run
+QUOTA = QuotaLimiter()
+
+
+def is_quota_error(exception):
+    """Whether the request failed because a quota has been exceeded."""
+    if not isinstance(exception, HttpError):
+        return False
+
+    if exception.resp.status == 429:
+        return True
+
+    if exception.resp.status != 403:
+        return False
+
+    try:
+        content = exception.content
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        errors = json.loads(content)['error'].get('errors', [])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+
+    return any(error.get('reason') in QUOTA_REASONS for error in errors)
+
+
+def configure_quota(private_key, subject, directory, per_user, per_project):
+    """
+    Set up `QUOTA` for the queries made as `subject` with the service
+    account of `private_key`.
+    """
+    QUOTA.configure(directory, {
+        f"user {subject}": per_user,
+        f"project {private_key.get('project_id')}": per_project,
+    })
+
+
+def write_file(path, content):
+    """
+    Replace the file at `path` atomically, so that concurrent module runs
+    never read a half written file.  The file is only readable by the
+    current user.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def service_account_credentials(private_key, scopes, subject, cache_dir):
+    """
+    Create service account credentials like
+    `service_account.Credentials.from_service_account_info()` does, but
+    share their access token with all other module runs through `cache_dir`.
+
+    Tokens are cached per client email, subject and scopes.  A token is
+    refreshed once it is about to expire; a lock file ensures only one
+    module run requests a new token from the token endpoint at a time.
+    """
+    credentials = service_account.Credentials.from_service_account_info(
+        private_key, scopes=scopes, subject=subject
+    )
+    if not cache_dir:
+        return credentials
+
+    cache_dir = os.path.expanduser(cache_dir)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    key = hashlib.sha256(json.dumps(
+        [private_key['client_email'], subject, sorted(scopes)]
+    ).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.json")
+
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+        if cached.get('expiry', 0) - time.time() > TOKEN_REFRESH_MARGIN:
+            # google-auth expects a naive UTC datetime
+            credentials.token = cached['token']
+            credentials.expiry = datetime.datetime.fromtimestamp(
+                cached['expiry'], datetime.timezone.utc
+            ).replace(tzinfo=None)
+            return credentials
+
+        credentials.refresh(google_auth_httplib2.Request(httplib2.Http()))
+        expiry = credentials.expiry.replace(tzinfo=datetime.timezone.utc)
+        write_file(path, json.dumps({
+            'token': credentials.token,
+            'expiry': expiry.timestamp(),
+        }))
+
+    return credentials
+
+
+def build_service(api, version, credentials, cache_dir):
+    """
+    Build a Google API service object like `build()` does, but take the
+    discovery document from `cache_dir` if possible.
+
+    A document stored as `<api>.<version>.json` (e.g.
+    `admin.directory_v1.json`) in `cache_dir` is used as is and never
+    expires.  Otherwise the document is cached in `cache_dir` for a day.
+    """
+    if not cache_dir:
+        return build(api, version, credentials=credentials)
+
+    cache_dir = os.path.expanduser(cache_dir)
+
+    static_document = os.path.join(cache_dir, f"{api}.{version}.json")
+    if os.path.isfile(static_document):
+        with open(static_document, encoding='utf-8') as f:
+            return build_from_document(f.read(), credentials=credentials)
+
+    return build(
+        api, version, credentials=credentials, cache=DiscoveryCache(cache_dir)
+    )
+
+
+def execute(request):
+    """
+    Execute a single API request (i.e. call `request.execute()`) within the
+    limits of `QUOTA`, retrying it if it got throttled anyway.
+    """
+    attempt = 0
+
+    while True:
+        QUOTA.acquire()
+        try:
+            return request.execute()
+        except HttpError as e:
+            delay = QUOTA.delay(attempt) if is_quota_error(e) else None
+            if delay is None:
+                raise
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def execute_batch(service, requests, batch_size=BATCH_SIZE):
+    """
+    Execute many API requests with as few HTTP requests as possible.
+
+    `requests` is a dict of request id -> request (i.e. something like
+    `service.members().get(...)` without calling `.execute()` on it).  Every
+    request of a batch counts against `QUOTA`, the ones which got throttled
+    anyway are sent again in another batch.
+
+    Returns a dict of request id -> (response, exception), with exception
+    being `None` if the request succeeded.
+    """
+    responses = {}
+
+    def callback(request_id, response, exception):
+        responses[request_id] = (response, exception)
+
+    items = list(requests.items())
+    if len(items) == 1:
+        # a batch of one is just overhead
+        request_id, request = items[0]
+        try:
+            callback(request_id, execute(request), None)
+        except Exception as e:
+            callback(request_id, None, e)
+        return responses
+
+    attempt = 0
+    while items:
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            QUOTA.acquire(len(chunk))
+
+            # https://googleapis.github.io/google-api-python-client/docs/batch.html
+            batch = service.new_batch_http_request(callback=callback)
+            for request_id, request in chunk:
+                batch.add(request, request_id=request_id)
+            try:
+                batch.execute()
+            except HttpError as e:
+                if not is_quota_error(e):
+                    raise
+                # the whole batch got throttled -> retry all of its requests
+                for request_id, _ in chunk:
+                    callback(request_id, None, e)
+
+        items = [
+            (request_id, request) for request_id, request in items
+            if is_quota_error(responses[request_id][1])
+        ]
+        delay = QUOTA.delay(attempt) if items else None
+        if delay is None:
+            break
+
+        time.sleep(delay)
+        attempt += 1
+
+    return responses
+
+
+def list_items(collection, request, item_key):
+    """
+    Yield all items of a list request (e.g. `service.users().list(...)`),
+    following `nextPageToken` until the last page.
+
+    `collection` is the resource the request was created from, it is needed
+    to build the request for the next page.
+    """
+    while request is not None:
+        response = execute(request)
+        yield from response.get(item_key, [])
+        request = collection.list_next(request, response)
+
+
+def list_batch(service, requests, item_key, batch_size=BATCH_SIZE):
+    """
+    Page through many list requests at once.
+
+    `requests` is a dict of request id -> function returning the request for
+    a page token (e.g. `lambda token: service.members().list(groupKey=...,
+    pageToken=token)`), the token of the first page being `None`.  The first
+    pages of all requests are fetched in batches, then the next pages of the
+    ones which have more, and so on.
+
+    Returns a dict of request id -> (list of items, exception), with
+    exception being `None` if all pages could be fetched.
+    """
+    items = {request_id: [] for request_id in requests}
+    errors = {}
+    page_tokens = dict.fromkeys(requests)
+
+    while page_tokens:
+        responses = execute_batch(service, {
+            request_id: requests[request_id](page_token)
+            for request_id, page_token in page_tokens.items()
+        }, batch_size)
+
+        page_tokens = {}
+        for request_id, (response, exception) in responses.items():
+            if exception is not None:
+                errors[request_id] = exception
+                continue
+
+            items[request_id].extend(response.get(item_key, []))
+            if response.get('nextPageToken'):
+                page_tokens[request_id] = response['nextPageToken']
+
+    return {
+        request_id: (items[request_id], errors.get(request_id))
+        for request_id in requests
+    }
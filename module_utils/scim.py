@@ -0,0 +1,408 @@
+# Shared code for the SCIM modules in `library/`.
+#
+# Ansible picks up this directory automatically as it is adjacent to the
+# playbooks, modules import it via `ansible.module_utils.scim`.
+
+import concurrent.futures
+import email.utils
+import gzip
+import http.client
+import io
+import json
+import random
+import select
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+# same default as ansible.module_utils.urls.fetch_url
+DEFAULT_TIMEOUT = 10
+
+USER_AGENT = 'ansible-iam'
+
+
+class ConnectionPool:
+    """
+    Keeps connections alive after a request, so that later requests to the
+    same host can reuse them instead of doing a new TCP+TLS handshake.
+
+    Idle connections are kept per host; a connection is only ever used by one
+    request at a time, so the pool can be shared between threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.ssl_context = ssl.create_default_context()
+
+        # number of connections (i.e. handshakes) opened so far
+        self.opened = 0
+
+    def acquire(self, scheme, netloc, timeout):
+        """
+        Return an idle connection to `netloc`, or open a new one.
+
+        Returns the connection and whether it was reused.
+        """
+        key = (scheme, netloc)
+
+        with self.lock:
+            idle = self.idle.get(key)
+            while idle:
+                connection = idle.pop()
+                if is_dropped(connection):
+                    # the server closed it while it was idle -> do not even try
+                    connection.close()
+                    continue
+
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+
+            self.opened += 1
+
+        return self.connect(scheme, netloc, timeout), False
+
+    def release(self, scheme, netloc, connection):
+        with self.lock:
+            self.idle.setdefault((scheme, netloc), []).append(connection)
+
+    def connect(self, scheme, netloc, timeout):
+        host, port = split_netloc(scheme, netloc)
+        proxy = proxy_for(scheme, host)
+
+        if proxy is None:
+            if scheme == 'https':
+                return http.client.HTTPSConnection(
+                    host, port, timeout=timeout, context=self.ssl_context
+                )
+            return http.client.HTTPConnection(host, port, timeout=timeout)
+
+        proxy_host, proxy_port = split_netloc(proxy.scheme, proxy.netloc)
+        if scheme == 'https':
+            # tunnel through the proxy via CONNECT
+            connection = http.client.HTTPSConnection(
+                proxy_host, proxy_port, timeout=timeout, context=self.ssl_context
+            )
+            connection.set_tunnel(host, port)
+            return connection
+
+        return http.client.HTTPConnection(proxy_host, proxy_port, timeout=timeout)
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle = {}
+
+
+class RetryPolicy:
+    """
+    Decides whether (and how long to wait before) a failed request is sent
+    again.
+
+    Throttled requests (429) wait for as long as the service asks for via
+    `Retry-After` or `X-RateLimit-Reset`, other failures back off
+    exponentially with jitter.  The time spent sleeping is capped by a
+    budget for the whole module run.
+    """
+
+    # these statuses mean the request was not processed -> always safe to retry
+    THROTTLED = (429, 503)
+    # for these the request might have been processed -> only retry if the
+    # request can be repeated safely
+    FAILED = (-1, 500, 502, 504)
+    # PATCH is not in here: SCIM PatchOps add and remove values
+    IDEMPOTENT = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+    def __init__(self, retries=5, budget=300, backoff=1, max_backoff=60):
+        self.lock = threading.Lock()
+        self.retries = retries
+        self.budget = budget
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # statistics for the module result
+        self.retried = 0
+        self.slept = 0.0
+
+    def configure(self, retries, budget):
+        self.retries = retries
+        self.budget = budget
+
+    def delay(self, method, attempt, info):
+        """
+        Return the number of seconds to wait before retrying, or `None` if the
+        request should not be retried.
+        """
+        status = info['status']
+        retryable = status in self.THROTTLED or (
+            status in self.FAILED and method in self.IDEMPOTENT
+        )
+        if not retryable or attempt >= self.retries:
+            return None
+
+        delay = server_delay(info)
+        if delay is None:
+            # exponential backoff with jitter, so that concurrent requests
+            # do not all come back at the same time
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+        else:
+            delay += random.uniform(0, delay / 10)
+
+        with self.lock:
+            if self.slept + delay > self.budget:
+                # out of time -> give up and let the caller handle the failure
+                return None
+
+            self.retried += 1
+            self.slept += delay
+
+        return delay
+
+    def stats(self):
+        return {
+            'retries': self.retried,
+            'retry_sleep': round(self.slept, 3),
+        }
+
+
+class RequestFailure(Exception):
+    """A request made through a FailureRaisingModule failed."""
+
+    def __init__(self, details):
+        super().__init__(details.get('msg'))
+        self.details = details
+
+
+class FailureRaisingModule:
+    """
+    Stands in for the AnsibleModule while requests are sent concurrently.
+
+    Instead of ending the module run from within a worker thread `fail_json`
+    raises a RequestFailure, so that the failure can be handled (and
+    reported) by the caller.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.params = module.params
+
+    def jsonify(self, data):
+        return self.module.jsonify(data)
+
+    def fail_json(self, **kwargs):
+        raise RequestFailure(kwargs)
+
+
+# one pool and retry policy per module run
+POOL = ConnectionPool()
+RETRY = RetryPolicy()
+
+
+def is_dropped(connection):
+    """
+    Whether the server closed an idle connection: an idle socket only becomes
+    readable if the server hung up (or sent something it should not have).
+    """
+    if connection.sock is None:
+        return True
+
+    try:
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+
+    return bool(readable)
+
+
+def split_netloc(scheme, netloc):
+    parsed = urllib.parse.urlsplit(f"{scheme}://{netloc}")
+    port = parsed.port or (443 if scheme == 'https' else 80)
+
+    return parsed.hostname, port
+
+
+def proxy_for(scheme, host):
+    """Return the parsed proxy URL to use for `host`, if any."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+
+    return urllib.parse.urlsplit(proxy)
+
+
+def server_delay(info):
+    """
+    Return the number of seconds the service asked us to wait via the
+    `Retry-After` or `X-RateLimit-*` headers, if any.
+    """
+    retry_after = info.get('retry-after')
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+
+        # Retry-After can also be a HTTP date
+        try:
+            date = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, date.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    reset = info.get('x-ratelimit-reset')
+    if reset and info.get('x-ratelimit-remaining', '0') == '0':
+        try:
+            reset = float(reset)
+        except ValueError:
+            return None
+
+        # either a unix timestamp or the number of seconds until the reset
+        if reset > 1e9:
+            reset = reset - time.time()
+
+        return max(0.0, reset)
+
+    return None
+
+
+def decode_body(response, body):
+    if response.getheader('Content-Encoding', '').lower() == 'gzip':
+        return gzip.decompress(body)
+
+    return body
+
+
+def fetch_url(module, url, headers=None, method='GET', data=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Drop-in replacement for `ansible.module_utils.urls.fetch_url` which keeps
+    the connection alive for later requests, accepts gzip encoded responses
+    and retries throttled or failed requests according to `RETRY`.
+
+    Just like the original this returns a response object (which can be
+    `read()`) and an info dict containing the `status`, `msg`, `url`, the
+    response headers and (for responses >= 400) the `body`.  Connection
+    errors are reported with a status of -1.
+    """
+    attempt = 0
+
+    while True:
+        resp, info = send(url, headers, method, data, timeout)
+
+        delay = RETRY.delay(method, attempt, info)
+        if delay is None:
+            return resp, info
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def send(url, headers, method, data, timeout):
+    """Send a single request over a pooled connection."""
+    parsed = urllib.parse.urlsplit(url)
+    scheme, netloc = parsed.scheme, parsed.netloc
+
+    target = parsed.path or '/'
+    if parsed.query:
+        target = f"{target}?{parsed.query}"
+    if scheme == 'http' and proxy_for(scheme, parsed.hostname) is not None:
+        # plain HTTP proxies need the absolute URL
+        target = url
+
+    request_headers = {
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': 'gzip',
+        **(headers or {}),
+    }
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    info = {'url': url, 'status': -1}
+
+    while True:
+        connection, reused = POOL.acquire(scheme, netloc, timeout)
+
+        try:
+            connection.request(method, target, body=data, headers=request_headers)
+            response = connection.getresponse()
+            body = decode_body(response, response.read())
+            break
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+            connection.close()
+            if reused and method in RetryPolicy.IDEMPOTENT:
+                # the server closed the idle connection in the meantime -> try
+                # again on a fresh one.  Other requests might have been
+                # processed already, so they fail like any connection error.
+                continue
+
+            info['msg'] = f"Connection failure: {e}"
+            return None, info
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            info['msg'] = f"Connection failure: {e}"
+            return None, info
+
+    if response.will_close:
+        connection.close()
+    else:
+        POOL.release(scheme, netloc, connection)
+
+    info.update({k.lower(): v for k, v in response.getheaders()})
+    info.update({
+        'status': response.status,
+        'msg': f"OK ({len(body)} bytes)" if response.status < 400 else response.reason,
+    })
+    if response.status >= 400:
+        info['body'] = body.decode('utf-8', errors='replace')
+
+    return io.BytesIO(body), info
+
+
+def list_resources(module, url, default_headers, page_size):
+    """
+    Page through all resources at `url` (e.g. `.../Users`) using
+    `startIndex` and `count`, yielding one resource at a time.
+    """
+    separator = '&' if '?' in url else '?'
+    start_index = 1
+
+    while True:
+        resp, info = fetch_url(
+            module,
+            f"{url}{separator}startIndex={start_index}&count={page_size}",
+            headers=default_headers,
+        )
+
+        status_code = info['status']
+        if status_code not in range(200, 300):
+            module.fail_json(
+                msg=f"listing {url} failed: received status {status_code}, expected 2xx",
+                info=info,
+            )
+
+        body = json.loads(resp.read())
+        resources = body.get('Resources', [])
+
+        yield from resources
+
+        start_index += len(resources)
+        if len(resources) == 0 or start_index > body.get('totalResults', 0):
+            return
+
+
+def map_concurrently(function, items, max_concurrency):
+    """
+    Call `function` for every item, with at most `max_concurrency` calls
+    running at the same time.
+
+    Returns the results in the same order as the items.
+    """
+    if max_concurrency <= 1:
+        return [function(item) for item in items]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(function, items))